@@ -0,0 +1,222 @@
+'''
+Benchmarks of the Timeseries and indicator hot paths over synthetic series.
+
+Each case is timed (best of several repeats, with the per-timeseries cache
+cleared before every call) and its peak memory measured with tracemalloc, for
+every combination of series length and window.  Results can be saved as a
+baseline and later runs compared against it; the reference baseline of the quick
+run is benchmarks/baselines/quick.json:
+
+    python benchmarks/bench.py --quick --compare benchmarks/baselines/quick.json
+    python benchmarks/bench.py --save benchmarks/baselines/local.json
+    python benchmarks/bench.py --compare benchmarks/baselines/local.json
+
+A comparison exits with status 1 if any case is slower than its baseline by
+more than the tolerance, or uses more than that fraction of extra memory.
+'''
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymdicator import timeseries as ts
+from pymdicator import indicators
+from pymdicator.resample import Frequency
+
+SIZES = [1000, 10000, 100000, 1000000, 10000000]
+QUICK_SIZES = [1000, 10000, 100000]
+WINDOWS = [5, 50, 500]
+
+# Number of timed repeats of each case; each repeat runs for at least 0.2s
+REPEATS = 3
+
+
+def make_series(n_points, seed = 0, start = "2000-01-03"):
+    '''
+    Random-walk price timeseries of <n_points> minutes
+    '''
+    rng = np.random.RandomState(seed)
+    prices = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.001, n_points)))
+    dates = pd.date_range(start, periods = n_points, freq = "min")
+    return ts.Timeseries(dates, prices, ts.TimeseriesType.PRICE, ts.TimeseriesSubType.ABSOLUTE)
+
+
+def _uncached(function):
+    '''
+    Wrap a benchmark so the per-timeseries cache cannot serve repeated calls
+    '''
+    def run(series):
+        series.clear_cache()
+        return function(series)
+    return run
+
+
+def _combine(window):
+    def setup(series):
+        other = make_series(len(series), seed = 1, start = "2000-01-03 00:%02d" % (window % 60))
+        return lambda s: ts.Timeseries.linearly_combine(s, 1.0, other, -0.5)
+    return setup
+
+
+def _method(name, *parameter_list):
+    return lambda window: lambda series: _uncached(
+        lambda s: getattr(s, name)(*[window if p is None else p for p in parameter_list]))
+
+
+def _indicator(create, method_name):
+    def setup(window):
+        indicator = create(window)
+        return lambda series: _uncached(lambda s: getattr(indicator, method_name)(s))
+    return setup
+
+
+def _macd(window):
+    return indicators.MACD(max(2, window // 2), window, max(2, window // 3))
+
+
+# (name, setup) - setup(window)(series) gives the call to time, taking the series
+CASES = [
+    ("returns", lambda window: lambda series: _uncached(
+        lambda s: s.calculate_returns(ts.TimeseriesSubType.FRACTIONAL, 1))),
+    ("moving_average_equal", _method("calculate_moving_average", ts.TimeseriesSubType.EQUAL, None)),
+    ("moving_average_exponential", _method("calculate_moving_average",
+                                           ts.TimeseriesSubType.EXPONENTIAL, None)),
+    ("volatility_equal", _method("calculate_volatility", ts.TimeseriesSubType.EQUAL, None)),
+    ("volatility_exponential", _method("calculate_volatility",
+                                       ts.TimeseriesSubType.EXPONENTIAL, None)),
+    ("returns_volatility_equal", _method("calculate_returns_volatility",
+                                         ts.TimeseriesSubType.EQUAL, None)),
+    ("linearly_combine", _combine),
+    ("momentum_current", _indicator(indicators.Momentum, "calculate_current_ts")),
+    ("momentum_timeseries", _indicator(indicators.Momentum, "calculate_timeseries_ts")),
+    ("rsi_current", _indicator(indicators.RSI, "calculate_current_ts")),
+    ("rsi_timeseries", _indicator(indicators.RSI, "calculate_timeseries_ts")),
+    ("macd_current", _indicator(_macd, "calculate_current_ts")),
+    ("macd_timeseries", _indicator(_macd, "calculate_timeseries_ts")),
+    ("resample_ohlc_5min", lambda window: lambda series: lambda s: s.resample_ohlc("5min")),
+    ("resample_ohlc_weekly", lambda window: lambda series: lambda s: s.resample_ohlc(
+        Frequency.WEEKLY)),
+]
+
+# Cases that do not depend on the window are only run for the first window
+WINDOWLESS = set(["returns", "resample_ohlc_5min", "resample_ohlc_weekly"])
+
+
+def time_call(call, series):
+    '''
+    Best time in seconds of one call over REPEATS repeats
+    '''
+    timer = timeit.Timer(lambda: call(series))
+    number, elapsed = timer.autorange()
+    repeats = REPEATS if elapsed * REPEATS < 30 else 1
+    return min([elapsed] + timer.repeat(repeats - 1, number)) / number
+
+
+def peak_memory(call, series):
+    '''
+    Peak bytes allocated during one call
+    '''
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        call(series)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - start
+
+
+def run(sizes, windows, pattern = "*", verbose = True):
+    '''
+    Run every case matching <pattern>, returning a dictionary of
+    "case|size|window" -> {"time": seconds, "peak_bytes": bytes}
+    '''
+    results = {}
+    for size in sizes:
+        series = make_series(size)
+        for name, create in CASES:
+            if not fnmatch.fnmatch(name, pattern):
+                continue
+            for window in (windows[:1] if name in WINDOWLESS else windows):
+                if window >= size:
+                    continue
+                setup = create(window)
+                call = setup(series)
+                key = "%s|%d|%d" % (name, size, window)
+                results[key] = {"time": time_call(call, series),
+                                "peak_bytes": peak_memory(call, series)}
+                if verbose:
+                    print("%-30s %10d %5d %12.6f s %12d B" %
+                          (name, size, window, results[key]["time"], results[key]["peak_bytes"]))
+                    sys.stdout.flush()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    '''
+    List of regressions of <results> against <baseline>
+    '''
+    regressions = []
+    for key in sorted(results):
+        if key not in baseline:
+            continue
+        for measure in ("time", "peak_bytes"):
+            old = baseline[key][measure]
+            new = results[key][measure]
+            if old > 0 and new > old * (1.0 + tolerance):
+                regressions.append("%s %s: %.6g -> %.6g (%+.0f%%)" %
+                                   (key, measure, old, new, 100.0 * (new / old - 1.0)))
+    return regressions
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Benchmark pymdicator hot paths")
+    parser.add_argument("--sizes", help = "comma separated series lengths")
+    parser.add_argument("--windows", help = "comma separated windows")
+    parser.add_argument("--quick", action = "store_true", help = "series of up to 100k points")
+    parser.add_argument("--filter", default = "*", help = "glob of case names to run")
+    parser.add_argument("--save", help = "file to save the results to as a baseline")
+    parser.add_argument("--compare", help = "baseline file to compare the results with")
+    parser.add_argument("--tolerance", type = float, default = 0.25,
+                        help = "fractional slow-down allowed before a case regresses")
+    args = parser.parse_args(argv)
+
+    sizes = QUICK_SIZES if args.quick else SIZES
+    if args.sizes:
+        sizes = [int(s) for s in args.sizes.split(",")]
+    windows = [int(w) for w in args.windows.split(",")] if args.windows else WINDOWS
+
+    results = run(sizes, windows, args.filter)
+
+    if args.save:
+        directory = os.path.dirname(os.path.abspath(args.save))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(args.save, "w") as baseline_file:
+            json.dump({"machine": {"python": platform.python_version(),
+                                   "numpy": np.__version__,
+                                   "pandas": pd.__version__,
+                                   "platform": platform.platform()},
+                       "results": results}, baseline_file, indent = 1, sort_keys = True)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,26 @@
-from flask import Flask, render_template, request
-from pymdicator import utils, indicators
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, abort
+from pymdicator import utils, indicators, jobs, export, screener
+from pymdicator.timeseries import Timeseries
+from pymdicator.panel import Panel
+from pymdicator.cache import ResultCache
 import random
+import math
 import os
 
-SAMPLE_SIZE = 100
+# Bound on the memory held by loaded securities, in megabytes
+STORE_SIZE_MB = int(os.environ.get("TEAM_MAGIC_STORE_MB", 256))
 
-
-def __get_start_data():
-    all_secs = utils.list_files(utils.PATHS[utils.STOCKS])
-    work_secs = random.sample(all_secs, SAMPLE_SIZE)
-    secs = random.sample(all_secs, 10)
-    return {
-        'secs': dict(zip([s.split('.')[0] for s in secs], secs)),
-        'work_secs': dict(
-            zip(
-                work_secs, 
-                [utils.read_csv_to_df(
-                    os.path.join(
-                        utils.PATHS[utils.STOCKS], s)) for s in work_secs]))
-    }
-
-start_data = __get_start_data()
+store = utils.SecurityStore(utils.PATHS[utils.STOCKS],
+                            max_size=STORE_SIZE_MB * 1024 * 1024)
+job_manager = jobs.JobManager(max_workers=int(os.environ.get("TEAM_MAGIC_WORKERS", 2)))
+# Load every security in the background at start up if TEAM_MAGIC_PRELOAD is set
+if os.environ.get("TEAM_MAGIC_PRELOAD"):
+    job_manager.submit('preload', store.preload)
+# Indicator results keyed by (indicator, parameters, data version), kept for an hour
+# and persisted to TEAM_MAGIC_RESULT_CACHE if set
+result_cache = ResultCache(max_size=int(os.environ.get("TEAM_MAGIC_RESULT_ENTRIES", 64)),
+                           ttl=float(os.environ.get("TEAM_MAGIC_RESULT_TTL", 3600)),
+                           path=os.environ.get("TEAM_MAGIC_RESULT_CACHE"))
 menus = ['Momentum']
 app = Flask(__name__)
 MOMENTUM = "momentum"
@@ -29,9 +29,14 @@ DEFAULT_MOMENTUM_DAYS = 12
 MOMENTUM_DAYS = DEFAULT_MOMENTUM_DAYS
 
 
-def momentum_run(work_secs):
-    momIndicator = indicators.Momentum(MOMENTUM_DAYS)
-    return momIndicator.calculate_current(start_data['work_secs'])
+def momentum_run(work_secs, momentum_days=DEFAULT_MOMENTUM_DAYS):
+    momIndicator = indicators.Momentum(momentum_days)
+    results = {}
+    for sec, df in store.get_all(work_secs).items():
+        mom = momIndicator.calculate_current(df) if df is not None else None
+        if mom is not None and not math.isnan(mom):
+            results[sec] = mom
+    return results
 
 
 INDICATOR_RUNNER = {
@@ -39,6 +44,14 @@ INDICATOR_RUNNER = {
 }
 
 
+def cached_run(key, indicator, momentum_days):
+    results = result_cache.get(key)
+    if results is None:
+        results = INDICATOR_RUNNER[indicator](store.files(), momentum_days)
+        result_cache.put(key, results)
+    return results
+
+
 @app.route('/')
 @app.route('/index')
 def index():
@@ -46,7 +59,7 @@ def index():
                            title='Team Magic Super-Goal',
                            subheading='Super. Magic. A team with a goal.',
                            menus=menus,
-                           secs=start_data['work_secs'])
+                           secs=store.securities())
 
 
 
@@ -61,17 +74,59 @@ def momentum_page():
 
 @app.route('/results', methods=["POST"])
 def momentum():
-    MOMENTUM_DAYS = request.form.get("momentum-number", DEFAULT_MOMENTUM_DAYS)
     indicator = request.form.get("indicator", "")
+    try:
+        momentum_days = int(request.form.get("momentum-number", DEFAULT_MOMENTUM_DAYS))
+    except ValueError:
+        abort(400)
+    if indicator not in INDICATOR_RUNNER or momentum_days < 1:
+        abort(400)
+
+    version = store.refresh()
+    result_cache.invalidate(lambda key: key[-1] != version)
+    key = (indicator, momentum_days, version)
+    job = job_manager.submit(key, cached_run, key, indicator, momentum_days)
+    return redirect(url_for('results', job_id=job.id), code=303)
+
 
-    mom = INDICATOR_RUNNER[indicator](start_data['work_secs'])
+@app.route('/results/<job_id>')
+def results(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        abort(404)
+
+    indicator, momentum_days, _ = job.key
+    if not job.done():
+        subheading = 'Calculating {indicator} indicator...'.format(indicator=indicator)
+    elif job.status == jobs.JobStatus.FAILED:
+        subheading = 'Calculation of {indicator} indicator failed.'.format(indicator=indicator)
+    else:
+        subheading = 'Results from {indicator} indicator.'.format(indicator=indicator)
 
     return render_template('results.html', heading='Results',
                            title='Team Magic Super-Goal - Results',
-                           subheading='Results from {indicator} indicator.'.format(indicator=indicator),
+                           subheading=subheading,
                            menus=menus,
-                           indicator_results=mom,
-                           momentum_days=MOMENTUM_DAYS)
+                           indicator_results=job.result or {},
+                           momentum_days=momentum_days,
+                           refresh=None if job.done() else 1)
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        abort(404)
+    info = job.info()
+    if job.status == jobs.JobStatus.DONE:
+        info['results'] = job.result
+    return jsonify(info)
+
+
+def __random_securities(n_secs):
+    secs = store.securities()
+    names = random.sample(sorted(secs), min(n_secs, len(secs)))
+    return dict((name, secs[name]) for name in names)
 
 
 @app.route('/list')
@@ -80,7 +135,7 @@ def security_list():
                            title='Team Magic Super-Goal - List',
                            subheading='Sitting in a row.',
                            menus=menus,
-                           secs=start_data['secs'])
+                           secs=__random_securities(10))
 
 
 @app.route('/security/<security>')
@@ -92,5 +147,211 @@ def security(security):
                            security=security)
 
 
+@app.route('/cache')
+def cache_stats():
+    info = store.cache_info()
+    info['jobs'] = job_manager.info()
+    info['results'] = result_cache.info()
+    return jsonify(info)
+
+
+API_INDICATORS = {
+    'momentum': lambda args: indicators.Momentum(args.get('days', DEFAULT_MOMENTUM_DAYS, type=int)),
+    'rsi': lambda args: indicators.RSI(args.get('period', 10, type=int)),
+    'macd': lambda args: indicators.MACD(args.get('short', 12, type=int),
+                                         args.get('long', 26, type=int),
+                                         args.get('signal', 9, type=int)),
+}
+# Number of securities per page of /api/indicator results unless limit= is given
+API_PAGE_SIZE = 500
+
+
+def __api_args():
+    output_format = request.args.get('format', 'json')
+    if output_format not in ('json', 'arrow'):
+        abort(400, 'format must be json or arrow')
+    if output_format == 'arrow' and export.pyarrow is None:
+        abort(501, 'Arrow output needs pyarrow')
+    since = request.args.get('since')
+    try:
+        since = export.parse_date(since) if since else None
+    except ValueError:
+        abort(400, 'invalid since date')
+    return output_format, since
+
+
+def __file_name(security):
+    if security in store.files():
+        return security
+    file_name = store.securities().get(security)
+    if file_name is None:
+        abort(404)
+    return file_name
+
+
+def __timeseries(file_name):
+    df = store.get(file_name)
+    if df is None or len(df) == 0:
+        return None
+    return Timeseries.from_frame(df)
+
+
+def __api_response(items, outputs, timeseries, output_format, extra=None, headers=None):
+    if output_format == 'arrow':
+        return Response(export.stream_arrow(items, outputs, timeseries),
+                        mimetype=export.ARROW_MIME_TYPE, headers=headers)
+    return Response(export.stream_json(items, extra),
+                    mimetype=export.JSON_MIME_TYPE, headers=headers)
+
+
+@app.route('/api/indicator/<name>')
+def api_indicator(name):
+    '''
+    Indicator values for a page of securities, streamed one security at a time.
+
+    mode : current (default) or timeseries
+    securities : comma separated securities (default: all)
+    offset, limit : page of the securities to calculate
+    since : only return timeseries points after this date
+    format : json (default) or arrow
+    further arguments are the indicator parameters (days, period, short/long/signal)
+    '''
+    if name not in API_INDICATORS:
+        abort(404)
+    output_format, since = __api_args()
+    timeseries = request.args.get('mode', 'current') == 'timeseries'
+    try:
+        indicator = API_INDICATORS[name](request.args)
+    except AssertionError:
+        abort(400, 'invalid indicator parameters')
+
+    if request.args.get('securities'):
+        file_names = [__file_name(s) for s in request.args['securities'].split(',')]
+    else:
+        file_names = store.files()
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = max(request.args.get('limit', API_PAGE_SIZE, type=int), 1)
+    page = file_names[offset:offset + limit]
+    next_offset = offset + limit if offset + limit < len(file_names) else None
+
+    def items():
+        for file_name in page:
+            ts = __timeseries(file_name)
+            if ts is None:
+                continue
+            if timeseries:
+                dates, columns = export.timeseries_columns(
+                    indicator.calculate_timeseries(ts), indicator.OUTPUTS, since)
+            else:
+                dates, columns = None, export.current_columns(
+                    indicator.calculate_current(ts), indicator.OUTPUTS)
+            yield file_name.split('.')[0], dates, columns
+
+    headers = {'X-Next-Offset': str(next_offset)} if next_offset is not None else None
+    return __api_response(items(), indicator.OUTPUTS, timeseries, output_format,
+                          {'indicator': name, 'next_offset': next_offset}, headers)
+
+
+@app.route('/api/security/<security>/timeseries')
+def api_security_timeseries(security):
+    '''
+    Close prices of one security, or an indicator timeseries if indicator= is given.
+
+    indicator : momentum, rsi or macd (default: prices)
+    since : only return points after this date
+    format : json (default) or arrow
+    further arguments are the indicator parameters
+    '''
+    output_format, since = __api_args()
+    file_name = __file_name(security)
+    name = request.args.get('indicator')
+    if name is not None and name not in API_INDICATORS:
+        abort(404)
+
+    ts = __timeseries(file_name)
+    if ts is None:
+        abort(404)
+    if name is None:
+        outputs = ('close',)
+        result = ts
+    else:
+        try:
+            indicator = API_INDICATORS[name](request.args)
+        except AssertionError:
+            abort(400, 'invalid indicator parameters')
+        outputs = indicator.OUTPUTS
+        result = indicator.calculate_timeseries(ts)
+
+    dates, columns = export.timeseries_columns(result, outputs, since)
+    return __api_response(iter([(file_name.split('.')[0], dates, columns)]), outputs, True,
+                          output_format)
+
+
+def __universe_panel():
+    secs = store.securities()
+    frames = store.get_all(sorted(secs.values()))
+    return Panel.from_frames(dict((name, frames[file_name])
+                                  for name, file_name in sorted(secs.items())))
+
+
+def __screener(args):
+    conditions = []
+    if 'rsi_min' in args or 'rsi_max' in args:
+        rsi = indicators.RSI(args.get('rsi_period', 14, type=int))
+        conditions.append(screener.between(rsi, args.get('rsi_min', 0.0, type=float),
+                                           args.get('rsi_max', 100.0, type=float)))
+    cross = args.get('cross')
+    if cross is not None:
+        if cross not in ('up', 'down'):
+            abort(400, 'cross must be up or down')
+        macd = indicators.MACD(args.get('macd_short', 12, type=int),
+                               args.get('macd_long', 26, type=int),
+                               args.get('macd_signal', 9, type=int))
+        conditions.append(screener.crossover(macd, screener.UP if cross == 'up' else screener.DOWN,
+                                             args.get('cross_days', 1, type=int)))
+    return screener.Screener(conditions)
+
+
+@app.route('/api/screen')
+def api_screen():
+    '''
+    Top (or bottom) securities of the universe by an indicator, among those passing
+    the filters.
+
+    rank : momentum (default), rsi or macd - indicator to rank by, with its parameters
+    k : number of securities (default 10)
+    order : top (default) or bottom
+    rsi_min, rsi_max : RSI band to keep, with rsi_period (default 14)
+    cross : up or down - keep securities whose MACD (macd_short/long/signal) crossed
+            its signal line within the last cross_days points (default 1)
+    '''
+    name = request.args.get('rank', MOMENTUM)
+    if name not in API_INDICATORS:
+        abort(404)
+    order = request.args.get('order', 'top')
+    if order not in ('top', 'bottom'):
+        abort(400, 'order must be top or bottom')
+    k = max(request.args.get('k', 10, type=int), 0)
+    try:
+        indicator = API_INDICATORS[name](request.args)
+        universe_screener = __screener(request.args)
+    except AssertionError:
+        abort(400, 'invalid indicator parameters')
+
+    version = store.refresh()
+    key = ('screen', tuple(sorted(request.args.items(multi=True))), version)
+    result = result_cache.get(key)
+    if result is None:
+        panel = __universe_panel()
+        passed = universe_screener.screen(panel)
+        ranked = screener.Screener().rank(passed, indicator, k, order == 'top')
+        result = {'rank': name, 'order': order, 'universe': len(panel.securities),
+                  'passed': len(passed.securities),
+                  'results': [{'security': security, 'value': value}
+                              for security, value in ranked]}
+        result_cache.put(key, result)
+    return jsonify(result)
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port='8750')
@@ -0,0 +1,282 @@
+import numpy as np
+import pandas as pd
+import logging as log
+from pymdicator.timeseries import Timeseries, TimeseriesType, PERIODS_PER_YEAR
+from pymdicator.panel import Panel
+from pymdicator.indicators import Momentum, RSI
+
+# Positions are matrices of portfolio weights, one row per date and one column
+# per security.  Rules turn indicator values (a Panel, or a Timeseries for a
+# single security) into target positions of the same shape, and backtest()
+# trades towards them.
+
+
+def signal_lag(indicator):
+    '''
+    Number of dates after its date that a value of <indicator>'s timeseries is
+    known.  Indicators built from returns are indexed, like returns, by the first
+    date of their latest return period, so must be traded this much later to
+    avoid looking ahead.
+
+    indicator : technical indicator
+    '''
+    if isinstance(indicator, Momentum):
+        return indicator.n_days
+    elif isinstance(indicator, RSI):
+        return 1
+    return 0
+
+
+def _values(signal):
+    if isinstance(signal, Panel):
+        return signal.values
+    elif isinstance(signal, Timeseries):
+        return signal.np_values
+    return np.asarray(signal, dtype=float)
+
+
+def _derive(signal, values):
+    if isinstance(signal, (Panel, Timeseries)):
+        return signal.create_derived(values, ts_type = TimeseriesType.INDICATOR)
+    return values
+
+
+def threshold_positions(signal, long_above = None, short_below = None):
+    '''
+    Positions long (1) where <signal> is above <long_above> and short (-1) where it
+    is below <short_below>, flat otherwise (and where the signal is NaN).
+
+    signal : indicator panel or timeseries
+    long_above : level above which to hold a long position (None for no longs)
+    short_below : level below which to hold a short position (None for no shorts)
+    '''
+    values = _values(signal)
+    positions = np.zeros(values.shape)
+    with np.errstate(invalid='ignore'):
+        if long_above is not None:
+            positions[values > long_above] = 1.0
+        if short_below is not None:
+            positions[values < short_below] = -1.0
+    return _derive(signal, positions)
+
+
+def band_positions(signal, enter, exit, position = 1.0):
+    '''
+    Positions entered when <signal> reaches <enter> and held until it reaches <exit>
+    (e.g. long when RSI falls to 30 until it recovers to 50).  If enter < exit the
+    position is entered at or below <enter> and left at or above <exit>; otherwise
+    entered at or above <enter> and left at or below <exit>.
+
+    signal : indicator panel or timeseries
+    enter : level at which to enter
+    exit : level at which to exit
+    position : size (and sign) of the position held
+    '''
+    values = _values(signal)
+    events = np.full(values.shape, np.nan)
+    with np.errstate(invalid='ignore'):
+        if enter < exit:
+            events[values >= exit] = 0.0
+            events[values <= enter] = position
+        else:
+            events[values <= exit] = 0.0
+            events[values >= enter] = position
+    return _derive(signal, hold(events))
+
+
+def crossover_positions(fast, slow, long_only = False):
+    '''
+    Positions long where <fast> is above <slow> and short (or flat if <long_only>)
+    where it is below, e.g. MACD against its signal line.
+
+    fast : indicator panel or timeseries
+    slow : indicator panel or timeseries on the same dates
+    long_only : whether to stay flat instead of going short
+    '''
+    differences = _values(fast) - _values(slow)
+    positions = np.sign(np.nan_to_num(differences))
+    if long_only:
+        np.maximum(positions, 0.0, out=positions)
+    return _derive(fast, positions)
+
+
+def top_k_positions(signal, k, largest = True):
+    '''
+    Positions long (1) in the <k> securities with the largest (or smallest) signal
+    on each date, flat in the rest.  Uses a partial selection along each row.
+
+    signal : indicator panel
+    k : number of securities to hold
+    largest : whether to hold the largest values (else the smallest)
+    '''
+    values = _values(signal)
+    keys = np.where(np.isnan(values), np.inf, -values if largest else values)
+    positions = np.zeros(values.shape)
+    k = min(k, values.shape[1])
+    if k > 0:
+        selected = np.argpartition(keys, k - 1, axis=1)[:, :k]
+        rows = np.arange(values.shape[0])[:, np.newaxis]
+        positions[rows, selected] = 1.0
+        positions[np.isinf(keys)] = 0.0
+    return _derive(signal, positions)
+
+
+def hold(events):
+    '''
+    Carry each non-NaN event forward down axis 0 until the next one, with 0
+    before the first - turning entry/exit events into held positions.
+
+    events : array of events (NaN where nothing happens)
+    '''
+    events = np.asarray(events, dtype=float)
+    if len(events) == 0:
+        return events.copy()
+    row_shape = (len(events),) + (1,) * (events.ndim - 1)
+    last_event = np.where(np.isnan(events), 0, np.arange(len(events)).reshape(row_shape))
+    np.maximum.accumulate(last_event, axis=0, out=last_event)
+    held = np.take_along_axis(events, last_event, axis=0)
+    held[np.isnan(held)] = 0.0
+    return held
+
+
+def _aligned(data, date_index, n_columns):
+    '''
+    2-D values of panel, timeseries or array <data> on <date_index> (NaN on dates
+    it does not have), or None if it has dates that are not in <date_index>
+    '''
+    if not isinstance(data, (Panel, Timeseries)):
+        values = np.asarray(data, dtype=float)
+        values = values.reshape((len(values), -1))
+        return values if values.shape == (len(date_index), n_columns) else None
+
+    values = _values(data)
+    values = values.reshape((len(values), -1))
+    if values.shape[1] != n_columns:
+        return None
+    if np.array_equal(data.date_index, date_index):
+        return values
+    rows = np.searchsorted(date_index, data.date_index)
+    if np.any(rows >= len(date_index)) or np.any(date_index[np.minimum(rows, len(date_index) - 1)]
+                                                 != data.date_index):
+        return None
+    aligned = np.full((len(date_index), n_columns), np.nan)
+    aligned[rows] = values
+    return aligned
+
+
+def backtest(prices, positions, cost = 0.0, lag = 1, normalize = True,
+             periods_per_year = PERIODS_PER_YEAR):
+    '''
+    Trade a universe towards target <positions> and measure the result, for every
+    date and security at once.
+
+    The target on date t is traded at the close of date t + <lag> and held over the
+    following period.  Securities without a price over a period contribute nothing.
+    For targets from an indicator timeseries, add signal_lag(indicator) to the lag.
+
+    prices : price panel (or timeseries for one security)
+    positions : target positions - panel, timeseries or array on the price dates
+                (a shorter indicator series is aligned on its dates, flat before)
+    cost : cost of trading, as a fraction of the value traded
+    lag : number of dates between a target and the trade (raises ValueError if negative)
+    normalize : whether to scale each date's targets so their absolute values sum to 1
+    periods_per_year : number of dates in a year, for annualizing
+    '''
+    if lag < 0:
+        raise ValueError("Invalid lag %s" % lag)
+    if isinstance(prices, Timeseries):
+        securities = [None]
+    else:
+        securities = list(prices.securities)
+    date_index = prices.date_index
+    price_values = _values(prices).reshape((len(date_index), -1))
+    targets = _aligned(positions, date_index, len(securities))
+    if targets is None:
+        log.error("Cannot backtest - positions do not match the prices")
+        return None
+
+    n_dates = len(date_index)
+    targets = np.nan_to_num(targets, nan=0.0)
+    if normalize:
+        gross = np.abs(targets).sum(axis=1)
+        gross[gross == 0.0] = 1.0
+        targets /= gross[:, np.newaxis]
+
+    held = np.zeros(targets.shape)
+    if lag < n_dates:
+        held[lag:] = targets[:n_dates - lag]
+    del targets
+
+    trades = np.diff(held, axis=0, prepend=0.0)
+    np.abs(trades, out=trades)
+    turnover = trades.sum(axis=1)
+    del trades
+
+    # the return of each security over the period ending on each date, times the
+    # position held over it
+    security_returns = np.zeros(held.shape)
+    if n_dates > 1:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            np.divide(price_values[1:], price_values[:-1], out=security_returns[1:])
+        security_returns[1:] -= 1.0
+        security_returns[~np.isfinite(security_returns)] = 0.0
+        security_returns[1:] *= held[:-1]
+    returns = security_returns.sum(axis=1) - cost * turnover
+
+    return BacktestResult(date_index, securities, held, security_returns, returns, turnover,
+                          periods_per_year)
+
+
+class BacktestResult(object):
+    def __init__(self, date_index, securities, positions, security_returns, returns, turnover,
+                 periods_per_year = PERIODS_PER_YEAR):
+        '''
+        Initialize the result of a backtest.  Every array has one row per date.
+
+        date_index : int64 array of the dates, as nanoseconds since the epoch
+        securities : list of security names
+        positions : weights held from each date's close, dates x securities
+        security_returns : return contributed by each security over the period
+                           ending on each date, dates x securities
+        returns : portfolio return over the period ending on each date, after costs
+        turnover : sum of the absolute changes in weight traded on each date
+        periods_per_year : number of dates in a year, for annualizing
+        '''
+        self.date_index = date_index
+        self.securities = securities
+        self.positions = positions
+        self.security_returns = security_returns
+        self.returns = returns
+        self.turnover = turnover
+        self.periods_per_year = periods_per_year
+        self.equity = np.cumprod(1.0 + returns)
+        self.drawdown = self.equity / np.maximum.accumulate(self.equity) - 1.0
+
+    def summary(self):
+        '''
+        Dictionary of total and annualized return, annualized volatility, Sharpe
+        ratio (with no risk-free rate), maximum drawdown and mean turnover
+        '''
+        n_dates = len(self.returns)
+        if n_dates < 2:
+            return {'total_return': 0.0, 'annualized_return': np.nan,
+                    'annualized_volatility': np.nan, 'sharpe': np.nan,
+                    'max_drawdown': 0.0, 'mean_turnover': np.nan}
+        total_return = self.equity[-1] - 1.0
+        years = (n_dates - 1) / float(self.periods_per_year)
+        volatility = self.returns[1:].std() * np.sqrt(self.periods_per_year)
+        mean_return = self.returns[1:].mean() * self.periods_per_year
+        return {'total_return': float(total_return),
+                'annualized_return': float(self.equity[-1] ** (1.0 / years) - 1.0),
+                'annualized_volatility': float(volatility),
+                'sharpe': float(mean_return / volatility) if volatility > 0 else np.nan,
+                'max_drawdown': float(self.drawdown.min()),
+                'mean_turnover': float(self.turnover.mean())}
+
+    def to_frame(self):
+        '''
+        DataFrame indexed by date of the returns, turnover, equity and drawdown
+        '''
+        return pd.DataFrame({'returns': self.returns, 'turnover': self.turnover,
+                             'equity': self.equity, 'drawdown': self.drawdown},
+                            index = pd.DatetimeIndex(self.date_index.view('datetime64[ns]')))
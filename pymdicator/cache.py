@@ -0,0 +1,188 @@
+import logging as log
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    def __init__(self, max_size = 128, size_of = None):
+        '''
+        Initialize a thread-safe least-recently-used cache.
+
+        max_size : bound on the total size of the entries
+        size_of : function giving the size of a value (default: every entry has size 1)
+        '''
+        self.max_size = max_size
+        self.size_of = size_of
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default = None):
+        '''
+        Look up <key>, counting a hit or a miss, and mark it as most recently used
+        '''
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        '''
+        Store <value> under <key>, evicting least recently used entries to stay within
+        max_size.  A value larger than max_size on its own is not stored.
+        '''
+        size = self.size_of(value) if self.size_of is not None else 1
+        with self._lock:
+            self.pop(key)
+            if size > self.max_size:
+                return
+            self._entries[key] = (value, size)
+            self.current_size += size
+            while self.current_size > self.max_size:
+                self.__evict()
+
+    def pop(self, key, default = None):
+        '''
+        Remove <key> from the cache, returning its value
+        '''
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value, size = self._entries.pop(key)
+            self.current_size -= size
+            return value
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_size = 0
+
+    def info(self):
+        '''
+        Dictionary of cache statistics
+        '''
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self._entries), 'size': self.current_size,
+                    'max_size': self.max_size}
+
+    def __evict(self):
+        _, (_, size) = self._entries.popitem(last = False)
+        self.current_size -= size
+        self.evictions += 1
+
+
+class ResultCache(LRUCache):
+    def __init__(self, max_size = 128, ttl = None, path = None, size_of = None):
+        '''
+        Initialize a least-recently-used cache whose entries expire, optionally
+        persisted to disk so that it survives restarts.
+
+        max_size : bound on the total size of the entries
+        ttl : seconds an entry stays valid for (default: until evicted)
+        path : file to persist the entries to (default: memory only)
+        size_of : function giving the size of a value (default: every entry has size 1)
+        '''
+        LRUCache.__init__(self, max_size,
+                          (lambda entry: size_of(entry[0])) if size_of is not None else None)
+        self.ttl = ttl
+        self.path = path
+        self.expirations = 0
+        if path is not None and os.path.isfile(path):
+            self.load()
+
+    def get(self, key, default = None):
+        '''
+        Look up <key>, counting a hit or a miss; an expired entry is removed and misses
+        '''
+        with self._lock:
+            if key in self._entries:
+                _, expires = self._entries[key][0]
+                if expires is not None and expires <= time.time():
+                    LRUCache.pop(self, key)
+                    self.expirations += 1
+            entry = LRUCache.get(self, key)
+            return entry[0] if entry is not None else default
+
+    def put(self, key, value):
+        '''
+        Store <value> under <key> for ttl seconds, saving the cache if it is persisted
+        '''
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            LRUCache.put(self, key, (value, expires))
+            if self.path is not None:
+                self.save()
+
+    def pop(self, key, default = None):
+        with self._lock:
+            entry = LRUCache.pop(self, key)
+            return entry[0] if entry is not None else default
+
+    def invalidate(self, predicate = None):
+        '''
+        Remove the entries whose key satisfies <predicate> (default: all entries).
+        Returns the number removed.
+        '''
+        with self._lock:
+            keys = [k for k in self._entries if predicate is None or predicate(k)]
+            for key in keys:
+                LRUCache.pop(self, key)
+            if keys and self.path is not None:
+                self.save()
+            return len(keys)
+
+    def info(self):
+        info = LRUCache.info(self)
+        info['expirations'] = self.expirations
+        return info
+
+    def save(self):
+        '''
+        Write the unexpired entries to the cache file
+        '''
+        now = time.time()
+        with self._lock:
+            entries = [(key, value, expires)
+                       for key, ((value, expires), _) in self._entries.items()
+                       if expires is None or expires > now]
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'wb') as cache_file:
+            pickle.dump(entries, cache_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path)
+
+    def load(self):
+        '''
+        Read the entries saved in the cache file, dropping those that have expired
+        '''
+        try:
+            with open(self.path, 'rb') as cache_file:
+                entries = pickle.load(cache_file)
+        except Exception as error:
+            log.error("Cannot load result cache %s: %s", self.path, error)
+            return
+
+        now = time.time()
+        with self._lock:
+            for key, value, expires in entries:
+                if expires is None or expires > now:
+                    LRUCache.put(self, key, (value, expires))
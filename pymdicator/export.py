@@ -0,0 +1,141 @@
+import io
+import json
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+JSON_MIME_TYPE = "application/json"
+ARROW_MIME_TYPE = "application/vnd.apache.arrow.stream"
+
+# Results are passed around as (key, dates, columns) items: dates is an int64
+# array of nanoseconds since the epoch for timeseries results and None for
+# current values, and columns maps each output name to its values (an array
+# aligned with the dates, or a single number).
+
+
+def parse_date(date):
+    '''
+    Nanoseconds since the epoch of date string <date> (raises ValueError if invalid)
+    '''
+    timestamp = pd.Timestamp(date)
+    if timestamp is pd.NaT:
+        raise ValueError("Invalid date %s" % date)
+    return timestamp.value
+
+
+def format_dates(date_index):
+    '''
+    ISO strings of int64 <date_index> - just the day if every date is at midnight
+    '''
+    unit = 'D' if (date_index % (24 * 3600 * 10**9) == 0).all() else 's'
+    return np.datetime_as_string(date_index.view('datetime64[ns]'), unit = unit).tolist()
+
+
+def current_columns(result, outputs):
+    '''
+    Columns of a current indicator value (or tuple of values) named by <outputs>
+    '''
+    values = result if isinstance(result, tuple) else (result,)
+    return dict((name, np.nan if value is None else float(value))
+                for name, value in zip(outputs, values))
+
+
+def timeseries_columns(result, outputs, since = None):
+    '''
+    Dates and columns of an indicator timeseries (or tuple of timeseries) named
+    by <outputs>.  Every output is aligned on the dates of the first, with NaN
+    where an output has no value.
+
+    result : timeseries or tuple of timeseries
+    outputs : names of the outputs
+    since : only keep dates after this (nanoseconds since the epoch)
+    '''
+    series = result if isinstance(result, tuple) else (result,)
+    dates = series[0].date_index
+    keep = dates > since if since is not None else slice(None)
+
+    columns = {}
+    for name, ts in zip(outputs, series):
+        idx = np.searchsorted(ts.date_index, dates)
+        found = idx < len(ts)
+        found[found] = ts.date_index[idx[found]] == dates[found]
+        values = np.full(len(dates), np.nan)
+        values[found] = ts.np_values[idx[found]]
+        columns[name] = values[keep]
+    return dates[keep], columns
+
+
+def _json_values(values):
+    if np.ndim(values) == 0:
+        return None if np.isnan(values) else float(values)
+    values = np.asarray(values, dtype = float)
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def stream_json(items, extra = None):
+    '''
+    Generate a JSON document {"results": {key: payload, ...}, **extra} piece by
+    piece, one result at a time.  NaN values are written as null.
+
+    items : iterable of (key, dates, columns)
+    extra : dictionary of further top level members, written after the results
+    '''
+    yield '{"results": {'
+    separator = ''
+    for key, dates, columns in items:
+        payload = {}
+        if dates is not None:
+            payload['dates'] = format_dates(dates)
+        for name in columns:
+            payload[name] = _json_values(columns[name])
+        yield separator + json.dumps(str(key)) + ': ' + json.dumps(payload, allow_nan = False)
+        separator = ', '
+    yield '}'
+    for name, value in (extra or {}).items():
+        yield ', ' + json.dumps(name) + ': ' + json.dumps(value)
+    yield '}\n'
+
+
+def stream_arrow(items, outputs, timeseries):
+    '''
+    Generate an Arrow IPC stream piece by piece, one record batch per result,
+    with columns key, date (timeseries only) and one per output.  Needs pyarrow.
+
+    items : iterable of (key, dates, columns)
+    outputs : names of the outputs
+    timeseries : whether the results are timeseries
+    '''
+    if pyarrow is None:
+        raise ImportError("pyarrow is needed for Arrow output")
+
+    fields = [pyarrow.field('key', pyarrow.string())]
+    if timeseries:
+        fields.append(pyarrow.field('date', pyarrow.timestamp('ns')))
+    fields.extend(pyarrow.field(name, pyarrow.float64()) for name in outputs)
+    schema = pyarrow.schema(fields)
+
+    sink = io.BytesIO()
+    writer = pyarrow.ipc.new_stream(sink, schema)
+    for key, dates, columns in items:
+        n_rows = len(dates) if timeseries else 1
+        arrays = [pyarrow.array([str(key)] * n_rows, pyarrow.string())]
+        if timeseries:
+            arrays.append(pyarrow.array(dates.view('datetime64[ns]')))
+        for name in outputs:
+            values = np.atleast_1d(np.asarray(columns[name], dtype = float))
+            arrays.append(pyarrow.array(values, pyarrow.float64(), from_pandas = True))
+        writer.write_batch(pyarrow.record_batch(arrays, schema = schema))
+        yield _drain(sink)
+    writer.close()
+    yield _drain(sink)
+
+
+def _drain(sink):
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
@@ -1,31 +1,48 @@
 from pymdicator.timeseries import Timeseries, TimeseriesType, TimeseriesSubType
+from pymdicator.panel import Panel, DATE_COL_NAME, PRICE_COL_NAME
+from pymdicator.rolling import rolling_sum, rolling_sums, exponential_moving_average
+from pymdicator import parallel
+from pymdicator.profiling import profiled
 import numpy as np
 import pandas
-
-DATE_COL_NAME = "Date"
-PRICE_COL_NAME = "Close"
+from collections import deque
 
 class TechnicalIndicator:
     MOMENTUM = "Momentum"
     RSI = "Relative Strength Indicator"
     MACD = "Moving Average Convergence Divergence"
 
+    # Names of the values each calculation returns (a tuple when there are several)
+    OUTPUTS = ("value",)
+
     def __init__(self, indicator_name):
         self.name = indicator_name
 
-    def calculate_current(self, *parameter_list):
+    @profiled(size_arg=1)
+    def calculate_current(self, *parameter_list, **kwargs):
+        '''
+        Calculate the latest value for a timeseries, DataFrame, dictionary of
+        DataFrames or panel.  Pass as_of=<date> for the value on that date, from
+        the points dated on or before it (a view - the data is not copied).
+        '''
         data = parameter_list[0]
         other_args = parameter_list[1:] if len(parameter_list) > 1 else []
+        # as_of is only passed on when given, for subclasses not taking it
+        as_of = _as_of_kwargs(kwargs.pop('as_of', None))
 
         if isinstance(data, Timeseries):
-            return self.calculate_current_ts(data, *other_args)
+            return self.calculate_current_ts(data, *other_args, **as_of)
         elif isinstance(data, pandas.DataFrame):
-            return self.calculate_current_df(data, *other_args)
+            return self.calculate_current_df(data, *other_args, **as_of)
         elif isinstance(data, dict):
-            return self.calculate_current_all(data, *other_args)
+            kwargs.update(as_of)
+            return self.calculate_current_all(data, *other_args, **kwargs)
+        elif isinstance(data, Panel):
+            return self.calculate_current_panel(data, *other_args, **as_of)
         return None
 
-    def calculate_timeseries(self, *parameter_list):
+    @profiled(size_arg=1)
+    def calculate_timeseries(self, *parameter_list, **kwargs):
         data = parameter_list[0]
         other_args = parameter_list[1:] if len(parameter_list) > 1 else []
 
@@ -34,32 +51,134 @@ class TechnicalIndicator:
         elif isinstance(data, pandas.DataFrame):
             return self.calculate_timeseries_df(data, *other_args)
         elif isinstance(data, dict):
-            return self.calculate_timeseries_all(data, *other_args)
+            return self.calculate_timeseries_all(data, *other_args, **kwargs)
+        elif isinstance(data, Panel):
+            return self.calculate_timeseries_panel(data, *other_args)
         return None
 
-    def calculate_current_ts(self, ts, *parameter_list):
+    def calculate_current_ts(self, ts, *parameter_list, as_of = None):
         raise NotImplementedError
 
     def calculate_timeseries_ts(self, ts, *parameter_list):
         raise NotImplementedError
 
-    def calculate_current_df(self, df, *parameter_list):
+    @profiled(size_arg=1)
+    def calculate_current_df(self, df, date_col_name = DATE_COL_NAME,
+                             price_col_name = PRICE_COL_NAME, as_of = None):
+        return self.calculate_current_ts(Timeseries.from_frame(df, date_col_name,
+                                                               price_col_name),
+                                         **_as_of_kwargs(as_of))
+
+    @profiled(size_arg=1)
+    def calculate_timeseries_df(self, df, date_col_name = DATE_COL_NAME,
+                                price_col_name = PRICE_COL_NAME):
+        return self.calculate_timeseries_ts(Timeseries.from_frame(df, date_col_name,
+                                                                  price_col_name))
+
+    def calculate_current_panel(self, panel, *parameter_list, as_of = None):
+        raise NotImplementedError
+
+    def calculate_timeseries_panel(self, panel, *parameter_list):
         raise NotImplementedError
 
-    def calculate_timeseries_df(self, df, *parameter_list):
+    def reset(self):
+        '''
+        Clear the streaming state
+        '''
+        raise NotImplementedError
+
+    def update(self, price):
+        '''
+        Add the next price to the streaming state and return the latest indicator value
+        (NaN until enough prices have been seen).  Values match the last point of
+        calculate_timeseries_ts over the same prices.
+        '''
         raise NotImplementedError
 
-    def calculate_current_all(self, df_dictionary, *parameter_list):
+    def seed(self, ts):
+        '''
+        Set the streaming state from the price history in <ts>, ready for update
+        '''
+        self.reset()
+        for price in ts.np_values:
+            self.update(price)
+
+    @classmethod
+    @profiled(size_arg=1)
+    def sweep(cls, ts, parameter_grid):
+        '''
+        Calculate the indicator timeseries of <ts> for every set of parameters in
+        <parameter_grid>, as a DataFrame with one row per date of <ts> and one
+        column per parameter set, NaN where the indicator has no value.  Indicators
+        with several outputs give a tuple of DataFrames.
+
+        This runs one indicator per parameter set; subclasses override it to share
+        the work between parameter sets.
+
+        ts : price timeseries
+        parameter_grid : list of constructor parameters - tuples, or single values
+        '''
+        columns = []
+        for parameters in parameter_grid:
+            indicator = cls(*parameters) if isinstance(parameters, tuple) else cls(parameters)
+            result = indicator.calculate_timeseries_ts(ts)
+            columns.append(result if isinstance(result, tuple) else (result,))
+
+        frames = []
+        for output in range(len(cls.OUTPUTS)):
+            values = np.full((len(ts), len(parameter_grid)), np.nan, order = 'F')
+            for col, result in enumerate(columns):
+                rows = np.searchsorted(ts.date_index, result[output].date_index)
+                values[rows, col] = result[output].np_values
+            frames.append(_sweep_frame(ts, values, parameter_grid))
+        return tuple(frames) if len(frames) > 1 else frames[0]
+
+    @profiled(size_arg=1)
+    def calculate_current_all(self, df_dictionary, *parameter_list, executor = None,
+                              chunk_size = None, errors = None, as_of = None):
+        '''
+        Calculate for every DataFrame in <df_dictionary>, serially unless an executor
+        is given (see parallel.calculate_all).  Results are keyed by security.
+
+        df_dictionary : dictionary of DataFrames (or None) keyed by security
+        executor : optional concurrent.futures executor to spread the work over
+        chunk_size : number of securities per task when using an executor
+        errors : dictionary to receive the error for each failed security when
+                 using an executor
+        as_of : date to calculate at (default: the latest date of each security)
+        '''
+        if executor is not None:
+            return parallel.calculate_all(self, 'calculate_current_df', df_dictionary,
+                                          parameter_list, executor, chunk_size, errors,
+                                          _as_of_kwargs(as_of))
+
         results = {}
         for security in df_dictionary:
             if df_dictionary[security] is not None:
                 results[security] = self.calculate_current_df(df_dictionary[security],
-                                                              *parameter_list)
+                                                              *parameter_list,
+                                                              **_as_of_kwargs(as_of))
             else:
                 results[security] = None
         return results
 
-    def calculate_timeseries_all(self, df_dictionary, *parameter_list):
+    @profiled(size_arg=1)
+    def calculate_timeseries_all(self, df_dictionary, *parameter_list, executor = None,
+                                 chunk_size = None, errors = None):
+        '''
+        Calculate for every DataFrame in <df_dictionary>, serially unless an executor
+        is given (see parallel.calculate_all).  Results are keyed by security.
+
+        df_dictionary : dictionary of DataFrames (or None) keyed by security
+        executor : optional concurrent.futures executor to spread the work over
+        chunk_size : number of securities per task when using an executor
+        errors : dictionary to receive the error for each failed security when
+                 using an executor
+        '''
+        if executor is not None:
+            return parallel.calculate_all(self, 'calculate_timeseries_df', df_dictionary,
+                                          parameter_list, executor, chunk_size, errors)
+
         results = {}
         for security in df_dictionary:
             if df_dictionary[security] is not None:
@@ -74,24 +193,41 @@ class Momentum(TechnicalIndicator):
     def __init__(self, n_days):
         TechnicalIndicator.__init__(self, TechnicalIndicator.MOMENTUM)
         self.n_days = n_days
+        self.reset()
+
+    def reset(self):
+        self.__prices = deque(maxlen = self.n_days + 1)
+
+    def update(self, price):
+        self.__prices.append(price)
+        if len(self.__prices) <= self.n_days:
+            return np.nan
+        return 100.0 * (self.__prices[-1] / self.__prices[0])
+
+    def seed(self, ts):
+        self.reset()
+        self.__prices.extend(ts.np_values[-self.n_days - 1:].tolist())
     
-    def calculate_current_ts(self, ts):
+    @profiled(size_arg=1)
+    def calculate_current_ts(self, ts, as_of = None):
         '''
         Calculate the price momentum for the provided time-series
         '''
+        ts = ts.as_of(as_of)
         if ts.ts_type == TimeseriesType.PRICE:
             return 100 * ts.calculate_latest_return(TimeseriesSubType.FRACTIONAL, self.n_days)
         elif ts.ts_type == TimeseriesType.RETURNS and \
           ts.ts_sub_type == TimeseriesSubType.FRACTIONAL and \
           ts.period == self.n_days:
-            return 100 * ts.values[-1]
+            return 100 * ts.np_values[-1]
         elif ts.ts_type == TimeseriesType.RETURNS and \
           ts.ts_sub_type == TimeseriesSubType.LOG and \
           ts.period == self.n_days:
-            return 100 * np.exp(ts.values[-1])
+            return 100 * np.exp(ts.np_values[-1])
         
         return None
     
+    @profiled(size_arg=1)
     def calculate_timeseries_ts(self, ts):
         '''
         Calculate the price momentum for the provided time-series
@@ -114,32 +250,130 @@ class Momentum(TechnicalIndicator):
 
         return mom
 
-    def calculate_current_df(self, df, date_col_name = DATE_COL_NAME,
-                          price_col_name = PRICE_COL_NAME):
-        dates = df[date_col_name].tolist()
-        prices = df[price_col_name].tolist()
-
-        ts = Timeseries(dates, prices, TimeseriesType.PRICE, TimeseriesSubType.ABSOLUTE)
-        return self.calculate_current_ts(ts)
-
-    def calculate_timeseries_df(self, df, date_col_name = DATE_COL_NAME,
-                                price_col_name = PRICE_COL_NAME):
-        dates = df[date_col_name].tolist()
-        prices = df[price_col_name].tolist()
+    @classmethod
+    @profiled(size_arg=1)
+    def sweep(cls, ts, parameter_grid):
+        '''
+        Momentum of price timeseries <ts> for every number of days in <parameter_grid>,
+        all taken from the one price array (see TechnicalIndicator.sweep)
+        '''
+        prices = ts.np_values
+        values = np.full((len(ts), len(parameter_grid)), np.nan, order = 'F')
+        for col, n_days in enumerate(parameter_grid):
+            if 0 < n_days < len(ts):
+                values[:-n_days, col] = prices[n_days:] / prices[:-n_days]
+        values *= 100.0
+        return _sweep_frame(ts, values, parameter_grid, 'n_days')
+
+    @profiled(size_arg=1)
+    def calculate_current_panel(self, panel, as_of = None):
+        '''
+        Calculate the latest price momentum for every security in the panel
+        '''
+        panel = panel.as_of(as_of)
+        mom = None
+        if panel.ts_type == TimeseriesType.PRICE:
+            mom = 100 * panel.calculate_latest_return(TimeseriesSubType.FRACTIONAL, self.n_days)
+        elif panel.ts_type == TimeseriesType.RETURNS and \
+          panel.ts_sub_type == TimeseriesSubType.FRACTIONAL and \
+          panel.period == self.n_days:
+            mom = 100 * panel.latest_values()
+        elif panel.ts_type == TimeseriesType.RETURNS and \
+          panel.ts_sub_type == TimeseriesSubType.LOG and \
+          panel.period == self.n_days:
+            mom = 100 * np.exp(panel.latest_values())
+
+        if mom is None:
+            return None
+        return pandas.Series(mom, index = panel.securities)
+
+    @profiled(size_arg=1)
+    def calculate_timeseries_panel(self, panel):
+        '''
+        Calculate the price momentum for every security in the panel
+        '''
+        mom = None
+        if panel.ts_type == TimeseriesType.PRICE:
+            mom = panel.calculate_returns(TimeseriesSubType.FRACTIONAL, \
+                                          self.n_days).linear_transform(100.0, 0)
+        elif panel.ts_type == TimeseriesType.RETURNS and \
+          panel.ts_sub_type == TimeseriesSubType.FRACTIONAL and \
+          panel.period == self.n_days:
+            mom = panel.linear_transform(100.0, 0)
+        elif panel.ts_type == TimeseriesType.RETURNS and \
+          panel.ts_sub_type == TimeseriesSubType.LOG and \
+          panel.period == self.n_days:
+            mom = panel.create_derived(np.exp(panel.values), TimeseriesType.RETURNS,
+                                       TimeseriesSubType.FRACTIONAL).linear_transform(100.0, 0)
+
+        if mom is not None:
+            mom.set_indicator_type(TechnicalIndicator.MOMENTUM)
 
-        ts = Timeseries(dates, prices, TimeseriesType.PRICE, TimeseriesSubType.ABSOLUTE)
-        return self.calculate_timeseries_ts(ts)
+        return mom
 
 
 class MACD(TechnicalIndicator):
+    OUTPUTS = ("macd", "signal")
+
     def __init__(self, short_days = 12, long_days = 26, signal_days = 9):
         TechnicalIndicator.__init__(self, TechnicalIndicator.MACD)
         assert short_days < long_days
         self.long_days = long_days
         self.short_days = short_days
         self.signal_days = signal_days
-
-    def calculate_current_ts(self, ts):
+        self.reset()
+
+    def reset(self):
+        self.__n_prices = 0
+        self.__fast = 0.0
+        self.__slow = 0.0
+        self.__signal = 0.0
+
+    def update(self, price):
+        self.__n_prices += 1
+        self.__fast = self.__update_average(self.__fast, price, self.short_days,
+                                            self.__n_prices)
+        self.__slow = self.__update_average(self.__slow, price, self.long_days,
+                                            self.__n_prices)
+        n_macd = self.__n_prices - self.long_days + 1
+        if n_macd < 1:
+            return (np.nan, np.nan)
+
+        macd = self.__fast * 1.0 + self.__slow * -1.0
+        self.__signal = self.__update_average(self.__signal, macd, self.signal_days, n_macd)
+        if n_macd < self.signal_days:
+            return (np.nan, np.nan)
+        return (macd, self.__signal)
+
+    @staticmethod
+    def __update_average(average, value, period, n_values):
+        '''
+        Step an exponential moving average seeded, as in the batch calculation, with
+        the equally weighted average of the first <period> values.  Until then
+        <average> holds the running sum.
+        '''
+        if n_values < period:
+            return average + value
+        elif n_values == period:
+            return (average + value) / period
+        alpha = 2.0 / (period + 1.0)
+        return value * alpha + average * (1.0 - alpha)
+
+    def seed(self, ts):
+        if len(ts) < self.long_days + self.signal_days - 1:
+            TechnicalIndicator.seed(self, ts)
+            return
+
+        self.__n_prices = len(ts)
+        self.__fast = ts.calculate_moving_average(TimeseriesSubType.EXPONENTIAL,
+                                                  self.short_days).np_values[-1]
+        self.__slow = ts.calculate_moving_average(TimeseriesSubType.EXPONENTIAL,
+                                                  self.long_days).np_values[-1]
+        self.__signal = self.calculate_timeseries_ts(ts)[1].np_values[-1]
+
+    @profiled(size_arg=1)
+    def calculate_current_ts(self, ts, as_of = None):
+        ts = ts.as_of(as_of)
         fast = ts.calculate_moving_average_truncate(TimeseriesSubType.EXPONENTIAL,
                                                     self.short_days, -self.signal_days)
         slow = ts.calculate_moving_average_truncate(TimeseriesSubType.EXPONENTIAL,
@@ -147,12 +381,13 @@ class MACD(TechnicalIndicator):
         macd = Timeseries.linearly_combine(fast, 1.0, slow, -1.0)
 
         if len(macd) == 0:
-            return (np.NaN, np.NaN)
+            return (np.nan, np.nan)
 
         signal = macd.calculate_single_moving_average(TimeseriesSubType.EXPONENTIAL,
                                                       self.signal_days)
-        return (macd.values[-1], signal)
+        return (macd.np_values[-1], signal)
 
+    @profiled(size_arg=1)
     def calculate_timeseries_ts(self, ts):
         fast = ts.calculate_moving_average(TimeseriesSubType.EXPONENTIAL,
                                            self.short_days)
@@ -170,36 +405,217 @@ class MACD(TechnicalIndicator):
 
         return (macd, signal)
 
-    def calculate_current_df(self, df, date_col_name = DATE_COL_NAME,
-                             price_col_name = PRICE_COL_NAME):
-        dates = df[date_col_name].tolist()
-        prices = df[price_col_name].tolist()
+    @classmethod
+    @profiled(size_arg=1)
+    def sweep(cls, ts, parameter_grid):
+        '''
+        MACD and signal of price timeseries <ts> for every (short, long, signal) in
+        <parameter_grid> (see TechnicalIndicator.sweep).  Each exponential moving
+        average of the prices is calculated once however many combinations use it,
+        as is each MACD line however many signal periods are applied to it.
+        '''
+        averages = {}
+        macd_lines = {}
+        macd_values = np.full((len(ts), len(parameter_grid)), np.nan, order = 'F')
+        signal_values = np.full((len(ts), len(parameter_grid)), np.nan, order = 'F')
+
+        for col, (short_days, long_days, signal_days) in enumerate(parameter_grid):
+            assert short_days < long_days
+            if (short_days, long_days) not in macd_lines:
+                for period in (short_days, long_days):
+                    if period not in averages:
+                        averages[period] = np.full(len(ts), np.nan)
+                        average = ts.calculate_moving_average(TimeseriesSubType.EXPONENTIAL,
+                                                              period)
+                        averages[period][period - 1:period - 1 + len(average)] = \
+                            average.np_values
+                macd_lines[(short_days, long_days)] = averages[short_days] - averages[long_days]
+
+            macd = macd_lines[(short_days, long_days)][long_days - 1:]
+            if signal_days > len(macd):
+                continue
+            alpha = 2.0 / (signal_days + 1.0)
+            first = long_days + signal_days - 2
+            signal_values[first:, col] = exponential_moving_average(
+                macd[signal_days - 1:], alpha, macd[:signal_days].sum() / signal_days)
+            macd_values[first:, col] = macd[signal_days - 1:]
+
+        return (_sweep_frame(ts, macd_values, parameter_grid, ['short', 'long', 'signal']),
+                _sweep_frame(ts, signal_values, parameter_grid, ['short', 'long', 'signal']))
+
+    @profiled(size_arg=1)
+    def calculate_current_panel(self, panel, as_of = None):
+        panel = panel.as_of(as_of)
+        fast = panel.calculate_moving_average_truncate(TimeseriesSubType.EXPONENTIAL,
+                                                       self.short_days, -self.signal_days)
+        slow = panel.calculate_moving_average_truncate(TimeseriesSubType.EXPONENTIAL,
+                                                       self.long_days, -self.signal_days)
+        macd = fast.create_derived(fast.values - slow.values)
+        signal = macd.calculate_single_moving_average(TimeseriesSubType.EXPONENTIAL,
+                                                      self.signal_days)
 
-        ts = Timeseries(dates, prices, TimeseriesType.PRICE, TimeseriesSubType.ABSOLUTE)
-        return self.calculate_current_ts(ts)
+        return (pandas.Series(macd.latest_values(), index = panel.securities),
+                pandas.Series(signal, index = panel.securities))
 
-    def calculate_timeseries_df(self, df, date_col_name = DATE_COL_NAME,
-                                price_col_name = PRICE_COL_NAME):
-        dates = df[date_col_name].tolist()
-        prices = df[price_col_name].tolist()
+    @profiled(size_arg=1)
+    def calculate_timeseries_panel(self, panel):
+        fast = panel.calculate_moving_average(TimeseriesSubType.EXPONENTIAL,
+                                              self.short_days)
+        slow = panel.calculate_moving_average(TimeseriesSubType.EXPONENTIAL,
+                                              self.long_days)
+        macd = fast.create_derived(fast.values - slow.values)
+        signal = macd.calculate_moving_average(TimeseriesSubType.EXPONENTIAL,
+                                               self.signal_days)
+        macd.values[np.isnan(signal.values)] = np.nan
 
-        ts = Timeseries(dates, prices, TimeseriesType.PRICE, TimeseriesSubType.ABSOLUTE)
-        return self.calculate_timeseries_ts(ts)
+        macd.set_indicator_type(TechnicalIndicator.MACD)
+        signal.set_indicator_type(TechnicalIndicator.MACD)
+
+        return (macd, signal)
 
 
 class RSI(TechnicalIndicator):
-    def __init__(self, period = 10):
+    def __init__(self, period = 10, smoothing = TimeseriesSubType.EQUAL):
+        '''
+        Relative strength index - 100 * gains / (gains + losses) over the last
+        <period> price changes, or 0 where the price has not moved at all.
+
+        period : number of price changes to average over
+        smoothing : Equal (sums over the window) or Wilder (averages smoothed
+                    exponentially with factor 1/period, seeded with the equally
+                    weighted average of the first <period> changes)
+        '''
         TechnicalIndicator.__init__(self, TechnicalIndicator.RSI)
+        assert smoothing in (TimeseriesSubType.EQUAL, TimeseriesSubType.WILDER)
         self.period = period
-
-    def calculate_current_ts(self, ts):
-        abs_returns = ts.calculate_returns(TimeseriesSubType.ABSOLUTE)
-        gains = sum(x for x in abs_returns.values[-self.period:] if x > 0)
-        losses = abs(sum(x for x in abs_returns.values[-self.period:] if x < 0))
-
-        rsi = 100.0 - ((100.0 / (1.0 + gains/losses)) if losses > 0 else 0)
-        return rsi
-    
+        self.smoothing = smoothing
+        self.reset()
+
+    def reset(self):
+        self.__last_price = None
+        self.__returns = deque(maxlen = self.period)
+        self.__n_updates = 0
+        self.__up_sum = 0.0
+        self.__dn_sum = 0.0
+        self.__n_up = 0
+        self.__n_dn = 0
+
+    @staticmethod
+    def __relative_strength(gains, losses):
+        '''
+        100 * gains / (gains + losses), 0 where both are 0 and NaN where either is NaN
+        '''
+        total = np.asarray(gains + losses)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            return np.where(total == 0, 0.0, 100.0 * gains / total)
+
+    def update(self, price):
+        if self.__last_price is None:
+            self.__last_price = price
+            return np.nan
+
+        abs_return = price - self.__last_price
+        self.__last_price = price
+        self.__n_updates += 1
+
+        if self.smoothing == TimeseriesSubType.WILDER:
+            return self.__update_wilder(abs_return)
+
+        if len(self.__returns) == self.period:
+            self.__add_return(self.__returns[0], -1)
+        self.__returns.append(abs_return)
+        self.__add_return(abs_return, 1)
+
+        # re-sum the window now and then so rounding in the running sums cannot build up
+        if self.__n_updates % self.period == 0:
+            self.__sum_returns()
+
+        if len(self.__returns) < self.period:
+            return np.nan
+        return float(self.__relative_strength(self.__up_sum, self.__dn_sum))
+
+    def __update_wilder(self, abs_return):
+        gain = max(abs_return, 0.0)
+        loss = max(-abs_return, 0.0)
+        if self.__n_updates < self.period:
+            self.__up_sum += gain
+            self.__dn_sum += loss
+            return np.nan
+        if self.__n_updates == self.period:
+            self.__up_sum = (self.__up_sum + gain) / self.period
+            self.__dn_sum = (self.__dn_sum + loss) / self.period
+        else:
+            alpha = 1.0 / self.period
+            self.__up_sum = alpha * gain + (1.0 - alpha) * self.__up_sum
+            self.__dn_sum = alpha * loss + (1.0 - alpha) * self.__dn_sum
+        return float(self.__relative_strength(self.__up_sum, self.__dn_sum))
+
+    def __add_return(self, abs_return, sign):
+        if abs_return > 0:
+            self.__up_sum += sign * abs_return
+            self.__n_up += sign
+        elif abs_return < 0:
+            self.__dn_sum -= sign * abs_return
+            self.__n_dn += sign
+        # exact zero for windows with no gains or no losses
+        if self.__n_up == 0:
+            self.__up_sum = 0.0
+        if self.__n_dn == 0:
+            self.__dn_sum = 0.0
+
+    def __sum_returns(self):
+        returns = np.array(self.__returns)
+        self.__up_sum = returns.clip(min = 0).sum()
+        self.__dn_sum = -returns.clip(max = 0).sum()
+        self.__n_up = int((returns > 0).sum())
+        self.__n_dn = int((returns < 0).sum())
+
+    def __average_gains_losses(self, abs_returns):
+        '''
+        Smoothed gains and losses of each window of <period> returns
+        '''
+        gains = abs_returns.clip(min = 0)
+        losses = -abs_returns.clip(max = 0)
+        if self.smoothing == TimeseriesSubType.WILDER:
+            alpha = 1.0 / self.period
+            return (exponential_moving_average(gains[self.period - 1:], alpha,
+                                               gains[:self.period].mean()),
+                    exponential_moving_average(losses[self.period - 1:], alpha,
+                                               losses[:self.period].mean()))
+        return rolling_sum(gains, self.period), rolling_sum(losses, self.period)
+
+    def seed(self, ts):
+        if len(ts) <= self.period:
+            TechnicalIndicator.seed(self, ts)
+            return
+
+        self.reset()
+        self.__last_price = ts.np_values[-1]
+        self.__n_updates = len(ts) - 1
+        if self.smoothing == TimeseriesSubType.WILDER:
+            gains, losses = self.__average_gains_losses(np.diff(ts.np_values))
+            self.__up_sum = gains[-1]
+            self.__dn_sum = losses[-1]
+            return
+
+        self.__returns.extend(np.diff(ts.np_values[-self.period - 1:]).tolist())
+        self.__sum_returns()
+
+    @profiled(size_arg=1)
+    def calculate_current_ts(self, ts, as_of = None):
+        ts = ts.as_of(as_of)
+        if len(ts) < 2:
+            return np.nan
+        if self.smoothing == TimeseriesSubType.WILDER:
+            rsi = self.calculate_timeseries_ts(ts)
+            return rsi.np_values[-1] if len(rsi) > 0 else np.nan
+
+        abs_returns = np.diff(ts.np_values[-self.period - 1:])
+        gains = abs_returns.clip(min = 0).sum()
+        losses = -abs_returns.clip(max = 0).sum()
+        return float(self.__relative_strength(gains, losses))
+
+    @profiled(size_arg=1)
     def calculate_timeseries_ts(self, ts):
         if self.period > len(ts):
             return Timeseries([],[], TimeseriesType.INDICATOR, TechnicalIndicator.RSI)
@@ -209,36 +625,104 @@ class RSI(TechnicalIndicator):
         elif ts.ts_type == TimeseriesType.RETURNS:
             abs_returns = ts
 
-        vals_np = np.array(abs_returns.values)
-        up_vals_np = vals_np.clip(min = 0)
-        dn_vals_np = vals_np.clip(max = 0)
-
-        up_sum = up_vals_np[self.period - 1:]
-        dn_sum = -dn_vals_np[self.period - 1:]
-        
-        for ii in range(1, self.period):
-            up_sum = up_sum + up_vals_np[self.period - 1 - ii: -ii]
-            dn_sum = dn_sum - dn_vals_np[self.period - 1 - ii: -ii]
-
-        rsi_vals = []
-        for ii in range(len(up_sum)):
-            rsi_vals.append(100.0 - (100.0 / (1.0 + up_sum[ii]/dn_sum[ii])) if dn_sum[ii] > 0 else 0)
-
-        return Timeseries(abs_returns.dates[self.period - 1:], rsi_vals,
-                          TimeseriesType.INDICATOR, TechnicalIndicator.RSI)
-
-    def calculate_current_df(self, df, date_col_name = DATE_COL_NAME,
-                             price_col_name = PRICE_COL_NAME):
-        dates = df[date_col_name].tolist()
-        prices = df[price_col_name].tolist()
-
-        ts = Timeseries(dates, prices, TimeseriesType.PRICE, TimeseriesSubType.ABSOLUTE)
-        return self.calculate_current_ts(ts)
+        if self.period > len(abs_returns):
+            return Timeseries([],[], TimeseriesType.INDICATOR, TechnicalIndicator.RSI)
 
-    def calculate_timeseries_df(self, df, date_col_name = DATE_COL_NAME,
-                                price_col_name = PRICE_COL_NAME):
-        dates = df[date_col_name].tolist()
-        prices = df[price_col_name].tolist()
+        gains, losses = self.__average_gains_losses(abs_returns.np_values)
+        return abs_returns.create_derived(self.__relative_strength(gains, losses),
+                                          self.period - 1,
+                                          TimeseriesType.INDICATOR, TechnicalIndicator.RSI)
 
-        ts = Timeseries(dates, prices, TimeseriesType.PRICE, TimeseriesSubType.ABSOLUTE)
-        return self.calculate_timeseries_ts(ts)
+    @classmethod
+    @profiled(size_arg=1)
+    def sweep(cls, ts, parameter_grid):
+        '''
+        RSI of price timeseries <ts> for every period (or (period, smoothing)) in
+        <parameter_grid> (see TechnicalIndicator.sweep).  The window sums of gains and
+        losses for all the equally weighted periods come from one shared pass of
+        block prefix sums (rolling.rolling_sums).
+        '''
+        abs_returns = np.diff(ts.np_values)
+        gains = abs_returns.clip(min = 0)
+        losses = -abs_returns.clip(max = 0)
+        values = np.full((len(ts), len(parameter_grid)), np.nan, order = 'F')
+
+        settings = [p if isinstance(p, tuple) else (p, TimeseriesSubType.EQUAL)
+                    for p in parameter_grid]
+        equal_cols = [col for col, (_, smoothing) in enumerate(settings)
+                      if smoothing == TimeseriesSubType.EQUAL]
+        equal_periods = [settings[col][0] for col in equal_cols]
+        values[:-1, equal_cols] = cls.__relative_strength(rolling_sums(gains, equal_periods),
+                                                          rolling_sums(losses, equal_periods))
+
+        for col, (period, smoothing) in enumerate(settings):
+            if smoothing == TimeseriesSubType.WILDER and 0 < period <= len(abs_returns):
+                alpha = 1.0 / period
+                values[period - 1:-1, col] = cls.__relative_strength(
+                    exponential_moving_average(gains[period - 1:], alpha, gains[:period].mean()),
+                    exponential_moving_average(losses[period - 1:], alpha, losses[:period].mean()))
+        return _sweep_frame(ts, values, parameter_grid, 'period')
+
+    @profiled(size_arg=1)
+    def calculate_current_panel(self, panel, as_of = None):
+        panel = panel.as_of(as_of)
+        if len(panel) == 0:
+            return pandas.Series(np.nan, index = panel.securities)
+        if self.smoothing == TimeseriesSubType.WILDER:
+            rsi = self.calculate_timeseries_panel(panel)
+            last = rsi.last_valid()
+            latest = rsi.latest_values()
+            latest[last != panel.last_valid() - 1] = np.nan
+            return pandas.Series(latest, index = panel.securities)
+
+        abs_returns = panel.calculate_returns(TimeseriesSubType.ABSOLUTE)
+        first = panel.first_valid()
+        last = panel.last_valid()
+
+        window_rows = last - 1 - np.arange(self.period)[:, np.newaxis]
+        window_returns = abs_returns.values[np.clip(window_rows, 0, len(panel) - 1),
+                                            np.arange(len(panel.securities))]
+        window_returns = np.where(window_rows >= first, window_returns, 0.0)
+        gains = window_returns.clip(min = 0).sum(axis = 0)
+        losses = -window_returns.clip(max = 0).sum(axis = 0)
+
+        rsi = self.__relative_strength(gains, losses)
+        rsi[last < 0] = np.nan
+        rsi[last <= first] = np.nan
+        return pandas.Series(rsi, index = panel.securities)
+
+    @profiled(size_arg=1)
+    def calculate_timeseries_panel(self, panel):
+        if panel.ts_type == TimeseriesType.PRICE:
+            abs_returns = panel.calculate_returns(TimeseriesSubType.ABSOLUTE)
+        elif panel.ts_type == TimeseriesType.RETURNS:
+            abs_returns = panel
+
+        gains = abs_returns.create_derived(abs_returns.values.clip(min = 0))
+        losses = abs_returns.create_derived(-abs_returns.values.clip(max = 0))
+        if self.smoothing == TimeseriesSubType.WILDER:
+            gains = gains.calculate_moving_average(TimeseriesSubType.WILDER, self.period).values
+            losses = losses.calculate_moving_average(TimeseriesSubType.WILDER, self.period).values
+        else:
+            gains = gains.calculate_moving_average(TimeseriesSubType.EQUAL, self.period).values
+            losses = losses.calculate_moving_average(TimeseriesSubType.EQUAL, self.period).values
+
+        return abs_returns.create_derived(self.__relative_strength(gains, losses),
+                                          TimeseriesType.INDICATOR, TechnicalIndicator.RSI)
+
+
+def _as_of_kwargs(as_of):
+    return {'as_of': as_of} if as_of is not None else {}
+
+
+def _sweep_frame(ts, values, parameter_grid, names = None):
+    '''
+    DataFrame of sweep <values> indexed by the dates of <ts>, one column per parameter set
+    '''
+    if len(parameter_grid) > 0 and isinstance(parameter_grid[0], tuple):
+        columns = pandas.MultiIndex.from_tuples(parameter_grid,
+                                                names = names if isinstance(names, list) else None)
+    else:
+        columns = pandas.Index(parameter_grid, name = names)
+    return pandas.DataFrame(values, columns = columns,
+                            index = pandas.DatetimeIndex(ts.date_index.view('datetime64[ns]')))
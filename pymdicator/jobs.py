@@ -0,0 +1,131 @@
+import logging as log
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pymdicator.cache import LRUCache
+
+
+class JobStatus:
+    PENDING = "Pending"
+    RUNNING = "Running"
+    DONE = "Done"
+    FAILED = "Failed"
+
+
+class Job(object):
+    def __init__(self, key):
+        '''
+        Initialize a job - one run of a calculation on a background worker.
+
+        key : hashable description of the calculation (e.g. indicator and parameters);
+              jobs with the same key share one computation while it is running
+        '''
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = JobStatus.PENDING
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.__done = threading.Event()
+
+    def done(self):
+        return self.__done.is_set()
+
+    def wait(self, timeout = None):
+        '''
+        Wait for the job to finish, returning whether it has
+        '''
+        return self.__done.wait(timeout)
+
+    def info(self):
+        '''
+        Dictionary describing the job (without its result)
+        '''
+        return {'id': self.id, 'status': self.status, 'error': self.error,
+                'submitted': self.submitted, 'started': self.started,
+                'finished': self.finished}
+
+    def _run(self, function, parameter_list, on_finish = None):
+        self.status = JobStatus.RUNNING
+        self.started = time.time()
+        try:
+            self.result = function(*parameter_list)
+            self.status = JobStatus.DONE
+        except Exception:
+            self.error = traceback.format_exc()
+            self.status = JobStatus.FAILED
+            log.error("Job %s failed: %s", self.id, self.error)
+        finally:
+            self.finished = time.time()
+            if on_finish is not None:
+                on_finish(self)
+            self.__done.set()
+
+
+class JobManager(object):
+    def __init__(self, executor = None, max_workers = None, max_jobs = 1000):
+        '''
+        Initialize a manager running calculations on a pool of background workers.
+
+        Submitting returns a job straight away; callers poll or wait on it for the
+        result.  A submission with the same key as a job that has not finished yet
+        is coalesced onto that job rather than computed again.
+
+        executor : in-process executor to run jobs on (default: a ThreadPoolExecutor)
+        max_workers : number of threads for the default executor
+        max_jobs : number of jobs (finished or not) remembered for lookup by id
+        '''
+        self.executor = executor if executor is not None else \
+            ThreadPoolExecutor(max_workers = max_workers)
+        self.coalesced = 0
+        self.__jobs = LRUCache(max_jobs)
+        self.__running = {}
+        self.__lock = threading.Lock()
+
+    def submit(self, key, function, *parameter_list):
+        '''
+        Run function(*parameter_list) in the background, returning its job.
+
+        key : hashable description of the calculation, used for coalescing
+        function : calculation to run
+        '''
+        with self.__lock:
+            job = self.__running.get(key)
+            if job is not None:
+                self.coalesced += 1
+                return job
+            job = Job(key)
+            self.__running[key] = job
+            self.__jobs.put(job.id, job)
+
+        self.executor.submit(self.__run, job, function, parameter_list)
+        return job
+
+    def get(self, job_id):
+        '''
+        Job with id <job_id>, or None if it is unknown or has been forgotten
+        '''
+        return self.__jobs.get(job_id)
+
+    def info(self):
+        '''
+        Dictionary of job statistics
+        '''
+        with self.__lock:
+            running = len(self.__running)
+        return {'jobs': len(self.__jobs), 'active': running, 'coalesced': self.coalesced}
+
+    def shutdown(self, wait = True):
+        self.executor.shutdown(wait = wait)
+
+    def __run(self, job, function, parameter_list):
+        job._run(function, parameter_list, self.__finish)
+
+    def __finish(self, job):
+        with self.__lock:
+            if self.__running.get(job.key) is job:
+                del self.__running[job.key]
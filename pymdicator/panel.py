@@ -0,0 +1,368 @@
+import pandas as pd
+import numpy as np
+import logging as log
+from pymdicator.timeseries import Timeseries, TimeseriesType, TimeseriesSubType, \
+    DATE_COL_NAME, PRICE_COL_NAME, to_date_index, smoothing_factor
+from pymdicator.rolling import rolling_mean, linear_recurrence
+from pymdicator.resample import Aggregation, bar_starts, bar_ends, aggregate
+
+
+class Panel(object):
+    def __init__(self, dates, securities, values, tsType = None, tsSubType = None, period = None,
+                 dtype = None):
+        '''
+        Initialize panel object - a matrix of values with one row per date and one
+        column per security, on a calendar shared by all the securities.
+        Dates are assumed to be passed in in order.
+
+        NaN marks a date on which a security has no value.  Each column is expected
+        to hold a single contiguous run of values (history may start and end at
+        different dates for each security); a NaN inside the run propagates into
+        every windowed or exponentially weighted value that depends on it.
+
+        As for timeseries, a float32 panel keeps float32 values (in its derived
+        panels too) but accumulates averages in float64.
+
+        dates : list of dates, or int64 array of nanoseconds since the epoch
+        securities : list of security names
+        values : 2-D array of values, dates x securities
+        tsType : timeseries type
+        tsSubType : timeseries subtype
+        period : periodicity
+        dtype : floating point dtype of the values (default float64)
+        '''
+        values = np.asarray(values, dtype=dtype if dtype is not None else float)
+        if values.shape != (len(dates), len(securities)):
+            log.error("Cannot create panel - mis-match in shape")
+            return None
+
+        if isinstance(dates, np.ndarray) and dates.dtype == np.int64:
+            self.date_index = dates
+        else:
+            self.date_index = pd.DatetimeIndex(dates).values.astype('datetime64[ns]').view(np.int64)
+        self.securities = list(securities)
+        self.values = values
+        self.ts_type = tsType
+        self.ts_sub_type = tsSubType
+        self.period = period
+
+    @staticmethod
+    def from_frames(df_dictionary, date_col_name = DATE_COL_NAME,
+                    price_col_name = PRICE_COL_NAME, dtype = None):
+        '''
+        Create a price panel from a dictionary of security -> DataFrame, on the union
+        of all their dates.  Securities with no DataFrame get a column of NaN.
+
+        df_dictionary : dictionary of DataFrames (or None) keyed by security
+        date_col_name : name of the date column
+        price_col_name : name of the price column
+        dtype : floating point dtype of the values (default float64)
+        '''
+        securities = list(df_dictionary)
+        all_dates = []
+        all_prices = []
+        for security in securities:
+            df = df_dictionary[security]
+            if df is None:
+                all_dates.append(np.empty(0, dtype=np.int64))
+                all_prices.append(np.empty(0))
+            else:
+                dates = pd.DatetimeIndex(df[date_col_name]).values
+                all_dates.append(dates.astype('datetime64[ns]').view(np.int64))
+                all_prices.append(df[price_col_name].to_numpy(dtype=float))
+
+        if len(securities) > 0:
+            date_index = np.unique(np.concatenate(all_dates))
+        else:
+            date_index = np.empty(0, dtype=np.int64)
+
+        values = np.full((len(date_index), len(securities)), np.nan)
+        for col in range(len(securities)):
+            values[np.searchsorted(date_index, all_dates[col]), col] = all_prices[col]
+
+        return Panel(date_index, securities, values,
+                     TimeseriesType.PRICE, TimeseriesSubType.ABSOLUTE, dtype=dtype)
+
+    def __len__(self):
+        return len(self.date_index)
+
+    def create_derived(self, values, ts_type = None, ts_sub_type = None, period = None):
+        '''
+        Create a panel on the same dates and securities (and dtype) as this panel.
+
+        values : 2-D array of values
+        ts_type : timeseries type
+        ts_sub_type : timeseries subtype
+        period : periodicity
+        '''
+        return Panel(self.date_index, self.securities, values, ts_type, ts_sub_type, period,
+                     dtype=self.values.dtype)
+
+    def select(self, columns):
+        '''
+        Create a panel of the securities at positions <columns>, on the same dates
+
+        columns : list or array of column positions
+        '''
+        columns = np.asarray(columns, dtype=np.intp)
+        return Panel(self.date_index, [self.securities[col] for col in columns],
+                     self.values[:, columns], self.ts_type, self.ts_sub_type, self.period,
+                     dtype=self.values.dtype)
+
+    def slice_dates(self, start = None, end = None):
+        '''
+        Create a panel of the rows dated from <start> to <end> inclusive, found by
+        binary search of the date index.  The values are a view, not a copy.
+
+        start : first date (None for the first row)
+        end : last date (None for the last row)
+        '''
+        start_idx = 0
+        end_idx = len(self)
+        if start is not None:
+            start_idx = int(np.searchsorted(self.date_index, to_date_index(start), side='left'))
+        if end is not None:
+            end_idx = int(np.searchsorted(self.date_index, to_date_index(end), side='right'))
+        end_idx = max(start_idx, end_idx)
+        return Panel(self.date_index[start_idx:end_idx], self.securities,
+                     self.values[start_idx:end_idx], self.ts_type, self.ts_sub_type, self.period,
+                     dtype=self.values.dtype)
+
+    def as_of(self, date):
+        '''
+        Panel of the rows dated on or before <date> - the history known on that date.
+        Returns this panel if <date> is None.
+
+        date : date (see timeseries.to_date_index)
+        '''
+        if date is None:
+            return self
+        return self.slice_dates(None, date)
+
+    def resample(self, frequency, how = Aggregation.LAST):
+        '''
+        Create a panel of bars of <frequency> for every security at once, each dated
+        by the last date in it (see Timeseries.resample).  Missing values are
+        skipped, and a security with no value in a bar gets NaN.
+
+        frequency : Daily/Weekly/Monthly/Quarterly/Yearly (resample.Frequency) or an
+                    intraday bar length such as "5min"
+        how : First/Last/Max/Min/Sum/Mean/Count (resample.Aggregation)
+        '''
+        starts = bar_starts(self.date_index, frequency)
+        return Panel(self.date_index[bar_ends(starts, len(self))], self.securities,
+                     aggregate(self.values, starts, how), self.ts_type, self.ts_sub_type,
+                     frequency, dtype=self.values.dtype)
+
+    def first_valid(self):
+        '''
+        Row of the first value in each column, len(self) for an empty column
+        '''
+        valid = ~np.isnan(self.values)
+        first = valid.argmax(axis=0)
+        first[~valid.any(axis=0)] = len(self)
+        return first
+
+    def last_valid(self):
+        '''
+        Row of the last value in each column, -1 for an empty column
+        '''
+        valid = ~np.isnan(self.values)
+        last = len(self) - 1 - valid[::-1].argmax(axis=0)
+        last[~valid.any(axis=0)] = -1
+        return last
+
+    def latest_values(self):
+        '''
+        Last value of each security, NaN for an empty column
+        '''
+        last = self.last_valid()
+        has_value = last >= 0
+        latest = np.full(len(self.securities), np.nan)
+        latest[has_value] = self.values[last[has_value],
+                                        np.arange(len(self.securities))[has_value]]
+        return latest
+
+    def column(self, security):
+        '''
+        Create a timeseries from the run of values for <security>
+        '''
+        col = self.securities.index(security)
+        first = self.first_valid()[col]
+        last = self.last_valid()[col]
+        return Timeseries.from_arrays(self.date_index[first:last + 1],
+                                      self.values[first:last + 1, col], self.ts_type,
+                                      self.ts_sub_type, self.period, self.values.dtype)
+
+    def to_frame(self):
+        '''
+        Convert to a DataFrame indexed by date with one column per security
+        '''
+        return pd.DataFrame(self.values, columns = self.securities,
+                            index = pd.DatetimeIndex(self.date_index.view('datetime64[ns]')))
+
+    def calculate_returns(self, returns_type = TimeseriesSubType.FRACTIONAL, period = 1):
+        '''
+        Calculate a panel of returns.  As for timeseries, returns are indexed by
+        starting day; the last <period> rows are NaN.
+
+        returns_type : Fractional/Logarithmic/Absolute
+        period : number of days to calculate each return over
+        '''
+        new_values = np.full_like(self.values, np.nan)
+        if period < len(self):
+            if returns_type == TimeseriesSubType.FRACTIONAL:
+                new_values[:-period] = self.values[period:] / self.values[:-period]
+            elif returns_type == TimeseriesSubType.ABSOLUTE:
+                new_values[:-period] = self.values[period:] - self.values[:-period]
+            elif returns_type == TimeseriesSubType.LOG:
+                new_values[:-period] = np.log(self.values[period:] / self.values[:-period])
+
+        return self.create_derived(new_values, TimeseriesType.RETURNS, returns_type, period)
+
+    def calculate_latest_return(self, returns_type = TimeseriesSubType.FRACTIONAL, period = 1):
+        '''
+        Calculate the latest return for each security, ending at its last value.
+
+        returns_type : Fractional/Logarithmic/Absolute
+        period : number of days to calculate the return over
+        '''
+        last = self.last_valid()
+        start = last - period
+        has_return = start >= self.first_valid()
+        cols = np.arange(len(self.securities))[has_return]
+        latest = self.values[last[has_return], cols]
+        earliest = self.values[start[has_return], cols]
+
+        returns = np.full(len(self.securities), np.nan)
+        if returns_type == TimeseriesSubType.FRACTIONAL:
+            returns[has_return] = latest / earliest
+        elif returns_type == TimeseriesSubType.ABSOLUTE:
+            returns[has_return] = latest - earliest
+        elif returns_type == TimeseriesSubType.LOG:
+            returns[has_return] = np.log(latest / earliest)
+        return returns
+
+    def calculate_moving_average(self, weighting_type = TimeseriesSubType.EQUAL, period = 15):
+        '''
+        Calculate a moving average panel, NaN until each security has <period> values.
+        Exponential and Wilder averages are seeded with the equally weighted average
+        of the first <period> values of each security.
+
+        weighting_type : Exponential/Equal/Wilder
+        period : period for moving average calculation
+        '''
+        moving_average = np.full_like(self.values, np.nan)
+
+        if period <= len(self):
+            window_means = rolling_mean(self.values, period)
+            if weighting_type == TimeseriesSubType.EQUAL:
+                moving_average[period - 1:] = window_means
+            else:
+                alpha = smoothing_factor(weighting_type, period)
+                seed_rows = self.first_valid() + period - 1
+                seeds = np.full(len(self.securities), np.nan)
+                seeded = seed_rows < len(self)
+                seeds[seeded] = window_means[seed_rows[seeded] - period + 1, seeded]
+                moving_average = self.__seeded_moving_average(alpha, seed_rows, seeds)
+
+        return self.create_derived(moving_average, TimeseriesType.MOVING_AVERAGE,
+                                   weighting_type, period)
+
+    def calculate_single_moving_average(self, weighting_type = TimeseriesSubType.EQUAL,
+                                        period = 15, rows = None):
+        '''
+        Calculate one moving average per security.  As for timeseries, exponential
+        (and Wilder) weighting is truncated at the point with 1/100th the weight of the
+        latest point.  NaN for securities with fewer than <period> values.
+
+        weighting_type : Exponential/Equal/Wilder
+        period : period for moving average calculation
+        rows : row to calculate at for each security (defaults to the last value)
+        '''
+        first = self.first_valid()
+        last = self.last_valid()
+        if rows is None:
+            rows = last
+        if len(self) == 0:
+            return np.full(len(self.securities), np.nan)
+
+        if weighting_type == TimeseriesSubType.EQUAL:
+            n_window = period
+            weights = np.ones(n_window)
+        else:
+            alpha = smoothing_factor(weighting_type, period)
+            n_window = int(-2.0 / np.log10(1 - alpha) + 1) + 1
+            weights = (1 - alpha) ** np.arange(n_window)
+
+        window_rows = rows - np.arange(n_window)[:, np.newaxis]
+        in_window = (window_rows >= first) & (window_rows <= last)
+        window_values = self.values[np.clip(window_rows, 0, len(self) - 1),
+                                    np.arange(len(self.securities))]
+        window_values = np.where(in_window, window_values, 0.0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            averages = (window_values * weights[:, np.newaxis]).sum(axis=0) / \
+                       (in_window * weights[:, np.newaxis]).sum(axis=0)
+        averages[(last - first + 1 < period) | (rows < first) | (rows > last)] = np.nan
+        if weighting_type == TimeseriesSubType.EQUAL:
+            averages[rows - period + 1 < first] = np.nan
+        return averages
+
+    def calculate_moving_average_truncate(self, weighting_type = TimeseriesSubType.EQUAL,
+                                          period = 15, start_idx = None):
+        '''
+        Calculate a moving average panel starting <start_idx> values into each security.
+        Exponential and Wilder averages are seeded with the truncated single moving
+        average.
+
+        weighting_type : Equal/Exponential/Wilder
+        period : Period to use for calculation
+        start_idx : Index (from each security's first value) to start calculation for
+        '''
+        if start_idx == None or period > start_idx + 1:
+            start_idx = period - 1
+
+        if weighting_type == TimeseriesSubType.EQUAL:
+            moving_average = self.calculate_moving_average(weighting_type, period)
+            start_rows = self.first_valid() + start_idx
+            moving_average.values[np.arange(len(self))[:, np.newaxis] < start_rows] = np.nan
+            return moving_average
+
+        alpha = smoothing_factor(weighting_type, period)
+        seed_rows = self.first_valid() + start_idx
+        seeds = self.calculate_single_moving_average(weighting_type, period, seed_rows)
+        return self.create_derived(self.__seeded_moving_average(alpha, seed_rows, seeds),
+                                   TimeseriesType.MOVING_AVERAGE, weighting_type, period)
+
+    def __seeded_moving_average(self, alpha, seed_rows, seeds):
+        '''
+        Exponential moving average of each column with smoothing factor <alpha>,
+        starting from seeds[col] at seed_rows[col] and NaN before it.
+        '''
+        before_seed = np.arange(len(self))[:, np.newaxis] < seed_rows
+        seeded = seed_rows < len(self)
+
+        inputs = np.multiply(self.values, alpha, dtype=np.float64)
+        inputs[before_seed] = 0.0
+        inputs[seed_rows[seeded], np.arange(len(self.securities))[seeded]] = seeds[seeded]
+
+        moving_average = linear_recurrence(inputs, 1.0 - alpha)
+        moving_average[before_seed] = np.nan
+        return moving_average
+
+    def linear_transform(self, factor, shift):
+        '''
+        Apply a linear shift to panel <values> -> factor * <values> + shift
+        factor : Scaling factor
+        shift : shift
+        '''
+        return self.create_derived(self.values * factor * 1.0 + shift * 1.0,
+                                   self.ts_type, self.ts_sub_type, self.period)
+
+    def set_indicator_type(self, new_subtype):
+        '''
+        Set the panel type information
+        '''
+        self.ts_type = TimeseriesType.INDICATOR
+        self.ts_sub_type = new_subtype
@@ -0,0 +1,132 @@
+import pandas as pd
+import numpy as np
+import logging as log
+import os
+import traceback
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+from pymdicator.panel import DATE_COL_NAME, PRICE_COL_NAME
+
+
+def calculate_all(indicator, method_name, df_dictionary, parameter_list, executor,
+                  chunk_size = None, errors = None, method_kwargs = None):
+    '''
+    Run indicator.<method_name>(df, *parameter_list, **method_kwargs) for every DataFrame in
+    <df_dictionary> on <executor>.
+
+    Only the date and price columns are sent to the workers: they are packed
+    once into a shared memory block and each task carries just the offsets of
+    its chunk of securities, so no DataFrame is pickled.  Workers rebuild a
+    DataFrame of those two columns (dates as datetime64) for each security.
+    Results are returned in the order of <df_dictionary>.  A security whose
+    calculation raises gets a result of None, and the error is logged and
+    recorded in <errors>, without stopping the others.
+
+    indicator : technical indicator to run
+    method_name : calculate_current_df/calculate_timeseries_df
+    df_dictionary : dictionary of DataFrames (or None) keyed by security
+    parameter_list : further parameters for the method, starting with the
+                     date and price column names if given
+    executor : concurrent.futures executor (normally a ProcessPoolExecutor)
+    chunk_size : number of securities per task (default: about four tasks per CPU)
+    errors : dictionary to receive an error message for each failed security
+    method_kwargs : further keyword parameters for the method
+    '''
+    date_col_name = parameter_list[0] if len(parameter_list) > 0 else DATE_COL_NAME
+    price_col_name = parameter_list[1] if len(parameter_list) > 1 else PRICE_COL_NAME
+
+    securities = [s for s in df_dictionary if df_dictionary[s] is not None]
+    all_dates = []
+    all_prices = []
+    for security in securities:
+        df = df_dictionary[security]
+        dates = pd.DatetimeIndex(df[date_col_name]).values
+        all_dates.append(dates.astype('datetime64[ns]').view(np.int64))
+        all_prices.append(df[price_col_name].to_numpy(dtype=float))
+
+    offsets = np.zeros(len(securities) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(prices) for prices in all_prices])
+    n_points = int(offsets[-1])
+
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(securities) // (4 * (os.cpu_count() or 1))))
+
+    shm = shared_memory.SharedMemory(create=True, size=max(16 * n_points, 1))
+    try:
+        shared_prices, shared_dates = _shared_arrays(shm, n_points)
+        if n_points > 0:
+            np.concatenate(all_prices, out=shared_prices)
+            np.concatenate(all_dates, out=shared_dates)
+        del shared_prices, shared_dates
+
+        futures = []
+        for start in range(0, len(securities), chunk_size):
+            chunk = [(securities[ii], int(offsets[ii]), int(offsets[ii + 1]))
+                     for ii in range(start, min(start + chunk_size, len(securities)))]
+            futures.append(executor.submit(_calculate_chunk, shm.name, n_points, os.getpid(),
+                                           chunk, indicator, method_name,
+                                           date_col_name, price_col_name, parameter_list,
+                                           method_kwargs or {}))
+
+        chunk_results = {}
+        for future in futures:
+            for security, result, error in future.result():
+                if error is not None:
+                    log.error("Calculation failed for %s: %s", security, error)
+                    if errors is not None:
+                        errors[security] = error
+                chunk_results[security] = result
+    finally:
+        shm.close()
+        shm.unlink()
+
+    results = {}
+    for security in df_dictionary:
+        results[security] = chunk_results.get(security)
+    return results
+
+
+def _shared_arrays(shm, n_points):
+    prices = np.ndarray((n_points,), dtype=np.float64, buffer=shm.buf)
+    dates = np.ndarray((n_points,), dtype=np.int64, buffer=shm.buf, offset=8 * n_points)
+    return prices, dates
+
+
+def _attach(shm_name, owner_pid):
+    '''
+    Attach to the shared memory block without handing it to a resource tracker of
+    this process' own, which would otherwise unlink it when the worker exits.
+    Processes started by multiprocessing (fork, spawn or forkserver) share the
+    owner's tracker, so must leave its registration alone for the owner's unlink.
+    '''
+    try:
+        return shared_memory.SharedMemory(name=shm_name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        if os.getpid() != owner_pid and multiprocessing.parent_process() is None:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _calculate_chunk(shm_name, n_points, owner_pid, chunk, indicator, method_name,
+                     date_col_name, price_col_name, parameter_list, method_kwargs):
+    shm = _attach(shm_name, owner_pid)
+    try:
+        shared_prices, shared_dates = _shared_arrays(shm, n_points)
+        frames = []
+        for security, start, stop in chunk:
+            frames.append((security, pd.DataFrame({
+                date_col_name: shared_dates[start:stop].copy().view('datetime64[ns]'),
+                price_col_name: shared_prices[start:stop].copy()})))
+        del shared_prices, shared_dates
+    finally:
+        shm.close()
+
+    results = []
+    for security, df in frames:
+        try:
+            results.append((security, getattr(indicator, method_name)(df, *parameter_list,
+                                                                       **method_kwargs), None))
+        except Exception:
+            results.append((security, None, traceback.format_exc()))
+    return results
@@ -0,0 +1,224 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+# Bound on the trace events a profiler keeps; later events are counted but dropped
+MAX_EVENTS = 100000
+
+# Profiler currently recording, None when profiling is off
+_active = None
+
+
+class Profiler(object):
+    def __init__(self, memory = False, max_events = MAX_EVENTS):
+        '''
+        Initialize a profiler recording, for every instrumented stage (Timeseries
+        methods, indicator calculations, rolling kernels, or any stage() block),
+        the number of calls, wall time, time outside nested stages, input sizes
+        and optionally the bytes allocated.  Use it as a context manager:
+
+            with Profiler() as profiler:
+                indicator.calculate_current(data)
+            print(profiler.table())
+            profiler.save_trace("trace.json")
+
+        Calls on every thread of this process are recorded, but not those in
+        worker processes.  When no profiler is running an instrumented call costs
+        one extra function call and a global lookup.
+
+        memory : whether to trace allocations (with tracemalloc, which is slow)
+        max_events : number of trace events kept for the Chrome trace
+        '''
+        self.memory = memory
+        self.max_events = max_events
+        self.stages = {}
+        self.events = []
+        self.dropped_events = 0
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.__origin = None
+        self.__previous = None
+        self.__tracing = False
+
+    def start(self):
+        '''
+        Start recording, stacking on top of any profiler already running
+        '''
+        global _active
+        if self.__origin is None:
+            self.__origin = time.perf_counter()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.__tracing = True
+        self.__previous = _active
+        _active = self
+        return self
+
+    def stop(self):
+        '''
+        Stop recording, restoring the profiler that was running before
+        '''
+        global _active
+        _active = self.__previous
+        self.__previous = None
+        if self.__tracing:
+            tracemalloc.stop()
+            self.__tracing = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    @contextlib.contextmanager
+    def measure(self, name, size = None):
+        '''
+        Record the enclosed block as a call of stage <name>
+
+        name : name of the stage
+        size : size of the input (e.g. number of points)
+        '''
+        stack = getattr(self.__local, 'stack', None)
+        if stack is None:
+            stack = self.__local.stack = []
+        stack.append(0.0)
+        memory = self.memory and tracemalloc.is_tracing()
+        n_bytes = tracemalloc.get_traced_memory()[0] if memory else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if memory:
+                n_bytes = tracemalloc.get_traced_memory()[0] - n_bytes
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.__record(name, size, start, elapsed, elapsed - nested, n_bytes)
+
+    def __record(self, name, size, start, elapsed, self_time, n_bytes):
+        with self.__lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = {'calls': 0, 'time': 0.0, 'self_time': 0.0,
+                                             'bytes': None, 'size': 0}
+            stage['calls'] += 1
+            stage['time'] += elapsed
+            stage['self_time'] += self_time
+            if n_bytes is not None:
+                stage['bytes'] = (stage['bytes'] or 0) + n_bytes
+            if size is not None:
+                stage['size'] += size
+
+            if len(self.events) >= self.max_events:
+                self.dropped_events += 1
+                return
+            args = {}
+            if size is not None:
+                args['size'] = size
+            if n_bytes is not None:
+                args['bytes'] = n_bytes
+            self.events.append({'name': name, 'cat': 'pymdicator', 'ph': 'X',
+                                'ts': (start - self.__origin) * 1e6, 'dur': elapsed * 1e6,
+                                'pid': os.getpid(), 'tid': threading.get_ident(),
+                                'args': args})
+
+    def summary(self):
+        '''
+        List of dictionaries of statistics, one per stage, slowest first: name,
+        calls, time and self_time (seconds, self_time excluding nested stages),
+        bytes (net bytes allocated, None without memory tracing) and size (total
+        input size over all calls)
+        '''
+        with self.__lock:
+            rows = [dict(stage, name=name) for name, stage in self.stages.items()]
+        return sorted(rows, key=lambda row: row['time'], reverse=True)
+
+    def table(self):
+        '''
+        Summary as a text table
+        '''
+        lines = ["%-45s %8s %10s %10s %10s %12s %14s" %
+                 ("stage", "calls", "total s", "self s", "mean ms", "mean size", "net bytes")]
+        for row in self.summary():
+            lines.append("%-45s %8d %10.4f %10.4f %10.3f %12.0f %14s" %
+                         (row['name'], row['calls'], row['time'], row['self_time'],
+                          1e3 * row['time'] / row['calls'], float(row['size']) / row['calls'],
+                          '-' if row['bytes'] is None else row['bytes']))
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        '''
+        Recorded calls in the Chrome trace event format, viewable in chrome://tracing
+        or Perfetto
+        '''
+        with self.__lock:
+            return {'traceEvents': list(self.events), 'displayTimeUnit': 'ms',
+                    'otherData': {'dropped_events': self.dropped_events}}
+
+    def save_trace(self, path):
+        '''
+        Write the Chrome trace to file <path>
+        '''
+        with open(path, 'w') as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
+
+
+def active():
+    '''
+    Profiler currently recording, or None
+    '''
+    return _active
+
+
+@contextlib.contextmanager
+def stage(name, size = None):
+    '''
+    Record the enclosed block as a call of stage <name> if a profiler is running
+
+    name : name of the stage
+    size : size of the input
+    '''
+    profiler = _active
+    if profiler is None:
+        yield
+    else:
+        with profiler.measure(name, size):
+            yield
+
+
+def profiled(name = None, size_arg = 0):
+    '''
+    Decorator recording each call of a function as a stage while a profiler is running.
+
+    name : name of the stage (default: the function's qualified name)
+    size_arg : position of the argument whose length is recorded as the input size
+               (None to record no size)
+    '''
+    def decorate(function):
+        stage_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*parameter_list, **kwargs):
+            profiler = _active
+            if profiler is None:
+                return function(*parameter_list, **kwargs)
+            with profiler.measure(stage_name, _size(parameter_list, size_arg)):
+                return function(*parameter_list, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _size(parameter_list, size_arg):
+    if size_arg is None or size_arg >= len(parameter_list):
+        return None
+    try:
+        return len(parameter_list[size_arg])
+    except (TypeError, AttributeError):
+        return None
@@ -0,0 +1,251 @@
+import numpy as np
+import pandas as pd
+from pymdicator.profiling import profiled
+
+# Bars are built from group boundaries: the start of every bar between the first
+# and last dates is located in the sorted date index by binary search, and every
+# aggregation is a reduceat over the bar start positions - there is no per-row or
+# per-bar Python work.
+
+DAY_NS = 24 * 3600 * 10**9
+# Bar starts are searched for when there are at least this many dates per bar;
+# for shorter bars comparing the key of every date is faster
+SEARCH_POINTS_PER_BAR = 16
+# The epoch (1970-01-01) was a Thursday; weeks start on Monday
+EPOCH_WEEKDAY = 3
+
+
+class Frequency:
+    DAILY = "Daily"
+    WEEKLY = "Weekly"
+    MONTHLY = "Monthly"
+    QUARTERLY = "Quarterly"
+    YEARLY = "Yearly"
+
+
+class Aggregation:
+    FIRST = "First"
+    LAST = "Last"
+    MAX = "Max"
+    MIN = "Min"
+    SUM = "Sum"
+    MEAN = "Mean"
+    COUNT = "Count"
+
+
+# Bars in a year at each calendar frequency, for annualizing
+BARS_PER_YEAR = {
+    Frequency.DAILY: 252,
+    Frequency.WEEKLY: 52,
+    Frequency.MONTHLY: 12,
+    Frequency.QUARTERLY: 4,
+    Frequency.YEARLY: 1,
+}
+
+
+def bar_keys(date_index, frequency):
+    '''
+    Int64 key of the bar each date falls in - equal for dates in the same bar and
+    increasing with the date.
+
+    date_index : sorted int64 array of nanoseconds since the epoch
+    frequency : Daily/Weekly/Monthly/Quarterly/Yearly, or an intraday bar length
+                (a pandas offset string such as "5min" or "1h", a Timedelta, or
+                integer nanoseconds) - intraday bars start again at every
+                midnight, the last bar of a day ending early if the length does
+                not divide a day; bars of a day or longer are aligned on the epoch
+    '''
+    date_index = np.asarray(date_index, dtype=np.int64)
+    if frequency == Frequency.DAILY:
+        return date_index // DAY_NS
+    elif frequency == Frequency.WEEKLY:
+        return (date_index // DAY_NS + EPOCH_WEEKDAY) // 7
+    elif frequency == Frequency.MONTHLY:
+        return date_index.view('datetime64[ns]').astype('datetime64[M]').view(np.int64)
+    elif frequency == Frequency.QUARTERLY:
+        return date_index.view('datetime64[ns]').astype('datetime64[M]').view(np.int64) // 3
+    elif frequency == Frequency.YEARLY:
+        return date_index.view('datetime64[ns]').astype('datetime64[Y]').view(np.int64)
+    length = bar_length(frequency)
+    if length >= DAY_NS:
+        return date_index // length
+    days = date_index // DAY_NS
+    return days * bars_per_day(length) + (date_index - days * DAY_NS) // length
+
+
+def bar_key_starts(keys, frequency):
+    '''
+    Nanoseconds since the epoch at which each of the bars with int64 <keys> begins
+
+    keys : int64 array of bar keys (see bar_keys)
+    frequency : bar frequency
+    '''
+    keys = np.asarray(keys, dtype=np.int64)
+    if frequency == Frequency.DAILY:
+        return keys * DAY_NS
+    elif frequency == Frequency.WEEKLY:
+        return (keys * 7 - EPOCH_WEEKDAY) * DAY_NS
+    elif frequency == Frequency.MONTHLY:
+        return keys.view('datetime64[M]').astype('datetime64[ns]').view(np.int64)
+    elif frequency == Frequency.QUARTERLY:
+        return (keys * 3).view('datetime64[M]').astype('datetime64[ns]').view(np.int64)
+    elif frequency == Frequency.YEARLY:
+        return keys.view('datetime64[Y]').astype('datetime64[ns]').view(np.int64)
+    length = bar_length(frequency)
+    if length >= DAY_NS:
+        return keys * length
+    days, bars = np.divmod(keys, bars_per_day(length))
+    return days * DAY_NS + bars * length
+
+
+def bar_length(frequency):
+    '''
+    Length in nanoseconds of an intraday bar <frequency> (raises ValueError if it
+    is not a positive length of time)
+    '''
+    if isinstance(frequency, (int, np.integer)):
+        length = int(frequency)
+    else:
+        length = pd.Timedelta(frequency).value
+    if length <= 0:
+        raise ValueError("Invalid bar length %s" % frequency)
+    return length
+
+
+def bars_per_day(length):
+    '''
+    Number of intraday bars of <length> nanoseconds in each day, counting a
+    shorter last bar
+    '''
+    return -(-DAY_NS // length)
+
+
+@profiled()
+def bar_starts(date_index, frequency):
+    '''
+    Position of the first point of each bar of <frequency> in sorted <date_index>.
+    The start of every bar is searched for in the dates, which takes O(bars log n)
+    time, unless bars are short (see SEARCH_POINTS_PER_BAR), when the dates' keys
+    are compared.
+
+    date_index : sorted int64 array of nanoseconds since the epoch
+    frequency : bar frequency (see bar_keys)
+    '''
+    date_index = np.asarray(date_index, dtype=np.int64)
+    if len(date_index) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    first_key, last_key = bar_keys(date_index[[0, -1]], frequency)
+    if (last_key - first_key) * SEARCH_POINTS_PER_BAR < len(date_index):
+        edges = bar_key_starts(np.arange(first_key + 1, last_key + 1), frequency)
+        starts = np.searchsorted(date_index, edges, side='left')
+        starts = np.concatenate(([0], starts))
+        # bars with no dates start where the next bar does
+        starts = starts[np.diff(starts, append=len(date_index)) > 0]
+    else:
+        keys = bar_keys(date_index, frequency)
+        starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+    return starts.astype(np.intp)
+
+
+def bar_ends(starts, n_points):
+    '''
+    Position of the last point of each bar beginning at <starts>, in <n_points> points
+    '''
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.intp)
+    return np.append(starts[1:], n_points).astype(np.intp) - 1
+
+
+@profiled()
+def aggregate(values, starts, how = Aggregation.LAST):
+    '''
+    Aggregate <values> over the bars beginning at positions <starts>, each bar
+    running to the start of the next.  2-D values are aggregated down each column.
+
+    NaN marks a missing value and is skipped: first and last take the first and
+    last value present, max, min, sum and mean ignore NaN, and a bar with no value
+    present aggregates to NaN (0 for count).
+
+    values : array of values
+    starts : increasing positions of the first point of each bar, starting at 0
+    how : First/Last/Max/Min/Sum/Mean/Count
+    '''
+    values = np.asarray(values)
+    if len(starts) == 0:
+        return np.empty((0,) + values.shape[1:])
+
+    # a NaN makes the sum NaN (as, rarely, do infinities of both signs, which just
+    # take the slower path) - much cheaper than testing every value
+    if not np.isnan(values.sum()):
+        return _aggregate_present(values, starts, how)
+
+    present = ~np.isnan(values)
+    counts = np.add.reduceat(present, starts, axis=0, dtype=np.int64)
+    if how == Aggregation.COUNT:
+        return counts.astype(float)
+
+    if how in (Aggregation.FIRST, Aggregation.LAST):
+        rows = np.arange(len(values)).reshape((len(values),) + (1,) * (values.ndim - 1))
+        if how == Aggregation.FIRST:
+            positions = np.minimum.reduceat(np.where(present, rows, len(values) - 1), starts,
+                                            axis=0)
+        else:
+            positions = np.maximum.reduceat(np.where(present, rows, 0), starts, axis=0)
+        result = np.take_along_axis(values, positions, axis=0) if values.ndim > 1 \
+            else values[positions]
+    elif how == Aggregation.MAX:
+        result = np.fmax.reduceat(values, starts, axis=0)
+    elif how == Aggregation.MIN:
+        result = np.fmin.reduceat(values, starts, axis=0)
+    elif how in (Aggregation.SUM, Aggregation.MEAN):
+        result = np.add.reduceat(np.where(present, values, 0.0), starts, axis=0,
+                                 dtype=np.float64)
+        if how == Aggregation.MEAN:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result = result / counts
+    else:
+        raise ValueError("Unknown aggregation %s" % how)
+
+    result = np.asarray(result, dtype=float)
+    result[counts == 0] = np.nan
+    return result
+
+
+def _aggregate_present(values, starts, how):
+    '''
+    aggregate() for <values> with no NaN.  Where every bar has the same small number
+    of points (e.g. 5 minute bars of regular minute data) the values are viewed as
+    one row per bar and the columns combined element-wise, avoiding reduceat's
+    cost per bar.
+    '''
+    lengths = np.diff(starts, append=len(values))
+    ufunc = {Aggregation.MAX: np.maximum, Aggregation.MIN: np.minimum,
+             Aggregation.SUM: np.add, Aggregation.MEAN: np.add}.get(how)
+    if ufunc is not None and lengths[0] <= SEARCH_POINTS_PER_BAR and \
+      lengths.min() == lengths.max():
+        bars = values.reshape((len(starts), lengths[0]) + values.shape[1:])
+        result = bars[:, 0].astype(np.float64)
+        for position in range(1, lengths[0]):
+            ufunc(result, bars[:, position], out=result)
+        return result / lengths[0] if how == Aggregation.MEAN else result
+
+    if how == Aggregation.FIRST:
+        result = values[starts]
+    elif how == Aggregation.LAST:
+        result = values[bar_ends(starts, len(values))]
+    elif how == Aggregation.MAX:
+        result = np.maximum.reduceat(values, starts, axis=0)
+    elif how == Aggregation.MIN:
+        result = np.minimum.reduceat(values, starts, axis=0)
+    elif how in (Aggregation.SUM, Aggregation.MEAN, Aggregation.COUNT):
+        counts = lengths.reshape((len(starts),) + (1,) * (values.ndim - 1)) * \
+            np.ones(values.shape[1:])
+        if how == Aggregation.COUNT:
+            return counts
+        result = np.add.reduceat(values, starts, axis=0, dtype=np.float64)
+        if how == Aggregation.MEAN:
+            result = result / counts
+    else:
+        raise ValueError("Unknown aggregation %s" % how)
+    return np.asarray(result, dtype=float)
@@ -0,0 +1,260 @@
+import numpy as np
+from pymdicator.profiling import profiled
+
+
+@profiled()
+def rolling_sum(values, period):
+    '''
+    Calculate the sum over each trailing window of <period> points in O(n) time.
+    Result has len(values) - period + 1 points, the first being the sum of
+    values[0:period].
+
+    The series is cut into blocks of <period> points and every window is built
+    from the suffix sum of one block plus the prefix sum of the next, so no
+    running total ever covers more than <period> points.  Rounding error is
+    therefore bounded by the window length rather than growing with the
+    length of the series, as it would for a plain cumulative-sum difference.
+    A NaN only affects the windows that contain it.  2-D values are summed
+    down each column.
+
+    values : array of values
+    period : window length
+    '''
+    values = np.asarray(values, dtype=float)
+    n_values = len(values)
+    if period < 1 or period > n_values:
+        return np.empty((0,) + values.shape[1:])
+
+    n_blocks = -(-n_values // period)
+    blocks = np.zeros((n_blocks * period,) + values.shape[1:])
+    blocks[:n_values] = values
+    blocks = blocks.reshape((n_blocks, period) + values.shape[1:])
+
+    # window ending at block k, position j covers positions j+1.. of block k-1
+    # and positions ..j of block k
+    window_sums = np.cumsum(blocks, axis=1)
+    suffix_sums = np.cumsum(blocks[:, ::-1], axis=1)[:, ::-1]
+    window_sums[1:, :-1] += suffix_sums[:-1, 1:]
+
+    return window_sums.reshape((n_blocks * period,) + values.shape[1:])[period - 1:n_values]
+
+
+@profiled()
+def rolling_sums(values, periods):
+    '''
+    Calculate the trailing window sums of 1-D <values> for several window lengths
+    in one pass.  Returns a len(values) x len(periods) array whose row i holds the
+    sums of the windows ending at point i, NaN where a window would start before
+    the first point.
+
+    As in rolling_sum the series is cut into blocks, here as long as the longest
+    period, and one set of per-block prefix and suffix sums is shared by every
+    period.  A window inside a block is the difference of two prefix sums and a
+    window spanning two blocks is a suffix sum plus a prefix sum, so rounding
+    error stays bounded by the longest period.  Unlike rolling_sum, a NaN
+    affects every window that ends in its block after it.
+
+    values : array of values
+    periods : list of window lengths
+    '''
+    values = np.asarray(values, dtype=float)
+    n_values = len(values)
+    result = np.full((n_values, len(periods)), np.nan, order='F')
+    valid_periods = [p for p in periods if 1 <= p <= n_values]
+    if len(valid_periods) == 0:
+        return result
+
+    block = max(valid_periods)
+    n_blocks = -(-n_values // block)
+    blocks = np.zeros(n_blocks * block)
+    blocks[:n_values] = values
+    blocks = blocks.reshape((n_blocks, block))
+    prefix_sums = np.cumsum(blocks, axis=1)
+    suffix_sums = np.cumsum(blocks[:, ::-1], axis=1)[:, ::-1]
+
+    window_sums = np.empty_like(prefix_sums)
+    for col, period in enumerate(periods):
+        if not 1 <= period <= n_values:
+            continue
+        # window ending at position j of a block starts at j-period+1: inside the
+        # block if j >= period, at its start if j == period-1, else in the previous block
+        window_sums[:] = prefix_sums
+        window_sums[:, period:] -= prefix_sums[:, :block - period]
+        window_sums[1:, :period - 1] += suffix_sums[:-1, block - period + 1:]
+        result[period - 1:, col] = window_sums.ravel()[period - 1:n_values]
+    return result
+
+
+def rolling_mean(values, period):
+    '''
+    Calculate the equally weighted mean over each trailing window of <period> points.
+
+    values : array of values
+    period : window length
+    '''
+    window_sums = rolling_sum(values, period)
+    window_sums /= period
+    return window_sums
+
+
+@profiled()
+def rolling_variance(values, period):
+    '''
+    Calculate the (population) variance over each trailing window of <period>
+    points in one pass.  Result has len(values) - period + 1 points.
+
+    The mean square less the squared mean cancels catastrophically when the
+    values are large next to their spread, and can even come out negative.  So,
+    as in rolling_sum, the series is cut into blocks of <period> points, but the
+    sums are taken of the deviations from the first finite value of each block;
+    the part of a window in the previous block is re-centred on its own block's
+    value with the usual shift identities.  Every deviation is then of the order
+    of the spread over two windows, the variance keeps its precision at any
+    price level, and it is never negative.  2-D values are taken down each column.
+
+    values : array of values
+    period : window length
+    '''
+    values = np.asarray(values, dtype=float)
+    n_values = len(values)
+    if period < 1 or period > n_values:
+        return np.empty((0,) + values.shape[1:])
+
+    n_blocks = -(-n_values // period)
+    blocks = np.zeros((n_blocks * period,) + values.shape[1:])
+    blocks[:n_values] = values
+    blocks = blocks.reshape((n_blocks, period) + values.shape[1:])
+
+    # a block of missing values gets no shift - every window it reaches is NaN
+    firsts = np.isfinite(blocks).argmax(axis=1)[:, np.newaxis]
+    shifts = np.take_along_axis(blocks, firsts, axis=1)
+    shifts[~np.isfinite(shifts)] = 0.0
+    deviations = blocks
+    deviations -= shifts
+    squares = deviations * deviations
+
+    # window ending at block k, position j takes positions j+1.. of block k-1,
+    # whose deviations move by d = shift[k-1] - shift[k] when re-centred
+    suffix_sums = np.cumsum(deviations[:-1, :0:-1], axis=1)[:, ::-1]
+    suffix_sums_sq = np.cumsum(squares[:-1, :0:-1], axis=1)[:, ::-1]
+    counts = np.arange(period - 1, 0, -1, dtype=float).reshape(
+        (1, period - 1) + (1,) * (values.ndim - 1))
+    moves = shifts[:-1] - shifts[1:]
+    suffix_sums_sq += 2.0 * moves * suffix_sums + counts * moves * moves
+    suffix_sums += counts * moves
+
+    sums = np.cumsum(deviations, axis=1, out=deviations)
+    sums_sq = np.cumsum(squares, axis=1, out=squares)
+    sums_sq[1:, :-1] += suffix_sums_sq
+    sums[1:, :-1] += suffix_sums
+
+    sums /= period
+    sums_sq /= period
+    variances = sums_sq
+    variances -= sums * sums
+    np.maximum(variances, 0.0, out=variances)
+    return variances.reshape((n_blocks * period,) + values.shape[1:])[period - 1:n_values]
+
+
+# Longest block scanned in one go by linear_recurrence, and the largest rescaling
+# factor allowed within a block.  Together they keep the rounding error of the
+# blocked scan within a few hundred ulps of the point-by-point recurrence.
+_MAX_BLOCK = 256
+_MAX_SCALE = 1.0e100
+
+
+def linear_recurrence(inputs, decay, initial = 0.0):
+    '''
+    Evaluate the first-order recurrence
+        result[t] = decay * result[t - 1] + inputs[t],  result[-1] = initial
+    without a Python-level loop over the points.  2-D inputs are scanned down
+    each column, in which case initial may hold one value per column.
+
+    The points are cut into blocks, each block is solved in closed form with a
+    rescaled cumulative sum, and the value carried between blocks is itself
+    solved recursively as a (much shorter) recurrence.
+
+    inputs : array of inputs
+    decay : decay factor applied to the previous result, 0 <= decay <= 1
+    initial : value preceding the first point
+    '''
+    inputs = np.asarray(inputs, dtype=float)
+    n_points = inputs.shape[0]
+    if n_points == 0 or decay == 0:
+        return inputs.copy()
+
+    block = min(_MAX_BLOCK, n_points)
+    if decay < 1:
+        block = min(block, int(np.log(_MAX_SCALE) / -np.log(decay)))
+    if block < 2:
+        result = np.empty_like(inputs)
+        previous = initial
+        for ii in range(n_points):
+            previous = decay * previous + inputs[ii]
+            result[ii] = previous
+        return result
+
+    n_blocks = -(-n_points // block)
+    padded = np.zeros((n_blocks * block,) + inputs.shape[1:])
+    padded[:n_points] = inputs
+    padded = padded.reshape((n_blocks, block) + inputs.shape[1:])
+
+    column_shape = (1, block) + (1,) * (inputs.ndim - 1)
+    steps = np.arange(block, dtype=float).reshape(column_shape)
+    local = np.cumsum(padded * decay ** -steps, axis=1)
+    local *= decay ** steps
+
+    carries = linear_recurrence(local[:, -1], decay ** block, initial)
+    previous = np.empty_like(carries)
+    previous[0] = initial
+    previous[1:] = carries[:-1]
+    local += decay ** (steps + 1) * previous[:, np.newaxis]
+
+    return local.reshape((n_blocks * block,) + inputs.shape[1:])[:n_points]
+
+
+@profiled()
+def exponential_moving_average(values, alpha, initial):
+    '''
+    Calculate an exponential moving average seeded with <initial>
+        average[0] = initial
+        average[t] = alpha * values[t] + (1 - alpha) * average[t - 1]
+    values[0] is not used; it is the point the seed stands in for.
+
+    values : array of values
+    alpha : weight of the latest point
+    initial : seed for the first point
+    '''
+    inputs = np.multiply(values, alpha, dtype=float)
+    if len(inputs) > 0:
+        inputs[0] = initial
+    return linear_recurrence(inputs, 1.0 - alpha)
+
+
+@profiled()
+def exponential_moving_variance(values, alpha, initial_mean, initial_variance):
+    '''
+    Calculate an exponentially weighted variance seeded with <initial_variance>,
+    using the incremental (Welford-style) update
+        variance[t] = (1 - alpha) * (variance[t - 1] + alpha * (values[t] - mean[t - 1])^2)
+    where mean is the exponential moving average seeded with <initial_mean>.
+    This equals the weighted mean square less the squared weighted mean, but
+    only ever squares a deviation from the running mean, so keeps its precision
+    however large the values are.  values[0] is not used, as for
+    exponential_moving_average.
+
+    values : array of values
+    alpha : weight of the latest point
+    initial_mean : seed of the mean for the first point
+    initial_variance : seed of the variance for the first point
+    '''
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return values.copy()
+
+    means = exponential_moving_average(values, alpha, initial_mean)
+    deviations = values[1:] - means[:-1]
+    inputs = np.empty_like(values)
+    inputs[0] = initial_variance
+    inputs[1:] = (1.0 - alpha) * alpha * deviations * deviations
+    return linear_recurrence(inputs, 1.0 - alpha)
@@ -0,0 +1,208 @@
+import numpy as np
+import logging as log
+from pymdicator.indicators import Momentum, RSI, MACD
+from pymdicator.panel import Panel
+
+UP = "Up"
+DOWN = "Down"
+
+# Relative cost of evaluating each indicator's current value over a panel;
+# conditions are evaluated cheapest first so expensive indicators only see the
+# securities the cheap ones let through
+INDICATOR_COSTS = {
+    Momentum: 1,
+    RSI: 2,
+    MACD: 4,
+}
+DEFAULT_COST = 5
+# Conditions on indicator timeseries (e.g. crossovers) cost this much more
+TIMESERIES_COST_FACTOR = 10
+
+
+def top_k(values, k, largest = True):
+    '''
+    Positions of the <k> largest (or smallest) values, best first, ignoring NaN.
+    Uses a partial selection, so only the <k> selected values are sorted.
+
+    values : array of values
+    k : number of positions to return
+    largest : whether to select the largest values (else the smallest)
+    '''
+    values = np.asarray(values, dtype=float)
+    valid = np.flatnonzero(~np.isnan(values))
+    k = min(max(k, 0), len(valid))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+
+    keys = -values[valid] if largest else values[valid]
+    if k < len(valid):
+        selected = np.argpartition(keys, k - 1)[:k]
+    else:
+        selected = np.arange(len(valid))
+    return valid[selected[np.argsort(keys[selected], kind='stable')]]
+
+
+def current_values(indicator, panel, output = 0):
+    '''
+    Array of the current value of <indicator> for every security in <panel>
+
+    indicator : technical indicator
+    panel : price panel
+    output : position of the output to use for indicators with several (e.g. MACD)
+    '''
+    result = indicator.calculate_current(panel)
+    if isinstance(result, tuple):
+        result = result[output]
+    if result is None:
+        return np.full(len(panel.securities), np.nan)
+    return np.asarray(result, dtype=float)
+
+
+def _cost(indicator, factor = 1):
+    return INDICATOR_COSTS.get(type(indicator), DEFAULT_COST) * factor
+
+
+class Condition(object):
+    def __init__(self, name, evaluate, cost = DEFAULT_COST):
+        '''
+        Initialize a screening condition.
+
+        name : description of the condition
+        evaluate : function of a price panel returning a boolean array, one per security
+        cost : relative cost of evaluating the condition
+        '''
+        self.name = name
+        self.evaluate = evaluate
+        self.cost = cost
+
+    def __call__(self, panel):
+        passed = np.asarray(self.evaluate(panel), dtype=bool)
+        if passed.shape != (len(panel.securities),):
+            log.error("Condition %s gave %s values for %d securities", self.name,
+                      passed.shape, len(panel.securities))
+            return None
+        return passed
+
+    def __repr__(self):
+        return "Condition(%s)" % self.name
+
+
+def between(indicator, low = -np.inf, high = np.inf, output = 0, cost = None):
+    '''
+    Condition that the current value of <indicator> is within [low, high]
+    (e.g. an RSI band).  Securities with no value fail.
+
+    indicator : technical indicator
+    low : lowest value passing
+    high : highest value passing
+    output : position of the output to test for indicators with several
+    cost : relative cost (default from INDICATOR_COSTS)
+    '''
+    def evaluate(panel):
+        values = current_values(indicator, panel, output)
+        with np.errstate(invalid='ignore'):
+            return (values >= low) & (values <= high)
+    return Condition("%g <= %s <= %g" % (low, indicator.name, high), evaluate,
+                     _cost(indicator) if cost is None else cost)
+
+
+def above(indicator, threshold, output = 0, cost = None):
+    '''
+    Condition that the current value of <indicator> is at least <threshold>
+    '''
+    return between(indicator, threshold, np.inf, output, cost)
+
+
+def below(indicator, threshold, output = 0, cost = None):
+    '''
+    Condition that the current value of <indicator> is at most <threshold>
+    '''
+    return between(indicator, -np.inf, threshold, output, cost)
+
+
+def crossover(macd, direction = UP, lookback = 1, cost = None):
+    '''
+    Condition that the MACD line has crossed its signal line in <direction>
+    within the last <lookback> points of each security: above it now (for Up)
+    and at or below it <lookback> points before.
+
+    macd : MACD indicator
+    direction : Up or Down
+    lookback : number of points to look back over
+    cost : relative cost (default: that of a MACD timeseries)
+    '''
+    assert direction in (UP, DOWN)
+    assert lookback >= 1
+
+    def evaluate(panel):
+        (macd_panel, signal_panel) = macd.calculate_timeseries(panel)
+        differences = macd_panel.values - signal_panel.values
+        cols = np.arange(len(panel.securities))
+        last = panel.last_valid()
+        previous = last - lookback
+        has_previous = previous >= 0
+        now = np.full(len(cols), np.nan)
+        before = np.full(len(cols), np.nan)
+        now[has_previous] = differences[last[has_previous], cols[has_previous]]
+        before[has_previous] = differences[previous[has_previous], cols[has_previous]]
+        with np.errstate(invalid='ignore'):
+            if direction == UP:
+                return (before <= 0) & (now > 0)
+            return (before >= 0) & (now < 0)
+    return Condition("%s crosses %s" % (macd.name, direction.lower()), evaluate,
+                     _cost(macd, TIMESERIES_COST_FACTOR) if cost is None else cost)
+
+
+class Screener(object):
+    def __init__(self, conditions = None):
+        '''
+        Initialize a screener - a set of conditions every security has to pass,
+        evaluated across the whole universe at once.  The cheapest conditions are
+        evaluated first and each further condition only over the securities still
+        passing, so expensive indicators are skipped for names already filtered out.
+
+        conditions : list of conditions
+        '''
+        self.conditions = list(conditions or [])
+
+    def add(self, condition):
+        '''
+        Add a condition, returning the screener
+        '''
+        self.conditions.append(condition)
+        return self
+
+    def screen(self, data):
+        '''
+        Panel of the securities passing every condition
+
+        data : price panel, or dictionary of security -> DataFrame
+        '''
+        panel = data if isinstance(data, Panel) else Panel.from_frames(data)
+        for condition in sorted(self.conditions, key=lambda c: c.cost):
+            if len(panel.securities) == 0:
+                break
+            passed = condition(panel)
+            if passed is None:
+                return None
+            if not passed.all():
+                panel = panel.select(np.flatnonzero(passed))
+        return panel
+
+    def rank(self, data, indicator, k = 10, largest = True, output = 0):
+        '''
+        List of (security, value) of the <k> securities passing every condition
+        with the largest (or smallest) current value of <indicator>, best first.
+
+        data : price panel, or dictionary of security -> DataFrame
+        indicator : technical indicator to rank by
+        k : number of securities to return
+        largest : whether to take the largest values (top) or the smallest (bottom)
+        output : position of the output to rank by for indicators with several
+        '''
+        panel = self.screen(data)
+        if panel is None:
+            return None
+        values = current_values(indicator, panel, output)
+        return [(panel.securities[col], float(values[col]))
+                for col in top_k(values, k, largest)]
@@ -1,6 +1,38 @@
 import pandas as pd
 import numpy as np
 import logging as log
+from pymdicator.rolling import rolling_mean, rolling_variance, exponential_moving_average, \
+    exponential_moving_variance
+from pymdicator.cache import LRUCache
+from pymdicator.profiling import profiled
+from pymdicator.resample import Aggregation, bar_starts, bar_ends, aggregate
+
+# Periods in a year used to annualize volatilities of daily returns
+PERIODS_PER_YEAR = 252
+
+# Default columns of the price DataFrames
+DATE_COL_NAME = "Date"
+PRICE_COL_NAME = "Close"
+
+
+def to_date_index(date):
+    '''
+    Nanoseconds since the epoch of <date> - a date string, datetime, datetime64 or
+    integer nanoseconds - or an int64 array of them for a list or array of dates.
+    Raises ValueError for an invalid date.
+    '''
+    if isinstance(date, (int, np.integer)):
+        return int(date)
+    if isinstance(date, (list, tuple, np.ndarray, pd.Index, pd.Series)):
+        dates = np.asarray(date)
+        if dates.dtype.kind in 'iu':
+            return dates.astype(np.int64)
+        return pd.DatetimeIndex(dates).values.astype('datetime64[ns]').view(np.int64)
+    timestamp = pd.Timestamp(date)
+    if timestamp is pd.NaT:
+        raise ValueError("Invalid date %s" % date)
+    return timestamp.value
+
 
 class TimeseriesType:
     PRICE = "Price"
@@ -17,32 +49,260 @@ class TimeseriesSubType:
     RELATIVE = "Relative"
     EXPONENTIAL = "Exponential"
     EQUAL = "Equal"
+    WILDER = "Wilder"
+
+
+def smoothing_factor(weighting_type, period):
+    '''
+    Smoothing factor of an exponentially weighted average over <period> points:
+    2/(period + 1) for Exponential and 1/period for Wilder weighting.  Raises
+    ValueError for any other weighting.
+    '''
+    if weighting_type == TimeseriesSubType.EXPONENTIAL:
+        return 2.0 / (period + 1.0)
+    elif weighting_type == TimeseriesSubType.WILDER:
+        return 1.0 / period
+    raise ValueError("Unsupported weighting %s" % weighting_type)
+
 
-class Timeseries:
-    def __init__(self, dates, values, tsType = None, tsSubType = None, period = None):
+class Timeseries(object):
+    __slots__ = ('__np_values', '__np_dates', '__labels', '__values', '__dates', '__series',
+                 '__cache', 'ts_type', 'ts_sub_type', 'period')
+
+    # Number of derived timeseries (returns, moving averages, volatilities) each
+    # timeseries remembers; 0 disables the cache
+    CACHE_SIZE = 32
+
+    @profiled(size_arg=2)
+    def __init__(self, dates, values, tsType = None, tsSubType = None, period = None,
+                 dtype = None):
         '''
         Initialize timeseries object.
         Dates are assumed to be passed in in order.
 
+        Values are held in a single floating point array and dates in an int64 array
+        of nanoseconds since the epoch; the dates as passed in are kept as labels.
+        Derived timeseries share views of these arrays, and the list and pandas
+        views are only built when first accessed.
+
+        Values are float64 unless another dtype is given.  A float32 timeseries
+        takes half the memory and its derived timeseries are float32 too, but sums,
+        averages and volatilities are still accumulated in float64 (see README for
+        the resulting error bounds).
+
         dates : list of dates
         values : list of values
         tsType : timeseries type
         tsSubType : timeseries subtype
         period : periodicity
+        dtype : floating point dtype of the values (default float64)
         '''
         if len(dates) != len(values):
             log.error("Cannot create timeseries - mis-match in lengths")
             return None
 
-        self.dates = dates
-        self.values = values
-        self.__np_values = np.array(values)
         index = pd.DatetimeIndex(dates)
-        self.series = pd.Series(values, index = index)
-        self.ts_type = tsType
-        self.ts_sub_type = tsSubType
+        labels = None
+        if not isinstance(dates, pd.DatetimeIndex) and \
+          not (isinstance(dates, np.ndarray) and dates.dtype.kind == 'M'):
+            labels = np.asarray(dates, dtype=object)
+
+        self.__initialize(index.values.astype('datetime64[ns]').view(np.int64),
+                          np.asarray(values, dtype=dtype if dtype is not None else float),
+                          labels, tsType, tsSubType, period)
+
+    @staticmethod
+    @profiled(size_arg=1)
+    def from_arrays(date_index, values, tsType = None, tsSubType = None, period = None,
+                    dtype = None, labels = None):
+        '''
+        Create a timeseries wrapping existing arrays.  Nothing is copied or parsed
+        unless a conversion to int64 dates or to <dtype> values is needed, so the
+        arrays must not be changed afterwards.
+
+        date_index : sorted int64 array of nanoseconds since the epoch, or datetime64 array
+        values : array of values
+        tsType : timeseries type
+        tsSubType : timeseries subtype
+        period : periodicity
+        dtype : floating point dtype of the values (default float64)
+        labels : dates reported by the dates property (default: timestamps)
+        '''
+        np_dates = np.asarray(date_index)
+        if np_dates.dtype.kind == 'M':
+            np_dates = np_dates.astype('datetime64[ns]', copy=False).view(np.int64)
+        else:
+            np_dates = np_dates.astype(np.int64, copy=False)
+        np_values = np.asarray(values, dtype=dtype if dtype is not None else float)
+
+        if len(np_dates) != len(np_values) or \
+          (labels is not None and len(labels) != len(np_values)):
+            log.error("Cannot create timeseries - mis-match in lengths")
+            return None
+
+        if labels is not None:
+            labels = np.asarray(labels, dtype=object)
+        return Timeseries.__wrap(np_dates, np_values, labels, tsType, tsSubType, period)
+
+    @staticmethod
+    @profiled()
+    def from_frame(df, date_col_name = DATE_COL_NAME, value_col_name = PRICE_COL_NAME,
+                   tsType = TimeseriesType.PRICE, tsSubType = TimeseriesSubType.ABSOLUTE,
+                   period = None, dtype = None):
+        '''
+        Create a timeseries from two columns of a DataFrame, sharing the column
+        buffers where pandas allows.  A datetime64 date column is used as it is;
+        other dates (e.g. strings straight from a CSV file) are parsed once and
+        kept as the labels, as if passed to the constructor.
+
+        df : DataFrame with one row per date, in order
+        date_col_name : name of the date column (None to use the index)
+        value_col_name : name of the value column
+        tsType : timeseries type
+        tsSubType : timeseries subtype
+        period : periodicity
+        dtype : floating point dtype of the values (default float64)
+        '''
+        dates = df.index if date_col_name is None else df[date_col_name]
+        labels = None
+        if isinstance(dates.dtype, np.dtype) and dates.dtype.kind == 'M':
+            date_index = dates.to_numpy()
+        else:
+            labels = dates.to_numpy()
+            date_index = pd.DatetimeIndex(labels).values
+        return Timeseries.from_arrays(date_index, df[value_col_name].to_numpy(), tsType,
+                                      tsSubType, period, dtype, labels)
+
+    def __initialize(self, np_dates, np_values, labels, ts_type, ts_sub_type, period):
+        self.__np_dates = np_dates.view()
+        self.__np_dates.flags.writeable = False
+        self.__np_values = np_values.view()
+        self.__np_values.flags.writeable = False
+        self.__labels = labels
+        self.__values = None
+        self.__dates = None
+        self.__series = None
+        self.__cache = None
+        self.ts_type = ts_type
+        self.ts_sub_type = ts_sub_type
         self.period = period
 
+    @staticmethod
+    def __wrap(np_dates, np_values, labels, ts_type, ts_sub_type, period):
+        ts = Timeseries.__new__(Timeseries)
+        ts.__initialize(np_dates, np_values, labels, ts_type, ts_sub_type, period)
+        return ts
+
+    def __getstate__(self):
+        return (self.__np_dates, self.__np_values, self.__labels,
+                self.ts_type, self.ts_sub_type, self.period)
+
+    def __setstate__(self, state):
+        self.__initialize(*state)
+
+    def __copy(self):
+        return Timeseries.__wrap(self.__np_dates, self.__np_values, self.__labels,
+                                 self.ts_type, self.ts_sub_type, self.period)
+
+    def __cached(self, key, calculate, *parameter_list):
+        '''
+        Return calculate(*parameter_list), remembered under <key>.  Callers get their
+        own copy (sharing the arrays) so changing its type does not alter the cache.
+        '''
+        if Timeseries.CACHE_SIZE <= 0:
+            return calculate(*parameter_list)
+        if self.__cache is None:
+            self.__cache = LRUCache(Timeseries.CACHE_SIZE)
+
+        derived = self.__cache.get(key)
+        if derived is None:
+            derived = calculate(*parameter_list)
+            self.__cache.put(key, derived)
+        return derived.__copy()
+
+    def cache_info(self):
+        '''
+        Hit, miss and size statistics for the derived timeseries cache
+        '''
+        if self.__cache is None:
+            return LRUCache(Timeseries.CACHE_SIZE).info()
+        return self.__cache.info()
+
+    def clear_cache(self):
+        '''
+        Forget the derived timeseries remembered by this timeseries
+        '''
+        self.__cache = None
+
+    @property
+    def values(self):
+        '''
+        List of values, built on first access
+        '''
+        if self.__values is None:
+            self.__values = self.__np_values.tolist()
+        return self.__values
+
+    @property
+    def dates(self):
+        '''
+        List of dates as passed in (timestamps where created from datetime arrays),
+        built on first access
+        '''
+        if self.__dates is None:
+            if self.__labels is not None:
+                self.__dates = self.__labels.tolist()
+            else:
+                self.__dates = self.__datetime_index().tolist()
+        return self.__dates
+
+    @property
+    def series(self):
+        '''
+        Values as a pandas series indexed by date, built on first access
+        '''
+        if self.__series is None:
+            self.__series = pd.Series(self.__np_values, index = self.__datetime_index())
+        return self.__series
+
+    @property
+    def np_values(self):
+        '''
+        Read-only array of the values
+        '''
+        return self.__np_values
+
+    @property
+    def dtype(self):
+        '''
+        Floating point dtype of the values
+        '''
+        return self.__np_values.dtype
+
+    def __datetime_index(self):
+        return pd.DatetimeIndex(self.__np_dates.view('datetime64[ns]'))
+
+    def create_derived(self, values, start_idx = 0, ts_type = None, ts_sub_type = None,
+                       period = None):
+        '''
+        Create a timeseries on this timeseries' dates without copying or re-parsing them.
+        The new timeseries starts on the date at <start_idx> and runs for len(values) points.
+
+        values : array of values
+        start_idx : index of the date of the first value
+        ts_type : timeseries type
+        ts_sub_type : timeseries subtype
+        period : periodicity
+        '''
+        np_values = np.asarray(values, dtype=self.__np_values.dtype)
+        date_slice = slice(start_idx, start_idx + len(np_values))
+        assert len(self.__np_dates[date_slice]) == len(np_values)
+
+        labels = self.__labels[date_slice] if self.__labels is not None else None
+        return Timeseries.__wrap(self.__np_dates[date_slice], np_values, labels,
+                                 ts_type, ts_sub_type, period)
+
+    @profiled()
     def calculate_returns(self, returns_type = TimeseriesSubType.FRACTIONAL, period = 1):
         '''
         Calculate a new time-series based on returns from this timeseries
@@ -51,7 +311,10 @@ class Timeseries:
         returns_type : Fractional/Logarithmic/Absolute
         period : number of days to calculate each return over
         '''
-        new_dates = self.dates[0:-period]
+        return self.__cached(('returns', returns_type, period, None),
+                             self.__calculate_returns, returns_type, period)
+
+    def __calculate_returns(self, returns_type, period):
         np_new_values = None
 
         if period >= len(self):
@@ -64,10 +327,9 @@ class Timeseries:
         elif returns_type == TimeseriesSubType.LOG:
             np_new_values = np.log(self.__np_values[period:] / self.__np_values[0:-period])
 
-        new_ts = Timeseries(new_dates, np_new_values.tolist(), TimeseriesType.RETURNS,
-                            returns_type, period)
-        return new_ts
+        return self.create_derived(np_new_values, 0, TimeseriesType.RETURNS, returns_type, period)
 
+    @profiled()
     def calculate_latest_return(self, returns_type = TimeseriesSubType.FRACTIONAL, period = 1):
         '''
         Calculate the latest return.
@@ -76,7 +338,7 @@ class Timeseries:
         period : number of days to calculate the return over
         '''
         if period >= len(self):
-            return np.NaN
+            return np.nan
 
         if returns_type == TimeseriesSubType.FRACTIONAL:
             return self.__np_values[-1] / self.__np_values[-period-1]
@@ -85,72 +347,79 @@ class Timeseries:
         elif returns_type == TimeseriesSubType.LOG:
             return np.log(self.__np_values[-1] / self.__np_values[-period-1])
 
+    @profiled()
     def calculate_moving_average(self, weighting_type = TimeseriesSubType.EQUAL, period = 15):
         '''
-        Calculate moving average for current time-series
+        Calculate moving average for current time-series.  Wilder weighting is
+        exponential with a smoothing factor of 1/period rather than 2/(period + 1).
 
-        weighting_type : Exponential/Equal
+        weighting_type : Exponential/Equal/Wilder
         period : period for moving average calculation
         '''
-        moving_average = None
+        return self.__cached(('moving_average', weighting_type, period, None),
+                             self.__calculate_moving_average, weighting_type, period)
 
+    def __calculate_moving_average(self, weighting_type, period):
         if period > len(self):
             return Timeseries([],[], TimeseriesType.MOVING_AVERAGE, weighting_type, period)
-        
+
+        return self.create_derived(self.__moving_average_values(weighting_type, period),
+                                   period - 1,
+                                   TimeseriesType.MOVING_AVERAGE, weighting_type, period)
+
+    def __moving_average_values(self, weighting_type, period):
+        '''
+        Moving average of the values, starting at point period - 1, as a float64 array
+        '''
         if weighting_type == TimeseriesSubType.EQUAL:
-            np_sum = self.__np_values[period - 1:]
-            for ii in range(1, period):
-                np_sum = np_sum + self.__np_values[period - ii - 1: -ii]
-            moving_average = (np_sum / period).tolist()
-        elif weighting_type == TimeseriesSubType.EXPONENTIAL:
-            moving_average = []
-            alpha = 2.0 / (period + 1.0)
-            moving_average.append(sum(self.__np_values[0:period]) / period)
-            for val in self.values[period:]:
-                new_av = val * alpha + moving_average[-1] * (1.0 - alpha)
-                moving_average.append(new_av)
-        
-        new_ts = Timeseries(self.dates[period-1:], moving_average,
-                            TimeseriesType.MOVING_AVERAGE, weighting_type, period)
-        return new_ts
+            return rolling_mean(self.__np_values, period)
+        alpha = smoothing_factor(weighting_type, period)
+        initial = self.__np_values[0:period].sum(dtype=np.float64) / period
+        return exponential_moving_average(self.__np_values[period - 1:], alpha, initial)
 
+    @profiled()
     def calculate_single_moving_average(self, weighting_type = TimeseriesSubType.EQUAL,
-                                        period = 15, index = None):
+                                        period = 15, index = None, as_of = None):
         '''
-        Calculate the latest moving average.  Where exponential weighting is used, calculation is
-        truncated to point with weighting of 1/100th of latest point.
+        Calculate the latest moving average.  Where exponential (or Wilder) weighting is used,
+        calculation is truncated to point with weighting of 1/100th of latest point.
 
-        weighting_type : Exponential/Equal
+        weighting_type : Exponential/Equal/Wilder
         period : period for moving average calculation
-
+        index : position of the point to calculate at (default: the last)
+        as_of : date to calculate at instead, using the last point on or before it
         '''
+        if as_of is not None:
+            index = self.index_as_of(as_of)
+            if index - period + 1 < 0:
+                return np.nan
         if index == None:
             index = len(self) - 1
         if index < 0:
             index = len(self) + index
         if period > len(self):
-            return np.NaN
+            return np.nan
 
         if weighting_type == TimeseriesSubType.EQUAL:
-            return sum(self.__np_values[index - period + 1:index + 1]) / period
-        elif weighting_type == TimeseriesSubType.EXPONENTIAL:
-            alpha = 2.0 / (period + 1.0)
-            n_end = int(-2.0 / np.log10(1 - alpha) + 1)
-            total = 0
-            total_wgt = 0
-            for val in self.values[max(index - n_end, 0):index + 1]:
-                total = total * (1 - alpha) + val
-                total_wgt = total_wgt * (1 - alpha) + 1
-
-            return total / total_wgt
-        assert False
+            return self.__np_values[index - period + 1:index + 1].sum(dtype=np.float64) / period
+
+        alpha = smoothing_factor(weighting_type, period)
+        n_end = int(-2.0 / np.log10(1 - alpha) + 1)
+        total = 0
+        total_wgt = 0
+        for val in self.__np_values[max(index - n_end, 0):index + 1].tolist():
+            total = total * (1 - alpha) + val
+            total_wgt = total_wgt * (1 - alpha) + 1
 
+        return total / total_wgt
+
+    @profiled()
     def calculate_moving_average_truncate(self, weighting_type = TimeseriesSubType.EQUAL,
                                           period = 15, start_idx = None):
         '''
         Calculate a moving average timeseries
 
-        weighting_type : Equal/Exponential
+        weighting_type : Equal/Exponential/Wilder
         period : Period to use for calculation
         start_idx : Index to start calculation for
         '''
@@ -158,79 +427,202 @@ class Timeseries:
             start_idx = period - 1
         if period > start_idx + 1:
             start_idx = period - 1
+        return self.__cached(('moving_average_truncate', weighting_type, period, start_idx),
+                             self.__calculate_moving_average_truncate,
+                             weighting_type, period, start_idx)
+
+    def __calculate_moving_average_truncate(self, weighting_type, period, start_idx):
         if period > len(self):
             return Timeseries([], [], TimeseriesType.RETURNS, weighting_type, period)
 
-        moving_average = None
-
         if weighting_type == TimeseriesSubType.EQUAL:
-            np_sum = self.__np_values[start_idx:]
-            for ii in range(1, period):
-                np_sum = np_sum + self.__np_values[start_idx - ii: -ii]
-            moving_average = (np_sum / period).tolist()
-        elif weighting_type == TimeseriesSubType.EXPONENTIAL:
-            moving_average = []
-            moving_average.append(self.calculate_single_moving_average(weighting_type, period, start_idx))
-            alpha = 2.0 / (period + 1.0)
-
-            for val in self.values[start_idx + 1:]:
-                new_av = val * alpha + moving_average[-1] * (1.0 - alpha)
-                moving_average.append(new_av)
-
-        new_ts = Timeseries(self.dates[start_idx:], moving_average,
-                            TimeseriesType.MOVING_AVERAGE, weighting_type, period)
-        return new_ts
+            moving_average = rolling_mean(self.__np_values, period)[start_idx - period + 1:]
+        else:
+            alpha = smoothing_factor(weighting_type, period)
+            initial = self.calculate_single_moving_average(weighting_type, period, start_idx)
+            moving_average = exponential_moving_average(self.__np_values[start_idx:],
+                                                        alpha, initial)
+
+        return self.create_derived(moving_average, start_idx,
+                                   TimeseriesType.MOVING_AVERAGE, weighting_type, period)
 
+    @profiled()
     def calculate_volatility(self, weighting_type, period = 30, moving_average = None):
         '''
         Calculate a new time-series based on the volatility of this timeseries
         Returned time-series is indexed by last date in volatility period
 
-        weighting_type : Exponential/Equal
+        The mean is tracked alongside the variance in a single pass, from
+        deviations rather than raw squares, so the result keeps its precision
+        for high-priced series and is never NaN from a negative variance.
+
+        weighting_type : Exponential/Equal/Wilder
         period : period for volatility calculation
-        moving_average : Moving average time-series (if None then calculated on the fly)
+        moving_average : no longer needed - kept for compatibility and ignored
         '''
-        if moving_average is None:
-            moving_average = self.calculate_moving_average(weighting_type, period)
+        return self.__cached(('volatility', weighting_type, period, None),
+                             self.__calculate_volatility, weighting_type, period)
 
+    def __calculate_volatility(self, weighting_type, period):
         if period > len(self):
             return Timeseries([], [], TimeseriesType.VOL, weighting_type, period)
 
-        vals_sq = self.__np_values * self.__np_values
+        return self.create_derived(np.sqrt(self.__variances(self.__np_values, weighting_type,
+                                                            period)),
+                                   period - 1, TimeseriesType.VOL, weighting_type, period)
+
+    @profiled()
+    def calculate_returns_volatility(self, weighting_type, period = 30,
+                                     returns_type = TimeseriesSubType.LOG,
+                                     periods_per_year = PERIODS_PER_YEAR):
+        '''
+        Calculate a new time-series of the annualized volatility of the one-period
+        returns of this timeseries.  Returned time-series is indexed by the date of
+        the last price in each period of <period> returns.
+
+        weighting_type : Exponential/Equal/Wilder
+        period : number of returns in each volatility period
+        returns_type : Fractional/Logarithmic/Absolute
+        periods_per_year : number of periods in a year (1 for no annualization)
+        '''
+        return self.__cached(('returns volatility', weighting_type, period,
+                              (returns_type, periods_per_year)),
+                             self.__calculate_returns_volatility, weighting_type, period,
+                             returns_type, periods_per_year)
 
+    def __calculate_returns_volatility(self, weighting_type, period, returns_type,
+                                       periods_per_year):
+        if period >= len(self):
+            return Timeseries([], [], TimeseriesType.VOL, weighting_type, period)
+
+        returns = self.calculate_returns(returns_type, 1)
+        variances = self.__variances(returns.__np_values, weighting_type, period)
+        return self.create_derived(np.sqrt(variances * periods_per_year), period,
+                                   TimeseriesType.VOL, weighting_type, period)
+
+    @staticmethod
+    def __variances(values, weighting_type, period):
+        '''
+        Float64 variance of <values> over each period, starting at point period - 1
+        '''
         if weighting_type == TimeseriesSubType.EQUAL:
-            np_sum_sq = vals_sq[period - 1:]
-            for ii in range(1, period):
-                np_sum_sq = np_sum_sq + vals_sq[period - ii - 1: -ii]
-            np_volatilities = np.sqrt((np_sum_sq / period) - \
-                                   (moving_average.__np_values * moving_average.__np_values))
-        elif weighting_type == TimeseriesSubType.EXPONENTIAL:
-            sum_weighted_squares = []
-            alpha = 2.0 / (period + 1.0)
-            sum_weighted_squares.append(sum(self.__np_values[0:period] * \
-                                        self.__np_values[0:period])/period)
-            for val2 in vals_sq[period:]:
-                new_val2 = val2 * alpha + sum_weighted_squares[-1] * (1.0 - alpha)
-                sum_weighted_squares.append(new_val2)
-            np_volatilities = np.sqrt(np.array(sum_weighted_squares) - \
-                                      moving_average.__np_values * moving_average.__np_values)
-
-        new_ts = Timeseries(self.dates[period-1:], np_volatilities.tolist(), \
-                            TimeseriesType.VOL, weighting_type, period)
-
-        return new_ts
+            return rolling_variance(values, period)
+        alpha = smoothing_factor(weighting_type, period)
+        first = values[0:period].astype(np.float64)
+        return exponential_moving_variance(values[period - 1:], alpha, first.mean(), first.var())
 
     def __len__(self):
-        return len(self.dates)
+        return len(self.__np_values)
+
+    @property
+    def date_index(self):
+        '''
+        Sorted int64 array of the dates, as nanoseconds since the epoch
+        '''
+        return self.__np_dates
+
+    def index_as_of(self, date):
+        '''
+        Position of the last point dated on or before <date>, -1 if there is none.
+        A binary search of the date index; a list or array of dates gives an array.
+
+        date : date, or list or array of dates (see to_date_index)
+        '''
+        return np.searchsorted(self.__np_dates, to_date_index(date), side='right') - 1
+
+    def value_as_of(self, date):
+        '''
+        Value of the last point dated on or before <date>, NaN if there is none.
+        A list or array of dates gives an array of values.
+
+        date : date, or list or array of dates (see to_date_index)
+        '''
+        idx = self.index_as_of(date)
+        if np.ndim(idx) == 0:
+            return self.__np_values[idx] if idx >= 0 else np.nan
+        values = np.full(len(idx), np.nan)
+        values[idx >= 0] = self.__np_values[idx[idx >= 0]]
+        return values
+
+    def slice_dates(self, start = None, end = None):
+        '''
+        Create a view of the points dated from <start> to <end> inclusive, found by
+        binary search of the date index.  Nothing is copied.
+
+        start : first date (None for the start of the timeseries)
+        end : last date (None for the end of the timeseries)
+        '''
+        start_idx = 0
+        end_idx = len(self)
+        if start is not None:
+            start_idx = int(np.searchsorted(self.__np_dates, to_date_index(start), side='left'))
+        if end is not None:
+            end_idx = int(np.searchsorted(self.__np_dates, to_date_index(end), side='right'))
+        end_idx = max(start_idx, end_idx)
+        return self.create_derived(self.__np_values[start_idx:end_idx], start_idx,
+                                   self.ts_type, self.ts_sub_type, self.period)
+
+    def as_of(self, date):
+        '''
+        View of the points dated on or before <date> - the history known on that date,
+        for point-in-time calculations.  Returns this timeseries if <date> is None.
+
+        date : date (see to_date_index)
+        '''
+        if date is None:
+            return self
+        return self.slice_dates(None, date)
+
+    @profiled()
+    def resample(self, frequency, how = Aggregation.LAST):
+        '''
+        Create a timeseries of bars of <frequency> - e.g. weekly closes of a daily
+        series, or 5 minute volumes of minute bars - with one point per bar dated
+        by the last point in it, so a bar is only known once it is complete.
+        Bars are found from the boundaries of the sorted date index and every bar
+        aggregated at once, without a per-row pass.  The result's period is the
+        frequency.
+
+        frequency : Daily/Weekly/Monthly/Quarterly/Yearly (resample.Frequency) or an
+                    intraday bar length such as "5min" (see resample.bar_keys)
+        how : First/Last/Max/Min/Sum/Mean/Count (resample.Aggregation)
+        '''
+        return self.__cached(('resample', how, frequency, None),
+                             self.__resample, frequency, how)
 
+    def __resample(self, frequency, how):
+        starts = bar_starts(self.__np_dates, frequency)
+        return self.__bars(starts, aggregate(self.__np_values, starts, how), frequency)
+
+    @profiled()
+    def resample_ohlc(self, frequency):
+        '''
+        Open, high, low and close timeseries of the bars of <frequency> (see resample),
+        sharing one set of bar boundaries and dates
+
+        frequency : bar frequency
+        '''
+        starts = bar_starts(self.__np_dates, frequency)
+        return tuple(self.__bars(starts, aggregate(self.__np_values, starts, how), frequency)
+                     for how in (Aggregation.FIRST, Aggregation.MAX, Aggregation.MIN,
+                                 Aggregation.LAST))
+
+    def __bars(self, starts, values, frequency):
+        ends = bar_ends(starts, len(self))
+        labels = self.__labels[ends] if self.__labels is not None else None
+        return Timeseries.__wrap(self.__np_dates[ends],
+                                 values.astype(self.__np_values.dtype, copy=False), labels,
+                                 self.ts_type, self.ts_sub_type, frequency)
+
+    @profiled()
     def linear_transform(self, factor, shift):
         '''
         Apply a linear shift to timeseries <values> -> factor * <values> + shift
         factor : Scaling factor
         shift : shift
         '''
-        new_vals = (self.__np_values * factor * 1.0 + shift * 1.0).tolist()
-        return Timeseries(self.dates, new_vals, self.ts_type, self.ts_sub_type, self.period)
+        new_vals = self.__np_values * factor * 1.0 + shift * 1.0
+        return self.create_derived(new_vals, 0, self.ts_type, self.ts_sub_type, self.period)
 
     def transform_log_to_fractional_returns(self):        
         '''
@@ -238,8 +630,8 @@ class Timeseries:
         '''
         assert self.ts_type == TimeseriesType.RETURNS
         assert self.ts_sub_type == TimeseriesSubType.LOG
-        new_returns = np.exp(self.__np_values).tolist()
-        return Timeseries(self.dates, new_returns, self.ts_type, TimeseriesSubType.FRACTIONAL)
+        new_returns = np.exp(self.__np_values)
+        return self.create_derived(new_returns, 0, self.ts_type, TimeseriesSubType.FRACTIONAL)
 
     def set_indicator_type(self, new_subtype):
         '''
@@ -249,21 +641,64 @@ class Timeseries:
         self.ts_sub_type = new_subtype
 
     def create_truncate(self, truncate_length):
+        '''
+        Create a view of the last <truncate_length> points of this timeseries
+        '''
         if truncate_length > len(self):
             truncate_length = len(self)
 
-        return Timeseries(self.dates[-truncate_length:],
-                          self.values[-truncate_length:],
-                          self.ts_type, self.ts_sub_type, self.period)
+        start_idx = len(self) - truncate_length
+        return self.create_derived(self.__np_values[start_idx:], start_idx,
+                                   self.ts_type, self.ts_sub_type, self.period)
 
     @staticmethod
+    @profiled()
     def linearly_combine(ts_a, scale_a, ts_b, scale_b):
-        new_dates = list(set(ts_a.dates).intersection(ts_b.dates))
-        new_dates.sort()
+        '''
+        Calculate scale_a * ts_a + scale_b * ts_b over the dates common to both.
+
+        ts_a, ts_b : timeseries to combine
+        scale_a, scale_b : scaling factors
+        '''
+        return Timeseries.linearly_combine_all([ts_a, ts_b], [scale_a, scale_b])
+
+    @staticmethod
+    @profiled()
+    def linearly_combine_all(series, scales):
+        '''
+        Calculate sum(scale * ts) over the dates common to all of <series> in one pass.
+        Dates are aligned with a merge join on the sorted date indices, so the
+        cost is O(n log n) whatever the overlap.  The result takes its dates and
+        type information from the first timeseries.
 
-        new_values = []
-        for date in new_dates:
-            new_values.append(ts_a.values[ts_a.dates.index(date)] * scale_a +
-                              ts_b.values[ts_b.dates.index(date)] * scale_b)
+        series : list of timeseries
+        scales : list of scaling factors, one per timeseries
+        '''
+        assert len(series) == len(scales) and len(series) > 0
+
+        common_dates = series[0].__np_dates
+        first_idx = np.arange(len(common_dates))
+        for ts in series[1:]:
+            idx = ts.__find_dates(common_dates)
+            first_idx = first_idx[idx >= 0]
+            common_dates = common_dates[idx >= 0]
+
+        new_values = series[0].__np_values[first_idx] * scales[0]
+        for ts, scale in zip(series[1:], scales[1:]):
+            new_values += ts.__np_values[ts.__find_dates(common_dates)] * scale
+
+        labels = series[0].__labels[first_idx] if series[0].__labels is not None else None
+        return Timeseries.__wrap(common_dates, new_values, labels, series[0].ts_type,
+                                 series[0].ts_sub_type, series[0].period)
+
+    def __find_dates(self, np_dates):
+        '''
+        Locate each of the sorted int64 <np_dates> in this timeseries, -1 where absent.
+        '''
+        if len(self.__np_dates) == 0:
+            return np.full(len(np_dates), -1)
 
-        return Timeseries(new_dates, new_values, ts_a.ts_type, ts_a.ts_sub_type, ts_a.period)
+        idx = np.searchsorted(self.__np_dates, np_dates)
+        idx[idx == len(self.__np_dates)] = 0
+        idx[self.__np_dates[idx] != np_dates] = -1
+        return idx
@@ -0,0 +1,467 @@
+import pandas as pd
+import numpy as np
+import logging as log
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pymdicator.cache import LRUCache
+
+STOCKS = "Stocks"
+ETFS = "ETFs"
+
+DATA_DIR = os.environ.get("TEAM_MAGIC_DATA_DIR",
+                          os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                       "data"))
+PATHS = {
+    STOCKS: os.path.join(DATA_DIR, STOCKS),
+    ETFS: os.path.join(DATA_DIR, ETFS),
+}
+
+# Columns of the Stooq-style price files and the dtype each is stored as in the
+# columnar cache (dates as int64 nanoseconds since the epoch)
+DATE_COLUMN = "Date"
+COLUMN_DTYPES = {
+    "Date": np.int64,
+    "Open": np.float64,
+    "High": np.float64,
+    "Low": np.float64,
+    "Close": np.float64,
+    "Volume": np.int64,
+    "OpenInt": np.int64,
+}
+
+CACHE_DIR_NAME = ".columns"
+_STAMP_FILE = "source"
+
+# Default bound on the memory held by a SecurityStore
+STORE_SIZE = 256 * 1024 * 1024
+
+# One lock per price file, so each columnar cache is built by one thread at a time
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+
+
+def list_files(path):
+    '''
+    Sorted names of the data files in directory <path>
+    '''
+    return sorted(f for f in os.listdir(path)
+                  if not f.startswith('.') and os.path.isfile(os.path.join(path, f)))
+
+
+def cache_path(path):
+    '''
+    Directory holding the columnar cache of the data file at <path>
+    '''
+    directory, file_name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, CACHE_DIR_NAME, file_name)
+
+
+def parse_csv(path, columns = None):
+    '''
+    Parse a price file into a dictionary of column name -> array, with dates as
+    int64 nanoseconds since the epoch.  An empty file gives empty columns.
+
+    path : path of the file
+    columns : columns to read (default: all)
+    '''
+    columns = list(COLUMN_DTYPES) if columns is None else list(columns)
+    dtypes = dict((c, object if c == DATE_COLUMN else COLUMN_DTYPES[c]) for c in columns)
+    try:
+        df = pd.read_csv(path, usecols = columns, dtype = dtypes, engine = 'c')
+    except pd.errors.EmptyDataError:
+        return dict((c, np.empty(0, dtype = COLUMN_DTYPES[c])) for c in columns)
+
+    result = {}
+    for column in columns:
+        if column == DATE_COLUMN:
+            result[column] = parse_dates(df[column].to_numpy())
+        else:
+            result[column] = df[column].to_numpy()
+    return result
+
+
+def parse_dates(values):
+    '''
+    Int64 nanoseconds since the epoch of date strings <values>.  NumPy parses
+    plain YYYY-MM-DD dates about twice as fast as pandas, so is used when every
+    value has that form; anything else is parsed by pandas (raising ValueError
+    if it is not a date).
+    '''
+    if _is_iso_dates(values):
+        try:
+            return np.asarray(values).astype('datetime64[D]').astype('datetime64[ns]') \
+                .view(np.int64)
+        except ValueError:
+            pass
+    dates = pd.to_datetime(pd.Series(values))
+    return dates.values.astype('datetime64[ns]').view(np.int64)
+
+
+def _is_iso_dates(values):
+    '''
+    Whether every one of <values> is a string of the form DDDD-DD-DD
+    '''
+    try:
+        strings = np.asarray(values).astype(str)
+    except (ValueError, TypeError):
+        return False
+    if strings.dtype.itemsize != 10 * 4 or strings.ndim != 1:
+        return False
+    codes = strings.view(np.uint32).reshape((len(strings), 10))
+    digits = codes[:, [0, 1, 2, 3, 5, 6, 8, 9]]
+    return bool(((digits >= ord('0')) & (digits <= ord('9'))).all() and
+                (codes[:, [4, 7]] == ord('-')).all())
+
+
+def build_column_cache(path, columns = None):
+    '''
+    Convert the price file at <path> into its columnar cache: one .npy file per
+    column, plus a stamp recording the size and modification time of the source
+    and the columns cached from it.  Only the <columns> not already cached from
+    the current file are parsed.  Files are written under unique temporary names
+    and renamed into place, and each file's cache is built by one thread at a
+    time, so it is safe to call from several threads.
+
+    path : path of the price file
+    columns : columns to parse (default: all)
+    '''
+    columns = list(COLUMN_DTYPES) if columns is None else list(columns)
+    directory = cache_path(path)
+    with _build_lock(path):
+        source_stamp = _source_stamp(path)
+        cached = _cached_columns(path)
+        missing = [c for c in columns if c not in cached]
+        if not missing:
+            return
+
+        os.makedirs(directory, exist_ok = True)
+        for column, values in parse_csv(path, missing).items():
+            _write_atomically(directory, column + ".npy",
+                              lambda cache_file: np.save(cache_file, values))
+        stamp = "\n".join([source_stamp, " ".join(sorted(cached.union(missing)))])
+        _write_atomically(directory, _STAMP_FILE,
+                          lambda stamp_file: stamp_file.write(stamp.encode('utf-8')))
+
+
+def _build_lock(path):
+    key = os.path.abspath(path)
+    with _build_locks_lock:
+        lock = _build_locks.get(key)
+        if lock is None:
+            lock = _build_locks[key] = threading.Lock()
+        return lock
+
+
+def _write_atomically(directory, file_name, write):
+    handle, temp_path = tempfile.mkstemp(dir = directory, suffix = ".tmp")
+    try:
+        with os.fdopen(handle, 'wb') as temp_file:
+            write(temp_file)
+        os.replace(temp_path, os.path.join(directory, file_name))
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_stamp(path):
+    '''
+    Source stamp and set of columns recorded in the cache of <path>, (None, empty set)
+    if there is no cache
+    '''
+    try:
+        with open(os.path.join(cache_path(path), _STAMP_FILE)) as stamp:
+            lines = stamp.read().split("\n")
+    except (IOError, OSError):
+        return None, set()
+    return lines[0], set(lines[1].split()) if len(lines) > 1 else set()
+
+
+def _cached_columns(path):
+    '''
+    Set of the columns cached from the current version of the file at <path>
+    '''
+    source_stamp, columns = _read_stamp(path)
+    return columns if source_stamp == _source_stamp(path) else set()
+
+
+def is_cache_fresh(path):
+    '''
+    Whether the columnar cache of <path> exists and was built from the current file
+    '''
+    try:
+        return _read_stamp(path)[0] == _source_stamp(path)
+    except (IOError, OSError):
+        return False
+
+
+def _source_stamp(path):
+    status = os.stat(path)
+    return "%d %d" % (status.st_size, status.st_mtime_ns)
+
+
+def read_columns(path, columns = ("Date", "Close")):
+    '''
+    Read columns of the price file at <path> as read-only memory-mapped arrays,
+    building the columnar cache first if it is missing or stale.  Only the pages
+    of the columns actually touched are read from disk.
+
+    path : path of the price file
+    columns : columns to read
+    '''
+    if not _cached_columns(path).issuperset(columns):
+        build_column_cache(path, columns)
+
+    directory = cache_path(path)
+    result = {}
+    for column in columns:
+        values = np.load(os.path.join(directory, column + ".npy"), mmap_mode = 'r')
+        if len(values) == 0:
+            # zero-length files cannot be memory-mapped
+            values = np.load(os.path.join(directory, column + ".npy"))
+        result[column] = values
+    return result
+
+
+def read_csv_to_df(path, columns = None):
+    '''
+    Read the price file at <path> into a DataFrame, through the columnar cache.
+    The date column is returned as datetime64.
+
+    path : path of the price file
+    columns : columns to read (default: all)
+    '''
+    columns = list(COLUMN_DTYPES) if columns is None else list(columns)
+    data = read_columns(path, columns)
+    if DATE_COLUMN in data:
+        data[DATE_COLUMN] = data[DATE_COLUMN].view('datetime64[ns]')
+    return pd.DataFrame(data, columns = columns)
+
+
+def convert_directory(path, max_workers = None):
+    '''
+    Build or refresh the columnar cache of every price file in directory <path>,
+    several files at a time, logging any file that cannot be read.  Returns the
+    number of files converted.
+
+    path : directory of price files
+    max_workers : number of files converted at once (default: one per CPU)
+    '''
+    stale = [f for f in (os.path.join(path, f) for f in list_files(path))
+             if not _cached_columns(f).issuperset(COLUMN_DTYPES)]
+    def convert(file_path):
+        try:
+            build_column_cache(file_path)
+            return True
+        except Exception:
+            log.error("Cannot convert price file %s:\n%s", file_path, traceback.format_exc())
+            return False
+
+    with ThreadPoolExecutor(max_workers = _workers(max_workers)) as executor:
+        n_converted = sum(executor.map(convert, stale))
+    log.info("Converted %d files in %s", n_converted, path)
+    return n_converted
+
+
+def _workers(max_workers):
+    return max_workers if max_workers is not None else os.cpu_count() or 1
+
+
+def load_directory(path, columns = ("Date", "Close"), file_names = None, max_workers = None):
+    '''
+    Read many price files at once, listing the directory a single time and reading
+    the files concurrently on a pool of threads.  Each file goes through the
+    columnar cache, which is built for any file whose cache is missing or stale
+    (the C parser, with explicit dtypes, parsing only <columns>).  A file that
+    cannot be read is logged and left out, without stopping the others.
+
+    Returns a dictionary of file name -> DataFrame and a dictionary of throughput
+    statistics: files (read), rows, bytes (of the source files), seconds,
+    files_per_second, rows_per_second, converted (the number of caches built) and
+    errors (file name -> traceback of each file that could not be read).
+
+    path : directory of price files
+    columns : columns to read for each file
+    file_names : names of the files to read (default: every file in the directory)
+    max_workers : number of files read at once (default: one per CPU)
+    '''
+    start = time.time()
+    if file_names is None:
+        file_names = list_files(path)
+    columns = list(columns)
+
+    def load(file_name):
+        file_path = os.path.join(path, file_name)
+        try:
+            converted = not _cached_columns(file_path).issuperset(columns)
+            df = read_csv_to_df(file_path, columns)
+            return df, converted, os.path.getsize(file_path), None
+        except Exception:
+            return None, False, 0, traceback.format_exc()
+
+    frames = {}
+    errors = {}
+    n_rows = n_bytes = n_converted = 0
+    with ThreadPoolExecutor(max_workers = _workers(max_workers)) as executor:
+        for file_name, (df, converted, size, error) in zip(file_names,
+                                                            executor.map(load, file_names)):
+            if error is not None:
+                log.error("Cannot read price file %s:\n%s", os.path.join(path, file_name),
+                          error)
+                errors[file_name] = error
+                continue
+            frames[file_name] = df
+            n_rows += len(df)
+            n_bytes += size
+            n_converted += converted
+
+    seconds = time.time() - start
+    stats = {'files': len(frames), 'rows': n_rows, 'bytes': n_bytes, 'seconds': seconds,
+             'files_per_second': len(frames) / seconds if seconds > 0 else float('inf'),
+             'rows_per_second': n_rows / seconds if seconds > 0 else float('inf'),
+             'megabytes_per_second': n_bytes / 1e6 / seconds if seconds > 0 else float('inf'),
+             'converted': n_converted, 'errors': errors}
+    log.info("Loaded %d files (%d rows, %d converted) from %s in %.2fs - %.0f files/s",
+             stats['files'], n_rows, n_converted, path, seconds, stats['files_per_second'])
+    return frames, stats
+
+
+def frame_size(df):
+    '''
+    Bytes held by the columns and index of DataFrame <df>
+    '''
+    return int(df.memory_usage(index = True).sum())
+
+
+class SecurityStore(object):
+    def __init__(self, path, columns = ("Date", "Close"), max_size = STORE_SIZE):
+        '''
+        Initialize a lazy store of the price files in directory <path>.  A security
+        is read the first time it is asked for and kept in a least-recently-used
+        cache bounded by the memory its DataFrames take up.
+
+        path : directory of price files
+        columns : columns to read for each security
+        max_size : bound on the bytes held by the cache
+        '''
+        self.path = path
+        self.columns = list(columns)
+        self.cache = LRUCache(max_size, frame_size)
+        self.__files = None
+        self.__stamps = {}
+        self.version = None
+
+    def files(self):
+        '''
+        Names of the price files in the store, listed when first needed and on refresh
+        '''
+        if self.__files is None:
+            self.refresh()
+        return self.__files
+
+    def refresh(self):
+        '''
+        Re-list the price files and drop any cached security whose file has changed
+        since it was read.  Updates and returns the data version, a digest of the size
+        and modification time of every file which changes whenever new bars arrive.
+        '''
+        files = list_files(self.path)
+        stamps = dict((f, _source_stamp(os.path.join(self.path, f))) for f in files)
+        for file_name, stamp in self.__stamps.items():
+            if stamps.get(file_name) != stamp:
+                self.cache.pop(file_name)
+
+        digest = hashlib.sha1()
+        for file_name in files:
+            digest.update(("%s %s\n" % (file_name, stamps[file_name])).encode('utf-8'))
+        self.__files = files
+        self.__stamps = stamps
+        self.version = digest.hexdigest()
+        return self.version
+
+    def securities(self):
+        '''
+        Dictionary of security name -> file name
+        '''
+        return dict((f.split('.')[0], f) for f in self.files())
+
+    def get(self, file_name):
+        '''
+        DataFrame of the price file <file_name>, or None if there is no such file or
+        it cannot be read
+        '''
+        df = self.cache.get(file_name)
+        if df is None:
+            path = os.path.join(self.path, file_name)
+            if file_name not in self.files() or not os.path.isfile(path):
+                log.error("No price file %s in %s", file_name, self.path)
+                return None
+            try:
+                df = read_csv_to_df(path, self.columns)
+            except (ValueError, OSError) as e:
+                log.error("Cannot read price file %s: %s", path, e)
+                return None
+            self.cache.put(file_name, df)
+        return df
+
+    def get_all(self, file_names = None, max_workers = None):
+        '''
+        Dictionary of file name -> DataFrame for <file_names> (default: every file),
+        reading the files not in the cache several at a time (None for a file that
+        is missing or cannot be read)
+
+        file_names : names of the files
+        max_workers : number of files read at once (default: one per CPU)
+        '''
+        if file_names is None:
+            file_names = self.files()
+        frames, stats = self.__load(file_names, max_workers)
+        return dict((f, frames[f] if f in frames else
+                     None if f in stats['errors'] else self.get(f)) for f in file_names)
+
+    def preload(self, file_names = None, max_workers = None):
+        '''
+        Read the price files <file_names> (default: every file) not yet in the cache,
+        several at a time, and cache them, e.g. to warm the store at start up.
+        Returns the throughput statistics of load_directory.
+
+        file_names : names of the files to load
+        max_workers : number of files read at once (default: one per CPU)
+        '''
+        if file_names is None:
+            file_names = self.files()
+        return self.__load(file_names, max_workers)[1]
+
+    def __load(self, file_names, max_workers):
+        files = set(self.files())
+        missing = [f for f in file_names if f in files and f not in self.cache]
+        frames, stats = load_directory(self.path, self.columns, missing, max_workers)
+        for file_name in missing:
+            if file_name in frames:
+                self.cache.put(file_name, frames[file_name])
+        return frames, stats
+
+    def cache_info(self):
+        '''
+        Statistics of the store's cache
+        '''
+        info = self.cache.info()
+        info['files'] = len(self.files())
+        return info
+
+
+if __name__ == '__main__':
+    for directory in sys.argv[1:] or [PATHS[STOCKS]]:
+        frames, stats = load_directory(directory)
+        print("%s: %d files (%d converted), %d rows in %.2fs - %.0f files/s, %.0f rows/s, "
+              "%.1f MB/s" % (directory, stats['files'], stats['converted'], stats['rows'],
+                             stats['seconds'], stats['files_per_second'],
+                             stats['rows_per_second'], stats['megabytes_per_second']))
@@ -4,9 +4,13 @@ setup(
     name='pymdicator',
     packages=['pymdicator'],
     include_package_data=True,
+    python_requires='>=3.8',
     install_requires=[
         'flask',
         'pandas',
         'numpy',
     ],
+    extras_require={
+        'arrow': ['pyarrow'],
+    },
 )
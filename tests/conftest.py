@@ -1,7 +1,7 @@
 from __future__ import unicode_literals
 import pytest
 import os
-from distutils import dir_util
+import shutil
 
 
 @pytest.fixture
@@ -15,6 +15,6 @@ def datadir(tmpdir, request):
     test_dir, _ = os.path.splitext(filename)
 
     if os.path.isdir(test_dir):
-        dir_util.copy_tree(test_dir, tmpdir.strpath)
+        shutil.copytree(test_dir, tmpdir.strpath, dirs_exist_ok=True)
 
     return tmpdir
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pymdicator import backtest
+from pymdicator.indicators import Momentum, RSI, MACD
+from pymdicator.panel import Panel
+from pymdicator.timeseries import Timeseries, TimeseriesType, TimeseriesSubType
+
+
+@pytest.fixture
+def panel():
+    rng = np.random.RandomState(4)
+    dates = pd.date_range('2012-01-02', periods=400, freq='B')
+    prices = 20.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, (len(dates), 12)), axis=0))
+    prices[:50, 3] = np.nan
+    return Panel(dates, ['sec%d' % ii for ii in range(12)], prices,
+                 TimeseriesType.PRICE, TimeseriesSubType.ABSOLUTE)
+
+
+def test_hold():
+    events = np.array([np.nan, 1.0, np.nan, np.nan, 0.0, np.nan, -1.0, np.nan])
+    assert backtest.hold(events).tolist() == [0, 1, 1, 1, 0, 0, -1, -1]
+    columns = backtest.hold(np.column_stack([events, events[::-1]]))
+    assert columns[:, 1].tolist() == [0, -1, -1, 0, 0, 0, 1, 1]
+
+
+def test_rules():
+    dates = pd.date_range('2020-01-01', periods=6)
+    signal = Timeseries(dates, [np.nan, 20.0, 40.0, 55.0, 45.0, 25.0])
+    assert backtest.threshold_positions(signal, 50, 30).np_values.tolist() == \
+        [0, -1, 0, 1, 0, -1]
+    assert backtest.band_positions(signal, 30, 50).np_values.tolist() == [0, 1, 1, 0, 0, 1]
+    assert backtest.band_positions(signal, 50, 30, -1.0).np_values.tolist() == \
+        [0, 0, 0, -1, -1, 0]
+    other = Timeseries(dates, [10.0, 30.0, 30.0, 30.0, 50.0, np.nan])
+    assert backtest.crossover_positions(signal, other).np_values.tolist() == \
+        [0, -1, 1, 1, -1, 0]
+    assert backtest.crossover_positions(signal, other, True).np_values.tolist() == \
+        [0, 0, 1, 1, 0, 0]
+
+
+def test_top_k_positions(panel):
+    momentum = Momentum(10).calculate_timeseries(panel)
+    positions = backtest.top_k_positions(momentum, 3).values
+    for row in [0, 100, 385, 399]:
+        values = momentum.values[row]
+        n_valid = np.sum(~np.isnan(values))
+        assert positions[row].sum() == min(3, n_valid)
+        if n_valid > 0:
+            held = np.flatnonzero(positions[row])
+            assert set(held) == set(np.argsort(np.where(np.isnan(values), -np.inf,
+                                                        values))[::-1][:len(held)])
+
+
+def test_backtest_single_security():
+    dates = pd.date_range('2020-01-01', periods=5)
+    prices = Timeseries(dates, [100.0, 110.0, 99.0, 99.0, 118.8])
+    positions = Timeseries(dates, [1.0, 1.0, 0.0, 0.5, 0.5])
+    result = backtest.backtest(prices, positions, cost=0.01, lag=0, normalize=False)
+    assert np.allclose(result.positions[:, 0], [1.0, 1.0, 0.0, 0.5, 0.5])
+    assert np.allclose(result.turnover, [1.0, 0.0, 1.0, 0.5, 0.0])
+    assert np.allclose(result.returns, [-0.01, 0.1, -0.1 - 0.01, -0.005, 0.1])
+    assert np.allclose(result.equity, np.cumprod(1 + result.returns))
+    assert np.isclose(result.summary()['max_drawdown'], result.equity[3] / result.equity[1] - 1)
+    assert list(result.to_frame().index) == list(dates)
+
+    lagged = backtest.backtest(prices, positions, lag=2, normalize=False)
+    assert np.allclose(lagged.positions[:, 0], [0.0, 0.0, 1.0, 1.0, 0.0])
+    assert np.allclose(lagged.returns, [0.0, 0.0, 0.0, 0.0, 0.2])
+
+    # a lag beyond the history never trades
+    for lag in (5, 7):
+        flat = backtest.backtest(prices, positions, lag=lag, normalize=False)
+        assert np.all(flat.positions == 0.0)
+        assert np.all(flat.returns == 0.0)
+    with pytest.raises(ValueError):
+        backtest.backtest(prices, positions, lag=-1)
+
+
+def test_backtest_panel(panel):
+    macd, signal = MACD().calculate_timeseries(panel)
+    positions = backtest.crossover_positions(macd, signal)
+    result = backtest.backtest(panel, positions, cost=0.001)
+    assert result.positions.shape == panel.values.shape
+    gross = np.abs(result.positions).sum(axis=1)
+    assert np.allclose(gross[gross > 0], 1.0)
+
+    # the portfolio is the sum of single security backtests with the same weights
+    for col in [0, 3]:
+        single = backtest.backtest(panel.column(panel.securities[col]),
+                                   result.positions[:, col][-len(panel.column(
+                                       panel.securities[col])):],
+                                   lag=0, normalize=False)
+        expected = result.security_returns[-len(single.returns):, col]
+        assert np.allclose(single.returns[1:], expected[1:])
+    assert np.allclose(result.returns, result.security_returns.sum(axis=1) -
+                       0.001 * result.turnover)
+    assert backtest.backtest(panel, np.ones((10, 12))) is None
+
+
+def test_indicator_timeseries_aligned(panel):
+    prices = panel.column('sec5')
+    rsi = RSI(14)
+    rsi_ts = rsi.calculate_timeseries(prices)
+    assert len(rsi_ts) < len(prices)
+    positions = backtest.band_positions(rsi_ts, 30, 50)
+    result = backtest.backtest(prices, positions, lag=1 + backtest.signal_lag(rsi))
+    rows = np.searchsorted(prices.date_index, rsi_ts.date_index)
+    assert np.array_equal(result.positions[rows[:-2] + 2, 0], positions.np_values[:-2])
+    assert backtest.signal_lag(Momentum(12)) == 12
+    assert backtest.signal_lag(MACD()) == 0
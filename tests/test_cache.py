@@ -0,0 +1,71 @@
+import time
+from pymdicator.cache import LRUCache, ResultCache
+
+
+def test_lru_eviction():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.info() == {'hits': 2, 'misses': 1, 'evictions': 1,
+                            'entries': 2, 'size': 2, 'max_size': 2}
+
+
+def test_lru_sized():
+    cache = LRUCache(10, size_of=len)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'yyyy')
+    cache.put('c', 'zzzz')
+    assert cache.keys() == ['b', 'c']
+    assert cache.current_size == 8
+    cache.put('d', 'too long for the cache')
+    assert 'd' not in cache
+    assert cache.pop('b') == 'yyyy'
+    assert cache.current_size == 4
+
+
+def test_result_cache_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    cache = ResultCache(4, ttl=10)
+    cache.put('a', {'x': 1})
+    now[0] += 5
+    assert cache.get('a') == {'x': 1}
+    now[0] += 6
+    assert cache.get('a') is None
+    assert 'a' not in cache
+    info = cache.info()
+    assert (info['hits'], info['misses'], info['expirations']) == (1, 1, 1)
+
+
+def test_result_cache_sized_and_invalidated():
+    cache = ResultCache(10, size_of=len)
+    cache.put(('momentum', 12, 'v1'), 'xxxx')
+    cache.put(('momentum', 20, 'v1'), 'yyyy')
+    cache.put(('momentum', 12, 'v2'), 'zzzz')
+    assert cache.current_size == 8
+    assert cache.invalidate(lambda key: key[-1] != 'v2') == 1
+    assert cache.keys() == [('momentum', 12, 'v2')]
+    assert cache.pop(('momentum', 12, 'v2')) == 'zzzz'
+    assert cache.current_size == 0
+
+
+def test_result_cache_persisted(tmpdir, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    path = tmpdir.join('results.pickle').strpath
+    cache = ResultCache(4, ttl=10, path=path)
+    cache.put('a', 1)
+    now[0] += 5
+    cache.put('b', 2)
+
+    restored = ResultCache(4, ttl=10, path=path)
+    assert restored.keys() == ['a', 'b']
+    assert restored.get('b') == 2
+
+    now[0] += 6
+    assert ResultCache(4, ttl=10, path=path).keys() == ['b']
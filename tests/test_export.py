@@ -0,0 +1,62 @@
+import json
+import numpy as np
+import pytest
+from pymdicator import export
+from pymdicator import timeseries as ts
+
+
+def make_series(dates, values):
+    return ts.Timeseries(dates, values, ts.TimeseriesType.INDICATOR)
+
+
+def test_current_columns():
+    assert {'value': 12.5} == export.current_columns(12.5, ('value',))
+    columns = export.current_columns((1.0, None), ('macd', 'signal'))
+    assert 1.0 == columns['macd']
+    assert np.isnan(columns['signal'])
+
+
+def test_timeseries_columns_aligned_since():
+    macd = make_series(['2018-01-01', '2018-01-02', '2018-01-03', '2018-01-04'],
+                       [1.0, 2.0, 3.0, 4.0])
+    signal = make_series(['2018-01-03', '2018-01-04'], [30.0, 40.0])
+
+    dates, columns = export.timeseries_columns((macd, signal), ('macd', 'signal'))
+    assert ['2018-01-01', '2018-01-02', '2018-01-03', '2018-01-04'] == export.format_dates(dates)
+    assert [1.0, 2.0, 3.0, 4.0] == columns['macd'].tolist()
+    assert np.isnan(columns['signal'][:2]).all()
+    assert [30.0, 40.0] == columns['signal'][2:].tolist()
+
+    since = export.parse_date('2018-01-02')
+    dates, columns = export.timeseries_columns((macd, signal), ('macd', 'signal'), since)
+    assert ['2018-01-03', '2018-01-04'] == export.format_dates(dates)
+    assert [3.0, 4.0] == columns['macd'].tolist()
+
+    with pytest.raises(ValueError):
+        export.parse_date('not a date')
+
+
+def test_stream_json():
+    series = make_series(['2018-01-01 09:30', '2018-01-01 09:31'], [1.0, np.nan])
+    dates, columns = export.timeseries_columns(series, ('value',))
+    chunks = list(export.stream_json([('aapl', dates, columns),
+                                      ('msft', None, {'value': np.nan})],
+                                     {'next_offset': None}))
+    assert len(chunks) > 3
+    document = json.loads(''.join(chunks))
+    assert {'results': {'aapl': {'dates': ['2018-01-01T09:30:00', '2018-01-01T09:31:00'],
+                                 'value': [1.0, None]},
+                        'msft': {'value': None}},
+            'next_offset': None} == document
+
+
+def test_stream_arrow():
+    pyarrow = pytest.importorskip('pyarrow')
+    series = make_series(['2018-01-01', '2018-01-02'], [1.0, np.nan])
+    dates, columns = export.timeseries_columns(series, ('value',))
+    data = b''.join(export.stream_arrow([('aapl', dates, columns), ('msft', dates, columns)],
+                                        ('value',), True))
+    table = pyarrow.ipc.open_stream(data).read_all()
+    assert ['key', 'date', 'value'] == table.column_names
+    assert ['aapl', 'aapl', 'msft', 'msft'] == table.column('key').to_pylist()
+    assert [1.0, None, 1.0, None] == table.column('value').to_pylist()
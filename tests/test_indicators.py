@@ -1,10 +1,10 @@
 import pymdicator.timeseries as ts
-from pymdicator.indicators import Momentum, MACD, RSI
+from pymdicator.indicators import TechnicalIndicator, Momentum, MACD, RSI
 import numpy as np
 import datetime
 import pytest
 import os
-from pandas import read_csv
+from pandas import read_csv, DataFrame
 
 
 @pytest.fixture(params=[False, True])
@@ -188,4 +188,138 @@ def test_timeseries_rsi(test_ts, vals, is_csv, pd):
         assert np.isclose(100.0 - 100.0 / (1 + 10.5/2.5), rsi_ts.values[-5])
         assert np.isclose(100.0 - 100.0 / (1 + 10.5/2.5), rsi_ts.values[-6])
     else:
-        assert np.isclose(rsi_ts.values[-1], rsi)
\ No newline at end of file
+        assert np.isclose(rsi_ts.values[-1], rsi)
+
+def test_rsi_no_losses_or_flat():
+    dts = [datetime.date(2018, 1, 1) + datetime.timedelta(ii) for ii in range(15)]
+    rising = ts.Timeseries(dts, [100.0 + ii for ii in range(15)], ts.TimeseriesType.PRICE)
+    flat = ts.Timeseries(dts, [100.0] * 15, ts.TimeseriesType.PRICE)
+    for smoothing in [ts.TimeseriesSubType.EQUAL, ts.TimeseriesSubType.WILDER]:
+        rsi_calc = RSI(10, smoothing)
+        assert 100.0 == rsi_calc.calculate_current_ts(rising)
+        assert np.all(rsi_calc.calculate_timeseries_ts(rising).np_values == 100.0)
+        assert 0.0 == rsi_calc.calculate_current_ts(flat)
+        assert np.all(rsi_calc.calculate_timeseries_ts(flat).np_values == 0.0)
+
+
+def test_rsi_short_history(dts, vals):
+    for n_points in [0, 1]:
+        history = ts.Timeseries(dts[:n_points], vals[:n_points], ts.TimeseriesType.PRICE)
+        for smoothing in [ts.TimeseriesSubType.EQUAL, ts.TimeseriesSubType.WILDER]:
+            assert np.isnan(RSI(10, smoothing).calculate_current_ts(history))
+    assert np.isnan(RSI(10).calculate_current_ts(ts.Timeseries(dts, vals), as_of=dts[0]))
+
+
+def test_wilder_rsi(test_ts, vals):
+    period = 5
+    changes = np.diff(vals)
+    avg_gain = np.clip(changes[:period], 0, None).mean()
+    avg_loss = -np.clip(changes[:period], None, 0).mean()
+    expected = [100.0 * avg_gain / (avg_gain + avg_loss)]
+    for change in changes[period:]:
+        avg_gain = (avg_gain * (period - 1) + max(change, 0)) / period
+        avg_loss = (avg_loss * (period - 1) + max(-change, 0)) / period
+        expected.append(100.0 * avg_gain / (avg_gain + avg_loss))
+
+    rsi_calc = RSI(period, ts.TimeseriesSubType.WILDER)
+    rsi_ts = rsi_calc.calculate_timeseries_ts(test_ts)
+    assert np.allclose(expected, rsi_ts.np_values, rtol=1e-10)
+    assert rsi_ts.dates[0] == test_ts.dates[period - 1]
+    assert np.isclose(expected[-1], rsi_calc.calculate_current_ts(test_ts))
+
+
+def check_streaming(indicator, test_ts, expected, n_seed):
+    indicator.seed(test_ts.create_derived(test_ts.np_values[:n_seed], 0, ts.TimeseriesType.PRICE))
+    streamed = [indicator.update(price) for price in test_ts.np_values[n_seed:]]
+    n_missing = len(test_ts) - len(expected)
+    for ii, value in enumerate(streamed):
+        if ii + n_seed < n_missing:
+            assert np.all(np.isnan(value))
+        else:
+            assert np.allclose(value, expected[ii + n_seed - n_missing], rtol=1e-10, atol=1e-10)
+
+
+def seed_lengths(test_ts):
+    return [0, 5, len(test_ts) // 2]
+
+
+def test_momentum_streaming(test_ts):
+    for n_seed in seed_lengths(test_ts):
+        mom_ts = Momentum(10).calculate_timeseries_ts(test_ts)
+        check_streaming(Momentum(10), test_ts, mom_ts.values, n_seed)
+
+
+def test_rsi_streaming(test_ts):
+    for n_seed in seed_lengths(test_ts):
+        rsi_ts = RSI(10).calculate_timeseries_ts(test_ts)
+        check_streaming(RSI(10), test_ts, rsi_ts.values, n_seed)
+
+
+def test_wilder_rsi_streaming(test_ts):
+    rsi_calc = RSI(10, ts.TimeseriesSubType.WILDER)
+    for n_seed in seed_lengths(test_ts):
+        rsi_ts = rsi_calc.calculate_timeseries_ts(test_ts)
+        check_streaming(rsi_calc, test_ts, rsi_ts.values, n_seed)
+
+
+def test_macd_streaming(test_ts, is_csv):
+    macd_calc = MACD(3, 6, 4) if not is_csv else MACD()
+    (macd_ts, signal_ts) = macd_calc.calculate_timeseries_ts(test_ts)
+    expected = list(zip(macd_ts.values, signal_ts.values))
+    for n_seed in seed_lengths(test_ts):
+        check_streaming(macd_calc, test_ts, expected, n_seed)
+
+
+def check_sweep(frame, expected_series):
+    assert len(frame.columns) == len(expected_series)
+    for col, expected in enumerate(expected_series):
+        column = frame.iloc[:, col]
+        expected = expected.series.reindex(frame.index)
+        assert np.allclose(column.values, expected.values, equal_nan=True,
+                           rtol=1e-10, atol=1e-10)
+
+
+def test_momentum_sweep(test_ts):
+    grid = [1, 2, 5, 10, 19, 250]
+    frame = Momentum.sweep(test_ts, grid)
+    assert list(frame.columns) == grid
+    check_sweep(frame, [Momentum(n).calculate_timeseries_ts(test_ts) for n in grid])
+
+
+def test_rsi_sweep(test_ts):
+    grid = [2, 5, 10, 14]
+    check_sweep(RSI.sweep(test_ts, grid),
+                [RSI(period).calculate_timeseries_ts(test_ts) for period in grid])
+
+    grid = [(5, ts.TimeseriesSubType.WILDER), (10, ts.TimeseriesSubType.EQUAL),
+            (14, ts.TimeseriesSubType.WILDER)]
+    check_sweep(RSI.sweep(test_ts, grid),
+                [RSI(*parameters).calculate_timeseries_ts(test_ts) for parameters in grid])
+
+
+def test_macd_sweep(test_ts):
+    grid = [(2, 5, 3), (3, 6, 4), (3, 6, 2), (2, 6, 4), (12, 26, 9)]
+    (macd, signal) = MACD.sweep(test_ts, grid)
+    assert list(macd.columns) == grid
+    expected = [MACD(*parameters).calculate_timeseries_ts(test_ts) for parameters in grid]
+    check_sweep(macd, [e[0] for e in expected])
+    check_sweep(signal, [e[1] for e in expected])
+
+    # the generic one indicator per parameter set sweep agrees
+    (generic_macd, generic_signal) = TechnicalIndicator.sweep.__func__(MACD, test_ts, grid)
+    assert np.allclose(macd.values, generic_macd.values, equal_nan=True)
+    assert np.allclose(signal.values, generic_signal.values, equal_nan=True)
+
+
+@pytest.mark.parametrize('indicator', [Momentum(5), MACD(3, 6, 4), RSI(5),
+                                       RSI(5, ts.TimeseriesSubType.WILDER)])
+def test_current_as_of(test_ts, dts, vals, indicator):
+    as_of = dts[14]
+    history = ts.Timeseries(dts[:15], vals[:15], ts.TimeseriesType.PRICE,
+                            ts.TimeseriesSubType.ABSOLUTE, 1)
+    expected = indicator.calculate_current(history)
+    assert np.allclose(indicator.calculate_current(test_ts, as_of=as_of), expected)
+
+    df = DataFrame({'Date': dts, 'Close': vals})
+    assert np.allclose(indicator.calculate_current(df, as_of=as_of), expected)
+    assert np.allclose(indicator.calculate_current({'sec': df}, as_of=as_of)['sec'], expected)
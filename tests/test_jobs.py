@@ -0,0 +1,69 @@
+import threading
+from pymdicator import jobs
+
+
+def test_job_runs_in_background():
+    manager = jobs.JobManager(max_workers=2)
+    release = threading.Event()
+
+    def calculate(x):
+        release.wait(5)
+        return x * 2
+
+    job = manager.submit(('double', 21), calculate, 21)
+    assert not job.done()
+    assert job.status in (jobs.JobStatus.PENDING, jobs.JobStatus.RUNNING)
+    assert job is manager.get(job.id)
+
+    release.set()
+    assert job.wait(5)
+    assert jobs.JobStatus.DONE == job.status
+    assert 42 == job.result
+    assert job.finished >= job.started >= job.submitted
+    manager.shutdown()
+
+
+def test_identical_jobs_coalesced():
+    manager = jobs.JobManager(max_workers=4)
+    release = threading.Event()
+    calls = []
+
+    def calculate(x):
+        calls.append(x)
+        release.wait(5)
+        return x
+
+    first = manager.submit(('same', 1), calculate, 1)
+    second = manager.submit(('same', 1), calculate, 1)
+    other = manager.submit(('same', 2), calculate, 2)
+    assert first is second
+    assert first is not other
+    assert 1 == manager.info()['coalesced']
+    assert 2 == manager.info()['active']
+
+    release.set()
+    assert first.wait(5) and other.wait(5)
+    assert [1, 2] == sorted(calls)
+    assert 0 == manager.info()['active']
+
+    # a finished job is not reused
+    third = manager.submit(('same', 1), calculate, 1)
+    assert third is not first
+    assert third.wait(5)
+    assert 3 == len(calls)
+    manager.shutdown()
+
+
+def test_failed_job():
+    manager = jobs.JobManager(max_workers=1)
+
+    def calculate():
+        raise ValueError("bad parameters")
+
+    job = manager.submit('failing', calculate)
+    assert job.wait(5)
+    assert jobs.JobStatus.FAILED == job.status
+    assert job.result is None
+    assert 'bad parameters' in job.error
+    assert manager.get('unknown') is None
+    manager.shutdown()
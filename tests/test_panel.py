@@ -0,0 +1,176 @@
+import pymdicator.timeseries as ts
+from pymdicator.panel import Panel
+from pymdicator.indicators import Momentum, MACD, RSI
+import numpy as np
+import pytest
+from pandas import read_csv
+
+
+@pytest.fixture
+def frames(datadir):
+    df = read_csv(datadir.join('stock_data.txt'))
+    return {
+        'full': df,
+        'late': df.iloc[1000:].reset_index(drop=True),
+        'early': df.iloc[:3000].reset_index(drop=True),
+        'scaled': df.iloc[200:4000].assign(Close=df['Close'].iloc[200:4000] * 3.0 + 1.0),
+        'short': df.iloc[-15:].reset_index(drop=True),
+        'ipo': df.iloc[-1:].reset_index(drop=True),
+        'missing': None}
+
+
+@pytest.fixture
+def panel(frames):
+    return Panel.from_frames(frames)
+
+
+def check_current(current, expected):
+    for security in expected:
+        if expected[security] is None or np.isnan(expected[security]):
+            assert np.isnan(current[security])
+        else:
+            assert np.isclose(current[security], expected[security], rtol=1e-10)
+
+
+def check_timeseries(result_panel, expected):
+    for security in expected:
+        col = result_panel.securities.index(security)
+        if expected[security] is None or len(expected[security]) == 0:
+            assert np.all(np.isnan(result_panel.values[:, col]))
+            continue
+        rows = np.searchsorted(result_panel.date_index, expected[security].date_index)
+        assert np.allclose(result_panel.values[rows, col], expected[security].np_values,
+                           rtol=1e-10, equal_nan=True)
+        assert np.sum(~np.isnan(result_panel.values[:, col])) == \
+            np.sum(~np.isnan(expected[security].np_values))
+
+
+def test_from_frames(panel, frames):
+    assert panel.values.shape == (len(frames['full']), len(frames))
+    assert panel.securities == list(frames)
+    assert panel.first_valid()[panel.securities.index('late')] == 1000
+    assert panel.last_valid()[panel.securities.index('early')] == 2999
+    assert panel.last_valid()[panel.securities.index('missing')] == -1
+    late_ts = panel.column('late')
+    assert len(late_ts) == len(frames['late'])
+    assert np.allclose(late_ts.np_values, frames['late']['Close'])
+
+
+@pytest.mark.parametrize('indicator', [Momentum(12), Momentum(20), RSI(10), RSI(14),
+                                       RSI(14, ts.TimeseriesSubType.WILDER)])
+def test_current_panel(panel, frames, indicator):
+    check_current(indicator.calculate_current(panel), indicator.calculate_current(frames))
+
+
+@pytest.mark.parametrize('indicator', [Momentum(12), RSI(10), RSI(14),
+                                       RSI(14, ts.TimeseriesSubType.WILDER)])
+def test_timeseries_panel(panel, frames, indicator):
+    check_timeseries(indicator.calculate_timeseries(panel), indicator.calculate_timeseries(frames))
+
+
+def test_macd_panel(panel, frames):
+    macd_calc = MACD()
+    (macd, signal) = macd_calc.calculate_current(panel)
+    expected = macd_calc.calculate_current(frames)
+    check_current(macd, dict((s, expected[s][0] if expected[s] else None) for s in expected))
+    check_current(signal, dict((s, expected[s][1] if expected[s] else None) for s in expected))
+
+    (macd_ts, signal_ts) = macd_calc.calculate_timeseries(panel)
+    expected = macd_calc.calculate_timeseries(frames)
+    check_timeseries(macd_ts, dict((s, expected[s][0] if expected[s] else None) for s in expected))
+    check_timeseries(signal_ts, dict((s, expected[s][1] if expected[s] else None) for s in expected))
+
+
+def test_moving_average_panel(panel):
+    for weighting_type in [ts.TimeseriesSubType.EQUAL, ts.TimeseriesSubType.EXPONENTIAL,
+                           ts.TimeseriesSubType.WILDER]:
+        average = panel.calculate_moving_average(weighting_type, 30)
+        expected = dict((s, panel.column(s).calculate_moving_average(weighting_type, 30))
+                        for s in panel.securities if s != 'missing')
+        check_timeseries(average, expected)
+
+        average = panel.calculate_moving_average_truncate(weighting_type, 30, 40)
+        expected = dict((s, panel.column(s).calculate_moving_average_truncate(weighting_type,
+                                                                              30, 40))
+                        for s in panel.securities if s != 'missing')
+        check_timeseries(average, expected)
+
+        expected = dict((s, panel.column(s).calculate_single_moving_average(weighting_type, 30))
+                        for s in panel.securities if s != 'missing')
+        expected['missing'] = None
+        check_current(dict(zip(panel.securities,
+                               panel.calculate_single_moving_average(weighting_type, 30))),
+                      expected)
+
+    for method in [panel.calculate_moving_average, panel.calculate_single_moving_average,
+                   panel.calculate_moving_average_truncate]:
+        with pytest.raises(ValueError):
+            method('Triangular', 3)
+
+
+def test_float32_panel(panel, frames):
+    panel32 = Panel.from_frames(frames, dtype=np.float32)
+    assert panel32.values.dtype == np.float32
+    assert panel32.column('late').dtype == np.float32
+
+    u = 2.0 ** -24
+    for weighting_type in [ts.TimeseriesSubType.EQUAL, ts.TimeseriesSubType.EXPONENTIAL]:
+        average = panel32.calculate_moving_average(weighting_type, 30)
+        assert average.values.dtype == np.float32
+        assert np.allclose(average.values, panel.calculate_moving_average(weighting_type, 30).values,
+                           rtol=2 * u, atol=0, equal_nan=True)
+
+    rsi = RSI(14).calculate_timeseries(panel32)
+    assert rsi.values.dtype == np.float32
+    assert np.allclose(rsi.values, RSI(14).calculate_timeseries(panel).values,
+                       rtol=0, atol=0.01, equal_nan=True)
+
+
+def test_slice_dates_panel(panel, frames):
+    dates = frames['full']['Date']
+    sliced = panel.slice_dates(dates[100], dates[199])
+    assert sliced.values.shape == (100, len(frames))
+    assert np.shares_memory(sliced.values, panel.values)
+    assert np.array_equal(sliced.date_index, panel.date_index[100:200])
+    assert panel.as_of(dates[199]).values.shape == (200, len(frames))
+    assert panel.as_of(None) is panel
+
+
+@pytest.mark.parametrize('indicator', [Momentum(12), RSI(14), RSI(14, ts.TimeseriesSubType.WILDER)])
+def test_current_panel_as_of(panel, frames, indicator):
+    as_of = frames['full']['Date'][2500]
+    history = dict((security, df[df['Date'] <= as_of] if df is not None else None)
+                   for security, df in frames.items())
+    expected = indicator.calculate_current(history)
+    current = indicator.calculate_current(frames, as_of=as_of)
+    assert current['missing'] is None
+    for security in frames:
+        if frames[security] is not None:
+            assert np.array_equal(current[security], expected[security], equal_nan=True)
+
+    # the panel has no value for securities with no history by then
+    expected['short'] = None
+    check_current(indicator.calculate_current(panel, as_of=as_of), expected)
+
+
+def test_resample_panel(panel, frames):
+    from pymdicator.resample import Frequency, Aggregation
+    weekly = panel.resample(Frequency.WEEKLY)
+    assert weekly.period == Frequency.WEEKLY
+    assert weekly.securities == panel.securities
+    for security in ('full', 'late', 'short'):
+        expected = panel.column(security).resample(Frequency.WEEKLY)
+        col = weekly.securities.index(security)
+        rows = np.searchsorted(weekly.date_index, expected.date_index)
+        present = ~np.isnan(weekly.values[:, col])
+        assert present.sum() == len(expected)
+        assert np.array_equal(weekly.values[rows, col], expected.np_values)
+    assert np.all(np.isnan(weekly.values[:, weekly.securities.index('missing')]))
+
+    monthly_sum = panel.resample(Frequency.MONTHLY, Aggregation.SUM)
+    assert np.allclose(np.nansum(monthly_sum.values, axis=0), np.nansum(panel.values, axis=0))
+
+    empty = Panel(panel.date_index[:0], panel.securities,
+                  panel.values[:0]).resample(Frequency.MONTHLY)
+    assert (0, len(panel.securities)) == empty.values.shape
+    assert 0 == len(empty.date_index)
@@ -0,0 +1,106 @@
+from pymdicator.indicators import TechnicalIndicator, Momentum, MACD, RSI
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+from pandas import read_csv
+
+
+class Failing(TechnicalIndicator):
+    def __init__(self):
+        TechnicalIndicator.__init__(self, "Failing")
+
+    def calculate_current_df(self, df):
+        if len(df) < 1000:
+            raise ValueError("not enough data")
+        return len(df)
+
+
+@pytest.fixture
+def frames(datadir):
+    df = read_csv(datadir.join('stock_data.txt'))
+    frames = dict(('sec%d' % ii, df.iloc[ii * 100:].reset_index(drop=True))
+                  for ii in range(20))
+    frames['none'] = None
+    frames['short'] = df.iloc[:50]
+    return frames
+
+
+@pytest.fixture(scope='module')
+def process_pool():
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        yield executor
+
+
+@pytest.mark.parametrize('indicator', [Momentum(12), RSI(10), MACD()])
+def test_current_all_parallel(frames, indicator, process_pool):
+    expected = indicator.calculate_current_all(frames)
+    results = indicator.calculate_current(frames, executor=process_pool, chunk_size=3)
+    assert list(results) == list(frames)
+    assert results['none'] is None
+    for security in frames:
+        if frames[security] is not None:
+            assert np.allclose(results[security], expected[security], equal_nan=True)
+
+
+def test_current_all_parallel_as_of(frames, process_pool):
+    indicator = RSI(10)
+    as_of = frames['sec0']['Date'][3000]
+    expected = indicator.calculate_current_all(frames, as_of=as_of)
+    results = indicator.calculate_current(frames, executor=process_pool, as_of=as_of)
+    assert results['sec0'] != indicator.calculate_current(frames['sec0'])
+    for security in frames:
+        if frames[security] is not None:
+            assert np.isclose(results[security], expected[security])
+
+
+def test_timeseries_all_parallel(frames):
+    indicator = RSI(14)
+    expected = indicator.calculate_timeseries_all(frames)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = indicator.calculate_timeseries_all(frames, executor=executor)
+    assert list(results) == list(frames)
+    for security in frames:
+        if frames[security] is not None:
+            assert np.allclose(results[security].np_values, expected[security].np_values)
+            assert np.array_equal(results[security].date_index, expected[security].date_index)
+
+
+def test_parallel_errors(frames, process_pool):
+    errors = {}
+    results = Failing().calculate_current_all(frames, executor=process_pool, errors=errors)
+    assert results['sec0'] == len(frames['sec0'])
+    assert results['short'] is None
+    assert results['none'] is None
+    assert list(errors) == ['short']
+    assert 'not enough data' in errors['short']
+
+
+RESOURCE_TRACKER_SCRIPT = """
+import multiprocessing, sys
+from concurrent.futures import ProcessPoolExecutor
+from pandas import read_csv
+from pymdicator.indicators import Momentum
+
+if __name__ == '__main__':
+    frames = {'sec': read_csv(sys.argv[2])}
+    context = multiprocessing.get_context(sys.argv[1])
+    with ProcessPoolExecutor(max_workers=2, mp_context=context) as executor:
+        Momentum(12).calculate_current(frames, executor=executor)
+"""
+
+
+@pytest.mark.parametrize('start_method', ['fork', 'spawn'])
+def test_shared_memory_released_cleanly(datadir, start_method):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = datadir.join('script.py')
+    script.write(RESOURCE_TRACKER_SCRIPT)
+    result = subprocess.run([sys.executable, script.strpath, start_method,
+                             datadir.join('stock_data.txt').strpath],
+                            capture_output=True, text=True, cwd=root,
+                            env=dict(os.environ, PYTHONPATH=root))
+    assert 0 == result.returncode, result.stderr
+    assert 'KeyError' not in result.stderr
+    assert 'leaked' not in result.stderr
@@ -0,0 +1,87 @@
+import json
+import threading
+import numpy as np
+import pandas as pd
+from pymdicator import profiling
+from pymdicator.indicators import RSI
+from pymdicator.timeseries import Timeseries
+
+
+def make_frame(n_points=200):
+    return pd.DataFrame({'Date': pd.date_range('2000-01-03', periods=n_points),
+                         'Close': 100.0 + np.sin(np.arange(n_points) / 5.0)})
+
+
+def test_disabled_records_nothing():
+    profiler = profiling.Profiler()
+    RSI(10).calculate_current(make_frame())
+    assert profiling.active() is None
+    assert profiler.stages == {}
+    with profiling.stage('nothing'):
+        pass
+
+
+def test_profiler_records_stages():
+    df = make_frame()
+    with profiling.Profiler() as profiler:
+        assert profiling.active() is profiler
+        RSI(10).calculate_timeseries(df)
+        RSI(10).calculate_timeseries(df)
+    assert profiling.active() is None
+
+    stages = dict((row['name'], row) for row in profiler.summary())
+    outer = stages['TechnicalIndicator.calculate_timeseries']
+    inner = stages['TechnicalIndicator.calculate_timeseries_df']
+    assert outer['calls'] == 2
+    assert outer['size'] == 400
+    assert inner['time'] <= outer['time']
+    assert outer['self_time'] < outer['time']
+    assert stages['Timeseries.from_arrays']['size'] == 400
+    assert outer['bytes'] is None
+    assert 'RSI.calculate_timeseries_ts' in profiler.table()
+
+
+def test_stage_and_memory():
+    with profiling.Profiler(memory=True) as profiler:
+        with profiling.stage('allocate', 10):
+            kept = [np.ones(100000)]
+    row = profiler.summary()[0]
+    assert row['name'] == 'allocate'
+    assert row['size'] == 10
+    assert row['bytes'] >= 800000
+    assert len(kept) == 1
+
+
+def test_nested_profilers():
+    with profiling.Profiler() as outer:
+        with profiling.Profiler() as inner:
+            with profiling.stage('inner'):
+                pass
+        assert profiling.active() is outer
+        with profiling.stage('outer'):
+            pass
+    assert list(inner.stages) == ['inner']
+    assert list(outer.stages) == ['outer']
+
+
+def test_chrome_trace(tmpdir):
+    ts = Timeseries(pd.date_range('2000-01-03', periods=50), np.arange(50.0) + 1.0)
+    with profiling.Profiler(max_events=3) as profiler:
+        threads = [threading.Thread(target=ts.calculate_returns) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ts.calculate_moving_average()
+        ts.calculate_volatility('Equal', 10)
+
+    path = tmpdir.join('trace.json').strpath
+    profiler.save_trace(path)
+    with open(path) as trace_file:
+        trace = json.load(trace_file)
+    events = trace['traceEvents']
+    assert len(events) == 3
+    assert trace['otherData']['dropped_events'] == profiler.dropped_events > 0
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events)
+    assert events[0]['name'] == 'Timeseries.calculate_returns'
+    assert events[0]['args']['size'] == 50
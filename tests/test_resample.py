@@ -0,0 +1,126 @@
+import pymdicator.resample as resample
+from pymdicator.resample import Frequency, Aggregation
+import numpy as np
+import pandas as pd
+import pytest
+
+PANDAS_RULES = {
+    Frequency.DAILY: 'D',
+    Frequency.WEEKLY: 'W-SUN',
+    Frequency.MONTHLY: 'MS',
+    Frequency.QUARTERLY: 'QS',
+    Frequency.YEARLY: 'YS',
+}
+
+PANDAS_AGGREGATIONS = {
+    Aggregation.FIRST: 'first',
+    Aggregation.LAST: 'last',
+    Aggregation.MAX: 'max',
+    Aggregation.MIN: 'min',
+    Aggregation.SUM: 'sum',
+    Aggregation.MEAN: 'mean',
+    Aggregation.COUNT: 'count',
+}
+
+
+@pytest.fixture
+def daily():
+    rng = np.random.RandomState(42)
+    dates = pd.bdate_range('1999-12-01', periods=800)
+    dates = dates[rng.uniform(size=len(dates)) > 0.1]
+    return pd.Series(100.0 + np.cumsum(rng.normal(0.0, 1.0, len(dates))), index=dates)
+
+
+def date_index(series):
+    return series.index.values.astype('datetime64[ns]').view(np.int64)
+
+
+def expected_bars(series, rule, how):
+    groups = series.resample(rule)
+    expected = groups.agg(PANDAS_AGGREGATIONS[how])
+    return expected[groups.count() > 0].values
+
+
+@pytest.mark.parametrize('frequency', sorted(PANDAS_RULES))
+@pytest.mark.parametrize('how', sorted(PANDAS_AGGREGATIONS))
+def test_aggregate_matches_pandas(daily, frequency, how):
+    starts = resample.bar_starts(date_index(daily), frequency)
+    bars = resample.aggregate(daily.values, starts, how)
+    assert np.allclose(bars, expected_bars(daily, PANDAS_RULES[frequency], how))
+
+
+@pytest.mark.parametrize('how', sorted(PANDAS_AGGREGATIONS))
+def test_aggregate_skips_nan(daily, how):
+    daily = daily.copy()
+    daily.iloc[5:40] = np.nan
+    daily.iloc[100] = np.nan
+    starts = resample.bar_starts(date_index(daily), Frequency.WEEKLY)
+    bars = resample.aggregate(daily.values, starts, how)
+
+    groups = daily.resample('W-SUN')
+    expected = groups.agg(PANDAS_AGGREGATIONS[how])[groups.size() > 0].values.copy()
+    if how != Aggregation.COUNT:
+        expected[groups.count()[groups.size() > 0].values == 0] = np.nan
+    assert np.allclose(bars, expected, equal_nan=True)
+
+
+def test_aggregate_2d(daily):
+    values = np.column_stack([daily.values, daily.values * 2.0])
+    values[:30, 1] = np.nan
+    starts = resample.bar_starts(date_index(daily), Frequency.MONTHLY)
+    for how in PANDAS_AGGREGATIONS:
+        bars = resample.aggregate(values, starts, how)
+        assert bars.shape == (len(starts), 2)
+        for col in range(2):
+            assert np.allclose(bars[:, col], resample.aggregate(values[:, col], starts, how),
+                               equal_nan=True)
+
+
+def test_intraday_bars():
+    dates = pd.date_range('2018-01-02 09:30', periods=1000, freq='min')
+    values = np.arange(1000.0)
+    series = pd.Series(values, index=dates)
+    for frequency, rule in (('5min', '5min'), ('1h', '1h'), (pd.Timedelta('15min'), '15min'),
+                            (6 * 60 * 10**9, '6min')):
+        starts = resample.bar_starts(date_index(series), frequency)
+        for how in (Aggregation.FIRST, Aggregation.MAX, Aggregation.SUM, Aggregation.MEAN):
+            bars = resample.aggregate(values, starts, how)
+            assert np.allclose(bars, expected_bars(series, rule, how))
+    with pytest.raises(ValueError):
+        resample.bar_starts(date_index(series), '0min')
+
+
+def test_intraday_bars_start_at_midnight():
+    # 7 minutes does not divide a day: each day's bars start at its midnight, as
+    # pandas' do for a single day, and the day's last bar is cut short
+    dates = pd.date_range('2018-01-02 20:00', periods=3000, freq='min')
+    values = np.arange(3000.0)
+    series = pd.Series(values, index=dates)
+    starts = resample.bar_starts(date_index(series), '7min')
+    expected = np.concatenate([expected_bars(day, '7min', Aggregation.FIRST)
+                               for _, day in series.groupby(series.index.normalize())])
+    assert np.array_equal(resample.aggregate(values, starts, Aggregation.FIRST), expected)
+    first_dates = date_index(series)[starts]
+    assert pd.Timestamp('2018-01-03').value in first_dates
+    bar_start_times = resample.bar_key_starts(resample.bar_keys(first_dates, '7min'), '7min')
+    # every minute is present, so only the first bar starts before its first point
+    assert np.array_equal(bar_start_times[1:], first_dates[1:])
+    assert np.all(bar_start_times % resample.DAY_NS % (7 * 60 * 10**9) == 0)
+
+
+def test_bar_starts_search_matches_keys(daily):
+    dates = date_index(daily)
+    for frequency in list(PANDAS_RULES) + ['1h', '3D']:
+        keys = resample.bar_keys(dates, frequency)
+        expected = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+        assert np.array_equal(resample.bar_starts(dates, frequency), expected)
+    assert np.array_equal([0], resample.bar_starts(dates[:1], Frequency.YEARLY))
+    assert 0 == len(resample.bar_starts(dates[:0], Frequency.YEARLY))
+    assert 0 == len(resample.aggregate(np.empty(0), np.empty(0, dtype=np.intp)))
+
+
+def test_weeks_start_on_monday():
+    dates = pd.DatetimeIndex(['2018-01-05', '2018-01-07', '2018-01-08', '2018-01-14',
+                              '2018-01-15'])
+    assert [0, 2, 4] == resample.bar_starts(date_index(pd.Series(0, index=dates)),
+                                            Frequency.WEEKLY).tolist()
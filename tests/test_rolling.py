@@ -0,0 +1,144 @@
+import pymdicator.rolling as rolling
+import numpy as np
+import pytest
+
+
+@pytest.fixture(params=[1, 2, 5, 7, 30])
+def period(request):
+    return request.param
+
+
+@pytest.fixture
+def vals():
+    rng = np.random.RandomState(42)
+    return 100.0 + np.cumsum(rng.normal(0.0, 1.0, 101))
+
+
+def test_rolling_sum(vals, period):
+    window_sums = rolling.rolling_sum(vals, period)
+    assert len(window_sums) == len(vals) - period + 1
+    for ii in range(len(window_sums)):
+        assert np.isclose(window_sums[ii], sum(vals[ii:ii + period]))
+
+
+def test_rolling_mean(vals, period):
+    window_means = rolling.rolling_mean(vals, period)
+    for ii in range(len(window_means)):
+        assert np.isclose(window_means[ii], np.mean(vals[ii:ii + period]))
+
+
+def test_rolling_sum_overlong(vals):
+    assert len(rolling.rolling_sum(vals, len(vals) + 1)) == 0
+    window_sums = rolling.rolling_sum(vals, len(vals))
+    assert len(window_sums) == 1
+    assert np.isclose(window_sums[0], sum(vals))
+
+
+def test_rolling_sum_nan_is_local(vals):
+    vals[50] = np.nan
+    window_sums = rolling.rolling_sum(vals, 5)
+    assert np.all(np.isnan(window_sums[46:51]))
+    assert not np.any(np.isnan(window_sums[:46]))
+    assert not np.any(np.isnan(window_sums[51:]))
+
+
+def test_rolling_sum_precision():
+    vals = np.full(1000000, 1.0e6) + np.tile([0.1, -0.1], 500000)
+    window_sums = rolling.rolling_sum(vals, 10)
+    assert np.allclose(window_sums, 1.0e7, rtol=0, atol=1e-8)
+
+
+@pytest.mark.parametrize('n_points', [1, 2, 255, 256, 257, 5000])
+def test_exponential_moving_average(period, n_points):
+    vals = 100.0 + np.cumsum(np.random.RandomState(7).normal(0.0, 1.0, n_points))
+    alpha = 2.0 / (period + 1.0)
+    expected = [vals[0]]
+    for val in vals[1:]:
+        expected.append(val * alpha + expected[-1] * (1.0 - alpha))
+
+    average = rolling.exponential_moving_average(vals, alpha, vals[0])
+    assert len(average) == n_points
+    assert np.allclose(average, expected, rtol=1e-12, atol=0)
+
+
+def test_linear_recurrence_columns():
+    inputs = np.random.RandomState(3).normal(0.0, 1.0, (1000, 3))
+    initial = np.array([1.0, -2.0, 3.0])
+    result = rolling.linear_recurrence(inputs, 0.9, initial)
+    for col in range(3):
+        expected = initial[col]
+        for ii in range(len(inputs)):
+            expected = 0.9 * expected + inputs[ii, col]
+            assert np.isclose(result[ii, col], expected, rtol=1e-12)
+
+
+def test_linear_recurrence_edge_decays(vals):
+    assert np.array_equal(rolling.linear_recurrence(vals, 0.0, 5.0), vals)
+    assert np.allclose(rolling.linear_recurrence(vals, 1.0, 5.0), 5.0 + np.cumsum(vals))
+
+
+def test_rolling_sums_matches_rolling_sum():
+    values = np.random.RandomState(3).normal(size=1001)
+    periods = [1, 2, 5, 7, 50, 250, 1001, 1002, 0]
+    sums = rolling.rolling_sums(values, periods)
+    assert sums.shape == (1001, len(periods))
+    for col, period in enumerate(periods):
+        expected = rolling.rolling_sum(values, period)
+        if len(expected) == 0:
+            assert np.isnan(sums[:, col]).all()
+        else:
+            assert np.isnan(sums[:period - 1, col]).all()
+            assert np.allclose(sums[period - 1:, col], expected, rtol=0, atol=1e-12)
+
+
+def test_rolling_variance(vals, period):
+    variances = rolling.rolling_variance(vals, period)
+    assert len(variances) == len(vals) - period + 1
+    for ii in range(len(variances)):
+        assert np.isclose(variances[ii], np.var(vals[ii:ii + period]), rtol=1e-10, atol=1e-12)
+    assert len(rolling.rolling_variance(vals, len(vals) + 1)) == 0
+
+
+def test_rolling_variance_columns(vals):
+    columns = np.column_stack([vals, 2.0 * vals[::-1]])
+    variances = rolling.rolling_variance(columns, 7)
+    assert np.allclose(variances[:, 0], rolling.rolling_variance(vals, 7))
+    assert np.allclose(variances[:, 1], rolling.rolling_variance(2.0 * vals[::-1], 7))
+
+
+def test_rolling_variance_precision():
+    vals = 1.0e9 + np.cumsum(np.random.RandomState(5).normal(0.0, 0.01, 100000))
+    variances = rolling.rolling_variance(vals, 20)
+    for ii in range(0, len(variances), 997):
+        assert np.isclose(variances[ii], np.var(vals[ii:ii + 20]), rtol=1e-4)
+
+
+def test_rolling_variance_precision_after_nan():
+    # blocks of 20 starting with missing values are centred on their first value
+    vals = 1.0e6 + np.cumsum(np.random.RandomState(5).normal(0.0, 0.01, 2000))
+    vals[:25] = np.nan
+    vals[100:2000:80] = np.nan
+    columns = np.column_stack([vals, vals[::-1]])
+    variances = rolling.rolling_variance(columns, 20)
+    for ii in range(len(variances)):
+        for col in range(2):
+            expected = np.var(columns[ii:ii + 20, col])
+            if np.isnan(expected):
+                assert np.isnan(variances[ii, col])
+            else:
+                assert np.isclose(variances[ii, col], expected, rtol=1e-6, atol=0.0)
+
+
+def test_exponential_moving_variance(vals, period):
+    alpha = 2.0 / (period + 1.0)
+    mean, variance = vals[0], 4.0
+    expected = [variance]
+    for val in vals[1:]:
+        square = alpha * val * val + (1.0 - alpha) * (variance + mean * mean)
+        mean = alpha * val + (1.0 - alpha) * mean
+        variance = square - mean * mean
+        expected.append(variance)
+
+    variances = rolling.exponential_moving_variance(vals, alpha, vals[0], 4.0)
+    assert np.allclose(variances, expected, rtol=1e-8)
+    assert len(rolling.exponential_moving_variance([], alpha, 0.0, 0.0)) == 0
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pymdicator import screener
+from pymdicator.indicators import Momentum, RSI, MACD
+from pymdicator.panel import Panel
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.RandomState(11)
+    dates = pd.date_range('2010-01-04', periods=300, freq='B')
+    result = {}
+    for ii in range(40):
+        prices = 50.0 * np.exp(np.cumsum(rng.normal(0.0005 * (ii - 20), 0.01, len(dates))))
+        start = 10 * (ii % 3)
+        result['sec%02d' % ii] = pd.DataFrame({'Date': dates[start:], 'Close': prices[start:]})
+    result['short'] = result['sec00'].iloc[-5:].reset_index(drop=True)
+    return result
+
+
+@pytest.fixture
+def panel(frames):
+    return Panel.from_frames(frames)
+
+
+@pytest.mark.parametrize('k', [0, 1, 3, 9, 10, 20])
+@pytest.mark.parametrize('largest', [True, False])
+def test_top_k(k, largest):
+    values = np.array([3.0, np.nan, -1.0, 7.0, 2.5, np.nan, 10.0, 0.0, 4.0, 5.0, 6.0])
+    valid = [ii for ii in range(len(values)) if not np.isnan(values[ii])]
+    expected = sorted(valid, key=lambda ii: -values[ii] if largest else values[ii])[:k]
+    assert screener.top_k(values, k, largest).tolist() == expected
+
+
+def test_between(panel):
+    rsi = RSI(14)
+    values = screener.current_values(rsi, panel)
+    passed = screener.between(rsi, 30, 70)(panel)
+    assert passed.tolist() == [bool(30 <= v <= 70) for v in values]
+    assert not passed[panel.securities.index('short')]
+    assert screener.above(rsi, 50)(panel).tolist() == [bool(v >= 50) for v in values]
+
+
+def test_crossover(panel, frames):
+    macd = MACD()
+    up = screener.crossover(macd, screener.UP, 5)(panel)
+    down = screener.crossover(macd, screener.DOWN, 5)(panel)
+    assert not np.any(up & down)
+    for security in ['sec03', 'sec17', 'sec30']:
+        macd_ts, signal_ts = macd.calculate_timeseries(frames[security])
+        difference = macd_ts.np_values - signal_ts.np_values[-len(macd_ts):]
+        col = panel.securities.index(security)
+        assert up[col] == (difference[-6] <= 0 < difference[-1])
+        assert down[col] == (difference[-6] >= 0 > difference[-1])
+
+
+def test_screen_short_circuits(panel):
+    seen = []
+
+    def expensive(p):
+        seen.append(list(p.securities))
+        return np.ones(len(p.securities), dtype=bool)
+
+    cheap = screener.above(Momentum(20), 102.0)
+    result = screener.Screener([screener.Condition('expensive', expensive, 100)]) \
+        .add(cheap).screen(panel)
+    passing = [s for s, passed in zip(panel.securities, cheap(panel)) if passed]
+    assert 0 < len(passing) < len(panel.securities)
+    assert seen == [passing]
+    assert result.securities == passing
+    assert np.array_equal(result.values, panel.values[:, [panel.securities.index(s)
+                                                          for s in passing]], equal_nan=True)
+
+
+def test_rank(panel, frames):
+    momentum = Momentum(20)
+    rsi_band = screener.between(RSI(14), 40, 90)
+    ranked = screener.Screener([rsi_band]).rank(frames, momentum, 5)
+    assert len(ranked) == 5
+
+    values = screener.current_values(momentum, panel)
+    rsi_passed = rsi_band(panel)
+    expected = sorted([(s, v) for s, v, p in zip(panel.securities, values, rsi_passed)
+                       if p and not np.isnan(v)], key=lambda sv: -sv[1])[:5]
+    assert [s for s, v in ranked] == [s for s, v in expected]
+    assert np.allclose([v for s, v in ranked], [v for s, v in expected])
+
+    bottom = screener.Screener().rank(panel, momentum, 3, largest=False)
+    assert [v for s, v in bottom] == sorted(v for v in values if not np.isnan(v))[:3]
+    assert screener.Screener([screener.above(momentum, 1e9)]).rank(panel, momentum) == []
@@ -3,6 +3,7 @@ import datetime
 import numpy as np
 import pytest
 import os
+import pandas as pd
 from pandas import read_csv
 
 
@@ -168,6 +169,38 @@ def test_moving_av_exp_truncate(test_ts, vals):
     assert np.isclose(av_ts.values[3], test_val)
 
 
+def test_wilder_weighting(test_ts, vals):
+    wilder = ts.TimeseriesSubType.WILDER
+    al = 1.0 / 4
+    weights = (1 - al) ** np.arange(6, -1, -1)
+    test_val = np.dot(vals[:7], weights) / weights.sum()
+    assert np.isclose(test_ts.calculate_single_moving_average(wilder, 4, 6), test_val)
+
+    av_ts = test_ts.calculate_moving_average_truncate(wilder, 4, 6)
+    assert np.isclose(av_ts.values[0], test_val)
+    for ii in range(1, len(av_ts)):
+        test_val = test_val * (1 - al) + vals[ii + 6] * al
+        assert np.isclose(av_ts.values[ii], test_val)
+
+    # the variance is the weighted mean square less the squared weighted mean
+    vol_ts = test_ts.calculate_volatility(wilder, 4)
+    av_ts = test_ts.calculate_moving_average(wilder, 4)
+    squares_ts = ts.Timeseries(test_ts.dates, np.square(vals)).calculate_moving_average(wilder, 4)
+    assert len(vol_ts) == len(test_ts) - 3
+    assert np.allclose(vol_ts.np_values ** 2, squares_ts.np_values - av_ts.np_values ** 2)
+
+
+def test_unsupported_weighting(test_ts):
+    with pytest.raises(ValueError):
+        test_ts.calculate_moving_average('Triangular', 3)
+    with pytest.raises(ValueError):
+        test_ts.calculate_single_moving_average('Triangular', 3)
+    with pytest.raises(ValueError):
+        test_ts.calculate_moving_average_truncate('Triangular', 3)
+    with pytest.raises(ValueError):
+        test_ts.calculate_volatility('Triangular', 3)
+
+
 def test_vol_equal(test_ts, vals):
     vol_ts = test_ts.calculate_volatility(ts.TimeseriesSubType.EQUAL, 4)
     vals2 = (np.array(vals) * np.array(vals)).tolist()
@@ -205,6 +238,45 @@ def test_vol_exp(test_ts, vals):
                               av_ts.values[4] * av_ts.values[4]))
 
 
+def test_vol_high_price(vals):
+    # a spread of 0.1 on a price of 1e8 - the mean square less the squared mean
+    # loses every digit here
+    prices = 1.0e8 + np.tile([0.1, -0.1], 500)
+    dts = [datetime.date(2000, 1, 1) + datetime.timedelta(ii) for ii in range(len(prices))]
+    high_ts = ts.Timeseries(dts, prices)
+    assert np.allclose(high_ts.calculate_volatility(ts.TimeseriesSubType.EQUAL, 10).np_values,
+                       0.1, rtol=1e-6)
+    # volatility does not depend on the price level
+    low_ts = ts.Timeseries(dts, prices - 1.0e8)
+    for weighting_type in [ts.TimeseriesSubType.EQUAL, ts.TimeseriesSubType.EXPONENTIAL]:
+        assert np.allclose(high_ts.calculate_volatility(weighting_type, 10).np_values,
+                           low_ts.calculate_volatility(weighting_type, 10).np_values, rtol=1e-6)
+
+    flat_ts = ts.Timeseries(dts, np.full(len(prices), 1.0e8 + 0.3))
+    for weighting_type in [ts.TimeseriesSubType.EQUAL, ts.TimeseriesSubType.EXPONENTIAL]:
+        flat_vols = flat_ts.calculate_volatility(weighting_type, 7).np_values
+        assert np.all((flat_vols >= 0.0) & (flat_vols < 1e-7))
+
+
+def test_returns_vol(test_ts, vals, dts):
+    returns = np.diff(np.log(vals))
+    vol_ts = test_ts.calculate_returns_volatility(ts.TimeseriesSubType.EQUAL, 4)
+    assert len(vol_ts) == len(test_ts) - 4
+    assert vol_ts.dates[0] == dts[4]
+    assert vol_ts.ts_type == ts.TimeseriesType.VOL
+    for ii in range(len(vol_ts)):
+        assert np.isclose(vol_ts.np_values[ii], np.std(returns[ii:ii + 4]) * np.sqrt(252))
+
+    vol_ts = test_ts.calculate_returns_volatility(ts.TimeseriesSubType.EXPONENTIAL, 3,
+                                                  ts.TimeseriesSubType.ABSOLUTE, 1)
+    returns_ts = ts.Timeseries(dts[1:], np.diff(vals))
+    expected = returns_ts.calculate_volatility(ts.TimeseriesSubType.EXPONENTIAL, 3)
+    assert vol_ts.dates == expected.dates
+    assert np.allclose(vol_ts.np_values, expected.np_values)
+    assert len(test_ts.calculate_returns_volatility(ts.TimeseriesSubType.EQUAL,
+                                                    len(test_ts))) == 0
+
+
 def test_shift_and_scale(test_ts, vals):
     shifted_ts = test_ts.linear_transform(2.0, -50.0)
     assert len(shifted_ts) == len(test_ts)
@@ -227,3 +299,220 @@ def test_linear_combine(test_ts, vals, dts):
         assert combined_ts.dates[-ii] == other_ts.dates[-ii]
         assert combined_ts.dates[-ii] == dts[-ii]
         assert np.isclose(combined_ts.values[-ii], 1.5 * vals[-ii])
+
+
+def test_date_index(test_ts):
+    assert len(test_ts.date_index) == len(test_ts)
+    assert np.all(np.diff(test_ts.date_index) > 0)
+
+
+def test_linear_combine_offset(test_ts, vals, dts):
+    head_ts = ts.Timeseries(dts[:-2], vals[:-2])
+    tail_ts = ts.Timeseries(dts[3:], vals[3:])
+    combined_ts = ts.Timeseries.linearly_combine(tail_ts, 2.0, head_ts, -1.0)
+    assert len(combined_ts) == len(test_ts) - 5
+    for ii in range(len(combined_ts)):
+        assert combined_ts.dates[ii] == dts[ii + 3]
+        assert np.isclose(combined_ts.values[ii], vals[ii + 3])
+
+
+def test_linear_combine_all(test_ts, vals, dts):
+    series = [test_ts, test_ts.create_truncate(8), ts.Timeseries(dts[:-1], vals[:-1])]
+    combined_ts = ts.Timeseries.linearly_combine_all(series, [1.0, 0.5, 0.25])
+    assert len(combined_ts) == 7
+    for ii in range(7):
+        assert combined_ts.dates[ii] == dts[ii - 8]
+        assert np.isclose(combined_ts.values[ii], 1.75 * vals[ii - 8])
+
+    disjoint_ts = ts.Timeseries(dts[:2], vals[:2])
+    assert len(ts.Timeseries.linearly_combine_all([test_ts.create_truncate(3), disjoint_ts],
+                                                  [1.0, 1.0])) == 0
+
+
+def test_views_share_storage(test_ts, dts):
+    shortened_ts = test_ts.create_truncate(5)
+    assert np.shares_memory(shortened_ts.np_values, test_ts.np_values)
+    assert np.shares_memory(shortened_ts.date_index, test_ts.date_index)
+    assert shortened_ts.dates == list(dts[-5:])
+
+    returns_ts = test_ts.calculate_returns(ts.TimeseriesSubType.ABSOLUTE)
+    assert np.shares_memory(returns_ts.date_index, test_ts.date_index)
+    with pytest.raises(ValueError):
+        returns_ts.np_values[0] = 0.0
+    with pytest.raises(AttributeError):
+        test_ts.some_attribute = 1
+
+
+def test_datetime_array_dates(vals, dts):
+    np_dates = np.array(dts, dtype='datetime64[ns]')
+    dt_ts = ts.Timeseries(np_dates, np.array(vals))
+    assert len(dt_ts) == len(vals)
+    assert dt_ts.dates[0] == np_dates[0]
+    assert dt_ts.values == list(vals)
+    assert np.allclose(dt_ts.series.values, vals)
+
+
+def test_derived_cache(test_ts):
+    test_ts.clear_cache()
+    first = test_ts.calculate_moving_average(ts.TimeseriesSubType.EXPONENTIAL, 3)
+    first.set_indicator_type("Something")
+    second = test_ts.calculate_moving_average(ts.TimeseriesSubType.EXPONENTIAL, 3)
+    assert second.ts_type == ts.TimeseriesType.MOVING_AVERAGE
+    assert np.shares_memory(first.np_values, second.np_values)
+
+    test_ts.calculate_volatility(ts.TimeseriesSubType.EXPONENTIAL, 3)
+    info = test_ts.cache_info()
+    assert info['hits'] == 1
+    assert info['misses'] == 2
+    assert info['entries'] == 2
+
+
+def test_derived_cache_bounded(test_ts, monkeypatch):
+    monkeypatch.setattr(ts.Timeseries, 'CACHE_SIZE', 2)
+    test_ts.clear_cache()
+    for period in [1, 2, 3]:
+        test_ts.calculate_returns(ts.TimeseriesSubType.ABSOLUTE, period)
+    info = test_ts.cache_info()
+    assert info['entries'] == 2
+    assert info['evictions'] == 1
+
+
+def test_float32(test_ts):
+    # bounds from the reduced precision section of the README, u = 2**-24
+    u = 2.0 ** -24
+    ts32 = ts.Timeseries(test_ts.dates, test_ts.np_values, test_ts.ts_type, test_ts.ts_sub_type,
+                         dtype=np.float32)
+    assert ts32.dtype == np.float32
+    assert ts32.create_truncate(5).dtype == np.float32
+
+    returns = ts32.calculate_returns(ts.TimeseriesSubType.FRACTIONAL)
+    assert returns.dtype == np.float32
+    assert np.allclose(returns.np_values, test_ts.calculate_returns().np_values, rtol=4 * u, atol=0)
+
+    for weighting_type in [ts.TimeseriesSubType.EQUAL, ts.TimeseriesSubType.EXPONENTIAL]:
+        average = ts32.calculate_moving_average(weighting_type, 3)
+        expected = test_ts.calculate_moving_average(weighting_type, 3)
+        assert np.allclose(average.np_values, expected.np_values, rtol=2 * u, atol=0)
+        single = ts32.calculate_single_moving_average(weighting_type, 3)
+        assert np.isclose(single, test_ts.calculate_single_moving_average(weighting_type, 3),
+                          rtol=2 * u, atol=0)
+
+        vol = ts32.calculate_volatility(weighting_type, 3)
+        expected = test_ts.calculate_volatility(weighting_type, 3)
+        assert vol.dtype == np.float32
+        bound = 4 * u * test_ts.np_values.max() + 2 * u * expected.np_values
+        assert np.all(np.abs(vol.np_values - expected.np_values) <= bound)
+
+
+def test_from_frame_shares_buffers(vals, dts):
+    df = pd.DataFrame({'Date': pd.DatetimeIndex(dts).as_unit('ns'), 'Close': np.array(vals)})
+    frame_ts = ts.Timeseries.from_frame(df)
+    assert frame_ts.ts_type == ts.TimeseriesType.PRICE
+    assert np.shares_memory(frame_ts.np_values, df['Close'].to_numpy())
+    assert np.shares_memory(frame_ts.date_index, df['Date'].to_numpy())
+    assert np.array_equal(frame_ts.date_index, ts.Timeseries(dts, vals).date_index)
+    assert frame_ts.values == list(vals)
+
+    indexed_ts = ts.Timeseries.from_frame(df.set_index('Date'), None)
+    assert np.array_equal(indexed_ts.date_index, frame_ts.date_index)
+
+
+def test_from_frame_parses_labels(vals, dts):
+    df = pd.DataFrame({'Date': [str(d) for d in dts], 'Close': vals})
+    frame_ts = ts.Timeseries.from_frame(df)
+    expected = ts.Timeseries(df['Date'].tolist(), vals)
+    assert frame_ts.dates == expected.dates
+    assert np.array_equal(frame_ts.date_index, expected.date_index)
+
+
+def test_from_arrays(vals, dts):
+    date_index = ts.Timeseries(dts, vals).date_index
+    array_ts = ts.Timeseries.from_arrays(date_index, np.array(vals), dtype=np.float32)
+    assert np.shares_memory(array_ts.date_index, date_index)
+    assert array_ts.dtype == np.float32
+    assert ts.Timeseries.from_arrays(date_index[1:], vals) is None
+
+
+def test_slice_dates(test_ts, dts, vals):
+    date_index = test_ts.date_index
+    sliced = test_ts.slice_dates(dts[2], dts[5])
+    assert sliced.dates == list(dts[2:6])
+    assert sliced.values == list(vals[2:6])
+    assert np.shares_memory(sliced.np_values, test_ts.np_values)
+    assert np.shares_memory(sliced.date_index, test_ts.date_index)
+    assert sliced.ts_type == test_ts.ts_type
+
+    assert test_ts.slice_dates(int(date_index[2]) + 1).dates == list(dts[3:])
+    assert test_ts.slice_dates(end=int(date_index[5]) - 1).dates == list(dts[:5])
+    assert len(test_ts.slice_dates()) == len(test_ts)
+    assert len(test_ts.slice_dates(dts[5], dts[2])) == 0
+    assert len(test_ts.slice_dates(int(date_index[-1]) + 1)) == 0
+
+
+def test_as_of(test_ts, dts, vals):
+    date_index = test_ts.date_index
+    assert test_ts.index_as_of(dts[3]) == 3
+    assert test_ts.index_as_of(int(date_index[3]) + 1) == 3
+    assert test_ts.index_as_of(int(date_index[0]) - 1) == -1
+    assert test_ts.value_as_of(dts[3]) == vals[3]
+    assert np.isnan(test_ts.value_as_of(int(date_index[0]) - 1))
+    assert np.allclose(test_ts.value_as_of([int(date_index[0]) - 1, int(date_index[4]) + 1]),
+                       [np.nan, vals[4]], equal_nan=True)
+
+    history = test_ts.as_of(dts[4])
+    assert history.values == list(vals[:5])
+    assert np.shares_memory(history.np_values, test_ts.np_values)
+    assert test_ts.as_of(None) is test_ts
+    assert len(test_ts.as_of(int(date_index[0]) - 1)) == 0
+    with pytest.raises(ValueError):
+        test_ts.as_of("not a date")
+
+
+def test_single_moving_av_as_of(test_ts, dts, vals):
+    assert np.isclose(np.mean(vals[4:7]),
+                      test_ts.calculate_single_moving_average(ts.TimeseriesSubType.EQUAL, 3,
+                                                              as_of=dts[6]))
+    assert np.isclose(test_ts.calculate_single_moving_average(ts.TimeseriesSubType.EXPONENTIAL, 3,
+                                                              index=6),
+                      test_ts.calculate_single_moving_average(ts.TimeseriesSubType.EXPONENTIAL, 3,
+                                                              as_of=dts[6]))
+    assert np.isnan(test_ts.calculate_single_moving_average(ts.TimeseriesSubType.EQUAL, 3,
+                                                            as_of=dts[1]))
+
+
+def test_resample(test_ts):
+    from pymdicator.resample import Frequency, Aggregation
+    series = test_ts.series
+    weekly = test_ts.resample(Frequency.WEEKLY)
+    groups = series.resample('W-SUN')
+    expected = groups.last()[groups.count() > 0]
+    assert np.allclose(weekly.np_values, expected.values)
+    assert weekly.period == Frequency.WEEKLY
+    assert weekly.ts_type == test_ts.ts_type
+    # each bar is dated by its last point
+    last_dates = series.index.to_series().resample('W-SUN').last().dropna()
+    assert np.array_equal(weekly.date_index,
+                          last_dates.values.astype('datetime64[ns]').view(np.int64))
+    assert weekly.dates[-1] == test_ts.dates[-1]
+    assert test_ts.cache_info()['misses'] == 1
+    test_ts.resample(Frequency.WEEKLY)
+    assert test_ts.cache_info()['hits'] == 1
+
+    (opens, highs, lows, closes) = test_ts.resample_ohlc(Frequency.WEEKLY)
+    assert np.allclose(opens.np_values, groups.first()[groups.count() > 0].values)
+    assert np.allclose(highs.np_values, groups.max()[groups.count() > 0].values)
+    assert np.allclose(lows.np_values, groups.min()[groups.count() > 0].values)
+    assert np.allclose(closes.np_values, weekly.np_values)
+    assert np.array_equal(opens.date_index, weekly.date_index)
+
+    volume = test_ts.resample(Frequency.MONTHLY, Aggregation.SUM)
+    assert np.isclose(volume.np_values.sum(), test_ts.np_values.sum())
+
+
+def test_resample_empty():
+    from pymdicator.resample import Frequency
+    empty_ts = ts.Timeseries(np.array([], dtype='datetime64[ns]'), np.array([]))
+    weekly = empty_ts.resample(Frequency.WEEKLY)
+    assert 0 == len(weekly)
+    assert weekly.period == Frequency.WEEKLY
+    assert [0, 0, 0, 0] == [len(bars) for bars in empty_ts.resample_ohlc('5min')]
@@ -0,0 +1,179 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from pymdicator import utils
+
+
+def test_list_files(datadir):
+    assert ['aapl.us.txt', 'empty.us.txt', 'msft.us.txt'] == utils.list_files(datadir.strpath)
+
+
+def test_read_csv_to_df_matches_csv(datadir):
+    path = datadir.join('aapl.us.txt').strpath
+    expected = pd.read_csv(path, parse_dates=['Date'])
+    df = utils.read_csv_to_df(path)
+
+    assert list(utils.COLUMN_DTYPES) == list(df.columns)
+    assert 50 == len(df)
+    assert (expected['Date'].values == df['Date'].values).all()
+    for column in ['Open', 'High', 'Low', 'Close', 'Volume', 'OpenInt']:
+        assert (expected[column].values == df[column].values).all()
+
+
+def test_read_columns_memory_maps(datadir):
+    path = datadir.join('aapl.us.txt').strpath
+    columns = utils.read_columns(path)
+
+    assert ['Date', 'Close'] == list(columns)
+    assert isinstance(columns['Close'], np.memmap)
+    assert not columns['Close'].flags.writeable
+    assert np.int64 == columns['Date'].dtype
+    assert 29.702 == columns['Close'][0]
+    assert os.path.isfile(os.path.join(utils.cache_path(path), 'Close.npy'))
+
+
+def test_cache_rebuilt_when_file_changes(datadir):
+    path = datadir.join('msft.us.txt').strpath
+    assert not utils.is_cache_fresh(path)
+    assert 20 == len(utils.read_columns(path)['Close'])
+    assert utils.is_cache_fresh(path)
+
+    with open(path, 'a') as data_file:
+        data_file.write("2000-01-01,1.0,1.0,1.0,123.5,100,0\n")
+    assert not utils.is_cache_fresh(path)
+    closes = utils.read_columns(path)['Close']
+    assert 21 == len(closes)
+    assert 123.5 == closes[-1]
+
+
+def test_empty_file(datadir):
+    df = utils.read_csv_to_df(datadir.join('empty.us.txt').strpath, ['Date', 'Close'])
+    assert 0 == len(df)
+    assert ['Date', 'Close'] == list(df.columns)
+
+
+def test_convert_directory(datadir):
+    assert 3 == utils.convert_directory(datadir.strpath)
+    assert 0 == utils.convert_directory(datadir.strpath)
+    assert ['aapl.us.txt', 'empty.us.txt', 'msft.us.txt'] == utils.list_files(datadir.strpath)
+
+
+def test_security_store_loads_lazily(datadir):
+    store = utils.SecurityStore(datadir.strpath)
+    assert {'aapl': 'aapl.us.txt', 'empty': 'empty.us.txt', 'msft': 'msft.us.txt'} == \
+        store.securities()
+    assert 0 == store.cache_info()['entries']
+
+    df = store.get('aapl.us.txt')
+    assert ['Date', 'Close'] == list(df.columns)
+    assert 50 == len(df)
+    assert df is store.get('aapl.us.txt')
+
+    info = store.cache_info()
+    assert 1 == info['hits']
+    assert 1 == info['misses']
+    assert 1 == info['entries']
+    assert utils.frame_size(df) == info['size']
+    assert 3 == info['files']
+    assert store.get('missing.us.txt') is None
+
+
+def test_security_store_bounded_by_size(datadir):
+    store = utils.SecurityStore(datadir.strpath)
+    aapl_size = utils.frame_size(store.get('aapl.us.txt'))
+    store = utils.SecurityStore(datadir.strpath, max_size=aapl_size)
+
+    assert 3 == len(store.get_all())
+    info = store.cache_info()
+    assert info['size'] <= aapl_size
+    assert info['evictions'] >= 1
+
+
+def test_security_store_refresh(datadir):
+    store = utils.SecurityStore(datadir.strpath)
+    version = store.refresh()
+    assert 20 == len(store.get('msft.us.txt'))
+    assert version == store.refresh()
+
+    with open(datadir.join('msft.us.txt').strpath, 'a') as data_file:
+        data_file.write("2000-01-01,1.0,1.0,1.0,123.5,100,0\n")
+    assert version != store.refresh()
+    assert 'msft.us.txt' not in store.cache
+    assert 21 == len(store.get('msft.us.txt'))
+
+
+def test_parse_dates():
+    expected = pd.to_datetime(['2017-11-10', '1984-09-07']).values.astype('datetime64[ns]').view(np.int64)
+    assert (expected == utils.parse_dates(np.array(['2017-11-10', '1984-09-07'], dtype=object))).all()
+    assert 0 == len(utils.parse_dates(np.array([], dtype=object)))
+
+    expected = pd.to_datetime(['2020-01-02']).values.astype('datetime64[ns]').view(np.int64)
+    assert (expected == utils.parse_dates(np.array(['01/02/2020'], dtype=object))).all()
+    assert (expected == utils.parse_dates(np.array(['20200102'], dtype=object))).all()
+
+
+def test_concurrent_cache_builds(datadir):
+    paths = [datadir.join(f).strpath for f in ['aapl.us.txt', 'msft.us.txt']] * 8
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        closes = list(executor.map(lambda path: utils.read_columns(path)['Close'], paths))
+    assert [50, 20] * 8 == [len(c) for c in closes]
+    assert ['Close.npy', 'Date.npy', 'source'] == \
+        sorted(os.listdir(utils.cache_path(paths[0])))
+
+
+def test_cache_extended_with_columns(datadir):
+    path = datadir.join('aapl.us.txt').strpath
+    utils.read_columns(path, ['Date', 'Close'])
+    assert not os.path.isfile(os.path.join(utils.cache_path(path), 'Volume.npy'))
+    assert 50 == len(utils.read_columns(path, ['Close', 'Volume'])['Volume'])
+    assert utils.is_cache_fresh(path)
+    assert 3 == utils.convert_directory(datadir.strpath)
+
+
+def test_load_directory(datadir):
+    frames, stats = utils.load_directory(datadir.strpath, max_workers=2)
+    assert ['aapl.us.txt', 'empty.us.txt', 'msft.us.txt'] == sorted(frames)
+    assert 50 == len(frames['aapl.us.txt'])
+    assert 0 == len(frames['empty.us.txt'])
+    assert ['Date', 'Close'] == list(frames['msft.us.txt'].columns)
+    assert utils.read_csv_to_df(datadir.join('aapl.us.txt').strpath, ['Date', 'Close']).equals(
+        frames['aapl.us.txt'])
+
+    assert 3 == stats['files']
+    assert 70 == stats['rows']
+    assert 3 == stats['converted']
+    assert sum(os.path.getsize(datadir.join(f).strpath) for f in frames) == stats['bytes']
+    assert stats['rows_per_second'] > 0
+
+    frames, stats = utils.load_directory(datadir.strpath, ['Close'], ['msft.us.txt'])
+    assert ['msft.us.txt'] == list(frames)
+    assert ['Close'] == list(frames['msft.us.txt'].columns)
+    assert 0 == stats['converted']
+
+
+def test_security_store_preload(datadir):
+    store = utils.SecurityStore(datadir.strpath)
+    store.get('aapl.us.txt')
+    stats = store.preload(max_workers=2)
+    assert 2 == stats['files']
+    assert 3 == store.cache_info()['entries']
+    assert 20 == len(store.get('msft.us.txt'))
+    assert 0 == store.preload()['files']
+
+
+def test_load_directory_skips_bad_files(datadir):
+    with open(datadir.join('bad.us.txt').strpath, 'w') as data_file:
+        data_file.write("Date,Open,High,Low,Close,Volume,OpenInt\n"
+                        "2000-01-03,1.0,1.0,1.0,1.0,,0\n")
+    frames, stats = utils.load_directory(datadir.strpath, ['Date', 'Volume'])
+    assert ['aapl.us.txt', 'empty.us.txt', 'msft.us.txt'] == sorted(frames)
+    assert ['bad.us.txt'] == list(stats['errors'])
+    assert 3 == stats['files']
+
+    store = utils.SecurityStore(datadir.strpath, ['Date', 'Volume'])
+    assert store.get('bad.us.txt') is None
+    frames = store.get_all()
+    assert frames['bad.us.txt'] is None
+    assert 50 == len(frames['aapl.us.txt'])
+    assert 3 == utils.convert_directory(datadir.strpath)